@@ -0,0 +1,60 @@
+import logging
+import threading
+import time
+
+# statuses of telegram.ChatMember that make someone an admin of the group
+ADMIN_STATUSES = ["creator", "administrator"]
+
+
+class GroupAdminCache:
+    def __init__(self, fetch, ttl):
+        self.log = logging.getLogger("GroupAdminCache")
+
+        # fetch() returns the ChatMember list of the group's administrators or None on errors
+        self.fetch = fetch
+        self.ttl = ttl
+
+        self.lock = threading.Lock()
+        self.admins = frozenset()
+        self.fetched_at = None
+        self.refreshing = False
+
+    def get(self):
+        # never waits for telegram: stale (or no) data is returned while a refresh runs in the background
+        if self.is_stale():
+            self.refresh_async()
+
+        return self.admins
+
+    def is_stale(self):
+        return self.fetched_at is None or time.monotonic() - self.fetched_at > self.ttl
+
+    def invalidate(self):
+        self.log.debug("group admins invalidated")
+        self.fetched_at = None
+        self.refresh_async()
+
+    def refresh_async(self):
+        with self.lock:
+            if self.refreshing:
+                return False
+
+            self.refreshing = True
+
+        threading.Thread(target=self.refresh, name="GroupAdminCache", daemon=True).start()
+        return True
+
+    def refresh(self):
+        try:
+            members = self.fetch()
+
+            if members is None:
+                # keep the old admins, the next get() tries again
+                return
+
+            self.admins = frozenset(m.user.id for m in members if m.status in ADMIN_STATUSES and not m.user.is_bot)
+            self.fetched_at = time.monotonic()
+            self.log.debug(f"refreshed group admins, {len(self.admins)} found")
+        finally:
+            with self.lock:
+                self.refreshing = False
@@ -0,0 +1,121 @@
+import logging
+import os.path
+from datetime import date
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.pool import StaticPool
+from database import Database, AUTO_VACUUM_INCREMENTAL, DATE_COLUMNS
+from models import Base, AlfredoDate, AlfredoDateRecord, AlfredoStatistic, Attendance, PizzaOrder
+
+
+class AsyncDatabase:
+    # same queries as Database, for callers running in an asyncio event loop
+    def __init__(self, output_file):
+        self.log = logging.getLogger("AsyncDatabase")
+        self.output_file = output_file
+
+        if output_file == ":memory:":
+            # every connection would get its own empty database, so all of them share one
+            self.engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool,
+                                              connect_args={"check_same_thread": False})
+        else:
+            self.engine = create_async_engine(f"sqlite+aiosqlite:///{output_file}")
+
+        self.version = 0
+
+    @classmethod
+    async def open(cls, output_file):
+        # the schema can only be created from a coroutine, so use this instead of the constructor
+        db = cls(output_file)
+        await db.create_schema()
+        return db
+
+    async def create_schema(self):
+        new = not os.path.isfile(self.output_file)
+        self.log.info(f"{'creating' if new else 'loading'} Database {self.output_file}")
+
+        async with self.engine.begin() as conn:
+            if new:
+                await conn.exec_driver_sql(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(Database.upgrade_tables, self.log)
+
+    async def close(self):
+        await self.engine.dispose()
+        self.log.info("closed database")
+
+    async def create_alfredo_date(self, date, description=None, message_id=None, poll_id=None):
+        new_date = AlfredoDate(date=date, description=description, message_id=message_id, poll_id=poll_id)
+
+        async with AsyncSession(self.engine) as session:
+            session.add(new_date)
+            await session.execute(Database.statistic_change(date, created=1))
+            await session.commit()
+
+        self.version += 1
+
+    async def get_future_dates(self):
+        return await self.get_records(select(*DATE_COLUMNS)
+                                      .where(AlfredoDate.date >= date.today())
+                                      .order_by(AlfredoDate.date))
+
+    async def get_records(self, stmt):
+        async with self.engine.connect() as conn:
+            return [AlfredoDateRecord(*row) for row in await conn.execute(stmt)]
+
+    async def get_by_date(self, date):
+        records = await self.get_records(select(*DATE_COLUMNS).where(AlfredoDate.date.is_(date)).limit(1))
+        return records[0] if records else None
+
+    async def get_dates_between(self, start, end):
+        return await self.get_records(select(*DATE_COLUMNS)
+                                      .where(AlfredoDate.date >= start)
+                                      .where(AlfredoDate.date <= end)
+                                      .order_by(AlfredoDate.date))
+
+    async def delete_date(self, date):
+        await self.delete_dates([date])
+
+    async def delete_dates(self, dates):
+        return await self.delete_dates_by_id([d.id for d in dates])
+
+    async def delete_dates_by_id(self, ids):
+        async with self.engine.begin() as conn:
+            rows = (await conn.execute(select(AlfredoDate.date, AlfredoDate.poll_id)
+                                       .where(AlfredoDate.id.in_(ids)))).all()
+            poll_ids = [row.poll_id for row in rows if row.poll_id is not None]
+
+            await conn.execute(delete(AlfredoDate).where(AlfredoDate.id.in_(ids)))
+            await conn.execute(delete(Attendance).where(Attendance.poll_id.in_(poll_ids)))
+            # orders are keyed by date, they would reappear if the date is announced again
+            await conn.execute(delete(PizzaOrder).where(PizzaOrder.date.in_([row.date for row in rows])))
+
+            for row in rows:
+                await conn.execute(Database.statistic_change(row.date, cancelled=1))
+
+        self.version += 1
+        return len(rows)
+
+    async def set_attendance(self, poll_id, user_id, guests):
+        async with AsyncSession(self.engine) as session:
+            known = (await session.scalars(select(AlfredoDate.id).where(AlfredoDate.poll_id == poll_id))).first()
+
+            if known is None:
+                return False
+
+            await session.execute(Database.attendance_change(poll_id, user_id, guests))
+            await session.commit()
+
+        return True
+
+    async def get_attendees(self, poll_id):
+        async with self.engine.connect() as conn:
+            return (await conn.execute(select(Database.attendees_of(poll_id)))).scalar()
+
+    async def get_statistics(self):
+        async with self.engine.connect() as conn:
+            return (await conn.execute(select(AlfredoStatistic.year, AlfredoStatistic.month,
+                                              AlfredoStatistic.created, AlfredoStatistic.cancelled,
+                                              AlfredoStatistic.held, AlfredoStatistic.attendees)
+                                       .order_by(AlfredoStatistic.year, AlfredoStatistic.month))).all()
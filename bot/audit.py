@@ -0,0 +1,45 @@
+import json
+from collections import namedtuple
+
+# who triggered an admin action, user_id is None for actions of the bot itself (e.g. reminders on SIGUSR1)
+Actor = namedtuple("Actor", ["user_id", "name"])
+SYSTEM = Actor(None, "system")
+
+AuditEntry = namedtuple("AuditEntry", ["id", "created_at", "user_id", "user_name", "action", "date", "details"])
+
+# actions are named after the admin commands, only these two change the announced dates
+CREATE = "newalfredo"
+CANCEL = "cancel"
+ANNOUNCE = "announce"
+REMINDER = "reminder"
+
+# entries between two snapshots, reconstructing a state never replays more than that
+SNAPSHOT_INTERVAL = 100
+
+
+def dump(details):
+    return json.dumps(details, sort_keys=True) if details is not None else None
+
+
+def load(details):
+    return json.loads(details) if details is not None else None
+
+
+def apply(state, action, date, details):
+    # state maps the iso date of every announced, not cancelled date to its details
+    if action == CREATE:
+        state[date.isoformat()] = details
+    elif action == CANCEL:
+        state.pop(date.isoformat(), None)
+
+    return state
+
+
+def replay(state, entries):
+    # entries are (action, date, details) in the order they were written
+    state = dict(state)
+
+    for action, date, details in entries:
+        apply(state, action, date, details)
+
+    return state
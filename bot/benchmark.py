@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+# measures the cost of commands without telegram, e.g. ./benchmark.py -n 1000 -d 50
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), "tests"))
+
+from bot_runner import BotRunner  # noqa: E402
+from config import Config  # noqa: E402
+from fake import FakeBot, FakeMessage, FakeUser  # noqa: E402
+from storage import STORAGE_BACKENDS  # noqa: E402
+
+TESTCFG = path.join(path.dirname(path.abspath(__file__)), "tests", "config-test.json")
+USER = FakeUser(1337, "Dagobert", "DAU")
+
+
+def create_runner(storage, tmpdir, num_dates):
+    runner = BotRunner(TESTCFG, FakeBot, ":memory:", tmpdir, storage)
+    # every command has to reach its handler
+    runner.config = Config({**runner.config, "throttle_user": None, "throttle_chat": None, "coalesce_window": 0})
+    runner.init_throttle()
+    runner.init_coalescer()
+
+    for offset in range(num_dates):
+        runner.db.create_alfredo_date(date.today() + timedelta(days=offset + 1))
+
+    return runner
+
+
+def dispatch(runner, message, cached):
+    # caches like the date pages are keyed by the version of the dates, a new version measures the storage again
+    if not cached:
+        runner.db.version += 1
+
+    runner.dispatch(message)
+
+
+def benchmark(runner, command, iterations, cached=False):
+    message = FakeMessage(USER, text=f"/{command}")
+    start = time.perf_counter()
+
+    for _ in range(iterations):
+        dispatch(runner, message, cached)
+
+    return (time.perf_counter() - start) / iterations
+
+
+def allocations(runner, command, iterations, cached=False):
+    # average peak of traced memory while a single command runs
+    message = FakeMessage(USER, text=f"/{command}")
+    runner.dispatch(message)
+    peaks = 0
+
+    tracemalloc.start()
+    for _ in range(iterations):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        dispatch(runner, message, cached)
+        peaks += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return peaks / iterations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="benchmark.py", description="alfredo command benchmark")
+    parser.add_argument("-n", "--iterations", type=int, default=1000, help="Commands per measurement")
+    parser.add_argument("-d", "--dates", type=int, default=20, help="Number of future dates")
+    parser.add_argument("-c", "--commands", nargs="+", default=["termine", "statistik", "help"])
+    parser.add_argument("-s", "--storage", nargs="+", default=STORAGE_BACKENDS, choices=STORAGE_BACKENDS)
+    parser.add_argument("-m", "--memory", action="store_true", help="Measure allocations instead of time")
+    parser.add_argument("--cached", action="store_true", help="Keep cached replies between commands")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for storage in args.storage:
+            runner = create_runner(storage, tmpdir, args.dates)
+
+            for command in args.commands:
+                if args.memory:
+                    peak = allocations(runner, command, args.iterations, args.cached)
+                    print(f"{storage:>8} /{command:<10} {peak / 1024:10.1f} KiB peak per command")
+                else:
+                    elapsed = benchmark(runner, command, args.iterations, args.cached)
+                    print(f"{storage:>8} /{command:<10} {elapsed * 1e6:10.1f} µs per command")
+
+            runner.db.close()
@@ -2,11 +2,70 @@
 
 import logging
 import argparse
+import os.path
+import sys
+from contextlib import nullcontext
 from bot_runner import BotRunner
+from database import Database
+from logs import setup_logging, parse_sampling
+from storage import DEFAULT_PATHS, STORAGE_BACKENDS
+import transfer
 
 from telebot import TeleBot
 
 
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive number")
+    return number
+
+
+def open_file(name, mode, std):
+    # newline="" lets the csv module handle line endings, stdin and stdout must stay open
+    return open(name, mode, newline="") if name != "-" else nullcontext(std)
+
+
+def export_dates(args):
+    fmt = args.format or transfer.guess_format(args.output)
+    path = args.database or DEFAULT_PATHS["sqlite"]
+
+    # opening a mistyped path would create an empty database and export nothing
+    if not os.path.isfile(path):
+        logging.getLogger(__name__).error(f"export aborted, database {path} not found")
+        return False
+
+    db = Database(path)
+    try:
+        with open_file(args.output, "w", sys.stdout) as out:
+            count = transfer.export_dates(db, fmt, out)
+    except OSError as ex:
+        logging.getLogger(__name__).error(f"export aborted, {ex}")
+        return False
+    finally:
+        db.close()
+
+    logging.getLogger(__name__).info(f"exported {count} date(s)")
+    return True
+
+
+def import_dates(args):
+    fmt = args.format or transfer.guess_format(args.input)
+    db = Database(args.database or DEFAULT_PATHS["sqlite"])
+
+    try:
+        with open_file(args.input, "r", sys.stdin) as infile:
+            imported, skipped = transfer.import_dates(db, fmt, infile, args.batch_size)
+    except (OSError, ValueError) as ex:
+        logging.getLogger(__name__).error(f"import aborted, {ex}")
+        return False
+    finally:
+        db.close()
+
+    logging.getLogger(__name__).info(f"imported {imported} date(s), skipped {skipped} existing one(s)")
+    return True
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         prog="bot.py",
@@ -31,8 +90,16 @@ if __name__ == "__main__":
     parser.add_argument(
         "-d",
         "--database",
-        default="alfredo.sqlite",
-        help="Path to sqlite database"
+        help="Path to the sqlite database or the snapshot of the memory storage "
+             f"(default: {' or '.join(DEFAULT_PATHS.values())})"
+    )
+
+    parser.add_argument(
+        "-s",
+        "--storage",
+        default="sqlite",
+        choices=STORAGE_BACKENDS,
+        help="Storage backend, memory keeps everything in RAM and writes JSON snapshots to the database path"
     )
 
     parser.add_argument(
@@ -42,16 +109,64 @@ if __name__ == "__main__":
         help="Temporary dir for ephemeral files"
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "--health-port",
+        type=int,
+        help="Serve /health and /ready on this port, unless config value health_port is set",
+    )
+
+    parser.add_argument(
+        "--log-format",
+        default="json",
+        choices=["json", "text"],
+        help="Write JSON lines or plain text log messages.",
+    )
 
-    logging.basicConfig(
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        level=args.log_level
+    parser.add_argument(
+        "--log-sample",
+        default=[],
+        action="append",
+        type=parse_sampling,
+        metavar="LOGGER=N",
+        help="Only keep every N-th debug message of LOGGER (can be repeated).",
     )
+
+    subparsers = parser.add_subparsers(dest="action", title="actions", help="Run the bot if no action is given.")
+
+    export_parser = subparsers.add_parser("export", help="Write all dates and attendance to a file.")
+    export_parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    export_parser.add_argument("-f", "--format", choices=transfer.EXPORT_FORMATS,
+                               help="Output format (default: from the file extension, otherwise jsonl)")
+
+    import_parser = subparsers.add_parser("import", help="Add dates and attendance from a file.")
+    import_parser.add_argument("input", help="Input file as written by export (- for stdin)")
+    import_parser.add_argument("-f", "--format", choices=transfer.IMPORT_FORMATS,
+                               help="Input format (default: from the file extension, otherwise jsonl)")
+    import_parser.add_argument("-b", "--batch-size", type=positive_int, help="Dates per transaction (default: 1000)")
+
+    args = parser.parse_args()
+
+    listener = setup_logging(args.log_level, args.log_format == "json", dict(args.log_sample))
     logger = logging.getLogger(__name__)
 
     # disable logging for urllib3, which would spam the log when using log level DEBUG
     logging.getLogger("urllib3").propagate = False
 
-    runner = BotRunner(args.config, TeleBot, args.database, args.tmpdir)
-    runner.run()
+    success = True
+
+    try:
+        if args.action == "export":
+            success = export_dates(args)
+        elif args.action == "import":
+            success = import_dates(args)
+        else:
+            runner = BotRunner(args.config, TeleBot, args.database or DEFAULT_PATHS[args.storage], args.tmpdir,
+                               args.storage, args.health_port)
+            runner.run()
+    finally:
+        logger.info("exiting")
+        # flushes the queue before the handlers are closed, also if the bot crashed
+        listener.stop()
+        logging.shutdown()
+
+    sys.exit(0 if success else 1)
@@ -1,201 +1,795 @@
+import hashlib
 import logging
-import json
 import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
 from os import path
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 
 import util
 
-from database import Database
+from audit import Actor, SYSTEM, ANNOUNCE, REMINDER
+from admins import GroupAdminCache, ADMIN_STATUSES
+from commands import Command, CommandRouter, ArgumentError, ChoiceArg, DateArg, DateRangeArg, TextArg
+from config import load_config
+from storage import open_storage
+from menu import MenuCache
+from orders import OrderBook
+from pages import DatePages
+from breaker import CircuitBreakers, CircuitOpenError, is_outage
+from builder import PdfBuilder
+from coalesce import Coalescer
+from health import HealthMonitor, HealthServer
+from i18n import Catalogs, DEFAULT_LANGUAGE, available_languages
+from inline import InlineResults
+from logs import Lazy
+from shutdown import ShutdownCoordinator
+from throttle import Throttle, ALLOW, WARN
+from transport import Transport
 
 import telebot
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+
+DEFAULT_MENU_FILE = path.join(path.dirname(path.abspath(__file__)), "..", "menu.tex")
+DEFAULT_RECIPES_FILE = path.join(path.dirname(path.abspath(__file__)), "..", "recipes.tex")
+
+RELEASE_URL = "https://github.com/TarEnethil/alfredo/releases/latest/download"
+ISSUES_URL = "https://github.com/TarEnethil/alfredo/issues"
+MAINTAINER = "@TriviaThorsten"
+
+DEFAULT_GROUP_ADMINS_TTL = 600
+
+# maximum number of concurrent telegram calls for commands affecting several dates
+DEFAULT_API_WORKERS = 4
+
+# seconds to wait for running handlers on shutdown, has to be smaller than the stop timeout of docker
+DEFAULT_SHUTDOWN_TIMEOUT = 15
+
+# [burst, seconds to regain one command] for every user and every chat, admins are exempt
+DEFAULT_THROTTLE_USER = [10, 6]
+DEFAULT_THROTTLE_CHAT = [30, 1]
+
+# seconds in which identical read commands in a chat get a single reply
+DEFAULT_COALESCE_WINDOW = 5
+
+# connections to the bot API shared by all threads, and the timeouts of regular calls and getUpdates
+DEFAULT_API_POOL_SIZE = 8
+DEFAULT_API_CONNECT_TIMEOUT = 5
+DEFAULT_API_READ_TIMEOUT = 15
+DEFAULT_API_LONG_POLL_TIMEOUT = 20
+
+# consecutive failed API calls that open a circuit, and seconds until it is probed again
+DEFAULT_CIRCUIT_THRESHOLD = 5
+DEFAULT_CIRCUIT_COOLDOWN = 30
+
+# long polling returns at least every 20 seconds, a much larger gap means polling is stuck
+DEFAULT_HEALTH_MAX_LAG = 90
+
+# seconds Telegram may cache inline results, which delays new dates by at most that much
+DEFAULT_INLINE_CACHE_TIME = 120
+
+# menu groups that can be pre-ordered, and when changed orders are written (seconds or number of users)
+DEFAULT_ORDER_GROUPS = ["Pizza"]
+DEFAULT_ORDER_FLUSH_INTERVAL = 5
+DEFAULT_ORDER_BATCH_SIZE = 50
+
+# dates per page of /termine
+DEFAULT_DATES_PAGE_SIZE = 10
+
+# maximum length of the data of an inline keyboard button in bytes
+CALLBACK_DATA_LIMIT = 64
+# entries shown by /audit without a date
+DEFAULT_AUDIT_ENTRIES = 15
+
+# config values only read at startup, by the bot, the shared connection pool, the order writer and the health server
+RESTART_KEYS = ["token", "api_pool_size", "api_connect_timeout", "api_read_timeout", "api_long_poll_timeout",
+                "api_keep_alive", "api_proxy", "order_flush_interval", "order_batch_size", "health_max_lag",
+                "health_port", "health_host"]
 
 
 class BotRunner:
-    default_commands = [
-        telebot.types.BotCommand("termine", "Zeigt die nächsten Alfredotermine"),
-        telebot.types.BotCommand("karte", "Verlinkt die Alfredokarte"),
-        telebot.types.BotCommand("start", "Zeigt die Willkommensnachricht an"),
-        telebot.types.BotCommand("help", "Zeigt die verfügbaren Kommandos")
+    commands = [
+        Command("termine", "Zeigt die nächsten Alfredotermine", "cmd_show_dates", idempotent=True),
+        Command("karte", "Zeigt die Alfredokarte", "cmd_menu", [ChoiceArg(["pdf"])], idempotent=True),
+        Command("rezepte", "Schickt das Alfredorezeptbuch", "cmd_recipes", idempotent=True),
+        Command("statistik", "Zeigt, wie viele Alfredos bisher stattgefunden haben", "cmd_statistics", idempotent=True),
+        Command("start", "Zeigt die Willkommensnachricht an", "cmd_start"),
+        Command("help", "Zeigt die verfügbaren Kommandos", "cmd_help"),
+        Command("sprache", "Zeigt oder ändert die Sprache des Chats", "cmd_language",
+                [ChoiceArg(available_languages())]),
+
+        Command("newalfredo", "Umfrage für neuen Alfredotermin posten", "acmd_new_alfredo", [DateArg()], admin=True),
+        Command("reminder", "Erinnerung für den morgigen Termin posten", "acmd_reminder", admin=True),
+        Command("cancel", "Alfredotermin(e) absagen", "acmd_cancel", [DateRangeArg()], admin=True),
+        Command("announce", "Ankündigung in der Gruppe posten", "acmd_announce", [TextArg("announcement")],
+                admin=True),
+        Command("rebuildstats", "Statistik aus den gespeicherten Terminen neu berechnen", "acmd_rebuild_statistics",
+                admin=True),
+        Command("rebuild", "PDFs von Karte und Rezeptbuch neu bauen", "acmd_rebuild", admin=True),
+        Command("orders", "Pizzabestellungen für den nächsten oder den angegebenen Termin", "acmd_orders",
+                [DateArg(optional=True)], admin=True),
+        Command("audit", "Letzte Admin-Aktionen oder die angekündigten Termine am Ende eines Tages", "acmd_audit",
+                [DateArg(optional=True)], admin=True)
     ]
 
-    admin_commands = [
-        telebot.types.BotCommand("newalfredo", "<iso-date>: Umfrage für neuen Alfredotermin posten"),
-        telebot.types.BotCommand("reminder", ": Erinnerung für den morgigen Termin posten"),
-        telebot.types.BotCommand("cancel", "<iso-date>: Alfredotermin absagen"),
-        telebot.types.BotCommand("announce", "<announcement>: Ankündigung in der Gruppe posten")
-    ]
+    # handlers of inline keyboard buttons, by the prefix of their callback data
+    callbacks = {
+        "order": "handle_order",
+        "dates": "handle_dates_page"
+    }
+
+    router = CommandRouter(commands)
+    default_commands = [c.bot_command() for c in commands if not c.admin]
+    admin_commands = [c.bot_command() for c in commands if c.admin]
 
-    def __init__(self, cfgfile, bot_invoker, dbfile, tmpdir):
+    def __init__(self, cfgfile, bot_invoker, dbfile, tmpdir, storage="sqlite", health_port=None):
         self.log = logging.getLogger("BotRunner")
+        # separate logger for every API call, so its debug messages can be sampled
+        self.api_log = logging.getLogger("BotRunner.api")
 
         self.tmpdir = tmpdir
+        # the docker image always serves the health endpoint, the config value takes precedence
+        self.health_port = health_port
+        self.shutdown = ShutdownCoordinator()
 
         self.init_config(cfgfile)
+        self.init_i18n()
+        self.init_breakers()
+        self.init_transport()
         self.init_bot(bot_invoker)
-        self.init_database(dbfile)
+        self.init_group_admins()
+        self.init_throttle()
+        self.init_coalescer()
+        self.init_menu()
+        self.init_builder()
+        self.init_database(dbfile, storage)
+        self.init_orders()
+        self.init_pages()
+        self.init_inline()
+        self.init_health()
+        # board updates from concurrent handlers must not post two board messages
+        self.board_lock = threading.Lock()
         self.register_signal_handlers()
 
     def init_config(self, cfgfile):
         self.log.info(f"loading config from {cfgfile}")
-        if not path.exists(cfgfile):
-            raise Exception(f"{cfgfile} does not exist")
+        self.cfgfile = cfgfile
+        self.config = load_config(cfgfile)
 
-        with open(cfgfile) as c:
-            cfg = json.load(c)
+    def reload_config(self):
+        self.log.info(f"reloading config from {self.cfgfile}")
 
-        for req in ["token", "group", "admins"]:
-            if req not in cfg.keys():
-                raise Exception(f"config key {req} not found in {cfgfile}")
+        try:
+            cfg = load_config(self.cfgfile)
+        except Exception as ex:
+            self.log.error(f"invalid config, keeping the old one: {ex}")
+            return False
 
-        if not len(cfg["admins"]) > 0:
-            raise Exception("need at least one admin")
+        restart = [k for k in RESTART_KEYS if cfg.get(k) != self.config.get(k)]
+        if restart:
+            self.log.warning(f"{', '.join(restart)} can't be changed at runtime, restart the bot to use the new values")
 
+        # everything depending on the config is built first, so a failure leaves the old state untouched
+        try:
+            changes = self.create_changes(cfg)
+        except Exception as ex:
+            self.log.error(f"invalid config, keeping the old one: {ex}")
+            return False
+
+        # handlers read self.config once per access, so they either see the old or the new config
         self.config = cfg
+        for name, value in changes.items():
+            setattr(self, name, value)
+
+        if changes.get("group_admins") is not None:
+            self.group_admins.refresh_async()
+
+        if "catalogs" in changes:
+            self.set_commands()
+
+        return True
+
+    def create_changes(self, cfg):
+        # returns the attributes that have to be replaced for cfg
+        def changed(*keys):
+            return any(cfg.get(k) != self.config.get(k) for k in keys)
+
+        changes = {}
+
+        if changed("menu_file", "recipes_file"):
+            changes["menu"] = self.create_menu(cfg)
+            changes["builder"] = self.create_builder(cfg)
+
+        if changed("group", "group_admins", "group_admins_ttl"):
+            changes["group_admins"] = self.create_group_admins(cfg)
+
+        if changed("throttle_user", "throttle_chat"):
+            changes["user_throttle"], changes["chat_throttle"] = self.create_throttles(cfg)
+
+        if changed("coalesce_window", "coalesce_reply"):
+            changes["coalescer"] = self.create_coalescer(cfg)
+
+        if changed("circuit_threshold", "circuit_cooldown"):
+            changes["breakers"] = self.create_breakers(cfg)
+
+        if changed("language"):
+            changes["catalogs"], changes["static_texts"] = self.create_i18n(cfg)
+            changes["chat_languages"] = {}
+
+        # the pages are only a cache, they are rebuilt empty
+        if changed("dates_page_size"):
+            changes["pages"] = self.create_pages(cfg)
+
+        # the inline results contain the menu and texts in the default language
+        if "menu" in changes or "catalogs" in changes:
+            changes["inline"] = self.create_inline(changes.get("menu", self.menu),
+                                                   changes.get("catalogs", self.catalogs).default)
+
+        return changes
+
+    def init_i18n(self):
+        self.catalogs, self.static_texts = self.create_i18n(self.config)
+
+        # languages chosen with /sprache, read from the database on first use
+        self.chat_languages = {}
+
+    def create_i18n(self, config):
+        catalogs = Catalogs(config.get("language", DEFAULT_LANGUAGE))
+        self.log.info(f"loaded catalogs {', '.join(catalogs.languages)}, default {catalogs.default.language}")
+
+        # texts that never change are rendered once per language instead of for every command
+        static_texts = {language: self.render_static_texts(catalogs.get(language)) for language in catalogs.languages}
+
+        return catalogs, static_texts
+
+    def render_static_texts(self, catalog):
+        start = f"{catalog.text('start')}\n\n"
+        start += util.li(catalog.text("start_commands"))
+        start += util.li(catalog.format("start_maintainer", maintainer=MAINTAINER))
+        start += util.li(catalog.format("start_version", version=util.get_version()))
+        start += util.li(catalog.format("start_bugs", url=ISSUES_URL))
+
+        help_ = f"{catalog.text('help')}\n"
+        help_admin = f"{catalog.text('help_admin')}\n"
+        for cmd in self.commands:
+            line = util.li(cmd.help_line(catalog.command(cmd.name, cmd.description)))
+            if cmd.admin:
+                help_admin += line
+            else:
+                help_ += line
+
+        help_admin = f"{help_}\n{help_admin}"
+
+        return {
+            "start": start,
+            "start_admin": f"{start}\n\n{catalog.text('start_admin')}",
+            "help": help_,
+            "help_admin": help_admin
+        }
+
+    def bot_commands(self, catalog, admin=False):
+        return [c.bot_command(catalog.command(c.name, c.description)) for c in self.commands if c.admin == admin]
+
+    def catalog(self, chat_id):
+        # the hot path only does dictionary lookups
+        key = str(chat_id)
+
+        try:
+            language = self.chat_languages[key]
+        except KeyError:
+            language = self.chat_languages[key] = self.db.get_state(f"language:{key}")
+
+        return self.catalogs.get(language)
+
+    def init_breakers(self):
+        self.breakers = self.create_breakers(self.config)
+
+    @staticmethod
+    def create_breakers(config):
+        # during telegram outages calls fail fast instead of each one waiting for its timeout
+        return CircuitBreakers(config.get("circuit_threshold", DEFAULT_CIRCUIT_THRESHOLD),
+                               config.get("circuit_cooldown", DEFAULT_CIRCUIT_COOLDOWN))
+
+    def init_transport(self):
+        self.transport = Transport(
+            self.config.get("api_pool_size", DEFAULT_API_POOL_SIZE),
+            self.config.get("api_connect_timeout", DEFAULT_API_CONNECT_TIMEOUT),
+            self.config.get("api_read_timeout", DEFAULT_API_READ_TIMEOUT),
+            self.config.get("api_long_poll_timeout", DEFAULT_API_LONG_POLL_TIMEOUT),
+            self.config.get("api_keep_alive", True),
+            self.config.get("api_proxy")
+        )
+        self.transport.apply()
 
     def init_bot(self, invoker):
         self.log.info("creating bot")
         self.bot = invoker(self.config["token"])
 
-        self.log.debug("setting bot commands")
-        self.bot.set_my_commands(self.default_commands)
+        self.set_commands()
 
         self.log.debug("registering bot message handlers")
-        self.bot.register_message_handler(self.cmd_start, commands=['start'])
-        self.bot.register_message_handler(self.cmd_help, commands=['help'])
-        self.bot.register_message_handler(self.cmd_menu, commands=['karte'])
-        self.bot.register_message_handler(self.cmd_show_dates, commands=["termine"])
+        # all commands share one handler, which looks them up in the router
+        self.bot.register_message_handler(self.tracked(self.dispatch), commands=self.router.names())
+
+        self.bot.register_poll_answer_handler(self.tracked(self.handle_poll_answer), func=lambda answer: True)
+        self.bot.register_inline_handler(self.tracked(self.handle_inline_query), func=lambda query: True)
+        self.bot.register_chat_member_handler(self.tracked(self.handle_chat_member), func=lambda update: True)
+        self.bot.register_callback_query_handler(self.tracked(self.handle_callback_query), func=lambda call: True)
+
+    def set_commands(self):
+        # clients show the list matching their language, the default one otherwise
+        self.log.debug("setting bot commands")
+        self.bot.set_my_commands(self.bot_commands(self.catalogs.default))
+
+        for language in self.catalogs.languages:
+            self.bot.set_my_commands(self.bot_commands(self.catalogs.get(language)), language_code=language)
+
+    def tracked(self, handler):
+        # running handlers are waited for on shutdown
+        @wraps(handler)
+        def tracked_handler(*args, **kwargs):
+            with self.shutdown.track():
+                return handler(*args, **kwargs)
+        return tracked_handler
+
+    def init_group_admins(self):
+        self.group_admins = self.create_group_admins(self.config)
+
+        if self.group_admins is not None:
+            self.group_admins.refresh_async()
+
+    def create_group_admins(self, config):
+        # optionally, admins of the telegram group are bot admins as well
+        if not config.get("group_admins", False):
+            return None
+
+        self.log.info("treating group admins as bot admins")
+        return GroupAdminCache(
+            lambda: self.safe_exec(self.bot.get_chat_administrators, chat_id=self.config["group"]),
+            config.get("group_admins_ttl", DEFAULT_GROUP_ADMINS_TTL)
+        )
+
+    def init_throttle(self):
+        self.user_throttle, self.chat_throttle = self.create_throttles(self.config)
+
+    @staticmethod
+    def create_throttles(config):
+        # a budget of null disables that throttle
+        def throttle(key, default):
+            budget = config.get(key, default)
+            return Throttle(*budget) if budget else None
 
-        self.bot.register_message_handler(self.acmd_new_alfredo, commands=['newalfredo'])
-        self.bot.register_message_handler(self.acmd_reminder, commands=['reminder'])
-        self.bot.register_message_handler(self.acmd_cancel, commands=['cancel'])
-        self.bot.register_message_handler(self.acmd_announce, commands=['announce'])
+        return throttle("throttle_user", DEFAULT_THROTTLE_USER), throttle("throttle_chat", DEFAULT_THROTTLE_CHAT)
 
-    def init_database(self, dbfile):
-        self.log.info("initializing database")
-        self.db = Database(dbfile)
+    def init_coalescer(self):
+        self.coalescer = self.create_coalescer(self.config)
+
+    def create_coalescer(self, config):
+        window = config.get("coalesce_window", DEFAULT_COALESCE_WINDOW)
+        latest = config.get("coalesce_reply", "first") == "latest"
+
+        return Coalescer(window, latest, self.shutdown) if window else None
+
+    def init_menu(self):
+        self.menu = self.create_menu(self.config)
+
+    def create_menu(self, config):
+        menu_file = config.get("menu_file", DEFAULT_MENU_FILE)
+        self.log.info(f"reading menu from {menu_file}")
+        return MenuCache(menu_file)
+
+    def init_builder(self):
+        self.builder = self.create_builder(self.config)
+
+    def create_builder(self, config):
+        documents = {
+            "menu": config.get("menu_file", DEFAULT_MENU_FILE),
+            "recipes": config.get("recipes_file", DEFAULT_RECIPES_FILE)
+        }
+        return PdfBuilder(documents, path.join(self.tmpdir, "pdf") if self.tmpdir else None)
+
+    def init_database(self, dbfile, storage="sqlite"):
+        self.log.info(f"initializing {storage} storage")
+        self.db = open_storage(storage, dbfile)
+        self.run_maintenance()
+
+    def init_orders(self):
+        self.orders = OrderBook(self.db, self.config.get("order_flush_interval", DEFAULT_ORDER_FLUSH_INTERVAL),
+                                self.config.get("order_batch_size", DEFAULT_ORDER_BATCH_SIZE))
+
+    def init_pages(self):
+        self.pages = self.create_pages(self.config)
+
+    def create_pages(self, config):
+        return DatePages(self.db, config.get("dates_page_size", DEFAULT_DATES_PAGE_SIZE))
+
+    def init_inline(self):
+        self.inline = self.create_inline(self.menu, self.catalogs.default)
+
+    def create_inline(self, menu, catalog):
+        return InlineResults(self.db, menu, lambda dates: self.render_dates(dates, catalog), catalog)
+
+    def init_health(self):
+        self.health = HealthMonitor(
+            self.config.get("health_max_lag", DEFAULT_HEALTH_MAX_LAG),
+            queue_depth=self.handler_queue_depth,
+            running=lambda: self.shutdown.in_flight,
+            db_ping=self.db.ping,
+            stopping=lambda: self.shutdown.stopping,
+            circuits=lambda: self.breakers.metrics(),
+            connections=lambda: self.transport.metrics()
+        )
+
+        # telebot's polling loop calls self.get_updates, so the instance attribute takes precedence
+        get_updates = self.bot.get_updates
+
+        @wraps(get_updates)
+        def monitored_get_updates(*args, **kwargs):
+            try:
+                updates = get_updates(*args, **kwargs)
+            except Exception as ex:
+                self.health.api_error("get_updates", ex)
+                raise
+
+            self.health.polled()
+            return updates
+
+        self.bot.get_updates = monitored_get_updates
+
+        # the endpoint is optional, the monitor is cheap enough to always run
+        self.health_server = None
+        port = self.config.get("health_port", self.health_port)
+        if port is not None:
+            self.health_server = HealthServer(self.health, self.config.get("health_host", "127.0.0.1"), port)
 
     def register_signal_handlers(self):
         self.log.info("registering signal handlers")
         signal.signal(signal.SIGUSR1, self.signal_usr1)
+        signal.signal(signal.SIGHUP, self.signal_hup)
+        signal.signal(signal.SIGTERM, self.signal_term)
 
     def log_command(self, message, admincmd=False):
-        role = "admin" if self.user_is_admin(message.from_user) else "user"
-        if admincmd:
-            self.log.info(f"{role} {util.format_user(message.from_user)} sent admin command '{message.text}'")
+        level = logging.INFO if admincmd else logging.DEBUG
+        # runs for every command, so nothing is computed unless the message is actually logged
+        if not self.log.isEnabledFor(level):
+            return
+
+        user = message.from_user
+        self.log.log(
+            level,
+            "%s %s sent %s '%s'",
+            Lazy(lambda: "admin" if self.user_is_admin(user) else "user"),
+            Lazy(util.format_user, user),
+            "admin command" if admincmd else "command",
+            message.text,
+            extra={"fields": {"user_id": user.id, "chat_id": message.chat.id}}
+        )
+
+    def dispatch(self, message):
+        command, args = self.router.resolve(message.text)
+
+        if command is None:
+            self.log.debug("ignoring unknown command '%s'", message.text)
+            return
+
+        if not self.throttle_allows(message):
+            return
+
+        if command.admin:
+            self.dispatch_admin(message, command, args)
         else:
-            self.log.debug(f"{role} {util.format_user(message.from_user)} sent command '{message.text}'")
+            self.log_command(message)
+            self.dispatch_user(message, command, args)
+
+    def dispatch_user(self, message, command, args):
+        if not command.idempotent or self.coalescer is None:
+            self.call_handler(message, command, args)
+            return
+
+        # replies before and after a change of the dates or the language differ, so they are never coalesced
+        key = (message.chat.id, command.name, " ".join(args.split()) if args else "", self.db.version,
+               self.catalog(message.chat.id).language)
+        self.coalescer.submit(key, message, lambda m: self.call_handler(m, command, args))
+
+    def throttle_allows(self, message):
+        checks = [(self.user_throttle, message.from_user.id), (self.chat_throttle, message.chat.id)]
+        checks = [(throttle, key) for throttle, key in checks if throttle is not None]
+
+        if not checks or self.user_is_admin(message.from_user):
+            return True
+
+        for throttle, key in checks:
+            result = throttle.check(key)
+
+            if result == ALLOW:
+                continue
+
+            self.log.debug("throttled %s: '%s'", Lazy(util.format_user, message.from_user), message.text)
+
+            if result == WARN and self.config.get("throttle_warn", True):
+                self.safe_exec(self.bot.reply_to, message=message,
+                               text=util.failure(self.catalog(message.chat.id).text("throttled")))
+            return False
+
+        return True
+
+    @util.admin_command_check()
+    def dispatch_admin(self, message, command, args):
+        self.call_handler(message, command, args)
+
+    def call_handler(self, message, command, args):
+        try:
+            params = command.parse(args)
+        except ArgumentError as err:
+            self.send_error(message, self.catalog(message.chat.id).message(err.key, err.fields))
+            return
+
+        getattr(self, command.handler)(message, *params)
 
     def send_error(self, reply_to, errmsg):
-        self.log.info(f"sending error reply message to {util.format_user(reply_to.from_user)}: '{errmsg}'")
+        self.log.info("sending error reply message to %s: '%s'", Lazy(util.format_user, reply_to.from_user), errmsg)
         self.safe_exec(
             self.bot.reply_to,
             message=reply_to,
-            text=util.failure(f"Fehler: {errmsg}")
+            text=util.failure(self.catalog(reply_to.chat.id).format("error", error=errmsg))
         )
 
+    @staticmethod
+    def error_text(catalog, ex):
+        # exceptions of the bot itself are translated, the ones of telegram are shown as they are
+        if isinstance(ex, CircuitOpenError):
+            return catalog.format("api_unreachable", circuit=ex.circuit)
+
+        return ex
+
     def user_is_admin(self, user):
-        return user.id in self.config["admins"]
+        if user.id in self.config.admins:
+            return True
+
+        return self.group_admins is not None and user.id in self.group_admins.get()
 
     def safe_exec(self, func, reraise=False, **kwargs):
-        self.log.debug(f"safe_exec for {func.__name__}")
+        self.api_log.debug("safe_exec for %s", func.__name__, extra={"fields": {"method": func.__name__}})
+        breaker = self.breakers.get(func.__name__)
+
+        if not breaker.allow():
+            self.api_log.debug("circuit %s is open, skipping %s", breaker.name, func.__name__)
+
+            if reraise:
+                raise CircuitOpenError(breaker.name)
+            return None
 
         try:
-            return func(**kwargs)
+            result = func(**kwargs)
         except Exception as ex:
-            self.log.error(f"Telegram API Exception: {ex}")
+            self.api_log.error("Telegram API Exception: %s", ex, extra={"fields": {"method": func.__name__}})
+            self.health.api_error(func.__name__, ex)
+
+            if is_outage(ex):
+                breaker.failure()
+            else:
+                breaker.success()
 
             if reraise:
                 raise ex
+            return None
 
-    def cmd_start(self, message):
-        self.log_command(message)
+        breaker.success()
+        return result
+
+    def static_text(self, message, name):
+        # admins get the variant with admin information in private chats
+        texts = self.static_texts[self.catalog(message.chat.id).language]
 
-        msg = "Mamma Mia!\n\n"
-        msg += "Der AlfredoBot versorgt dich mit allen Informationen rund um die beste Pizza der Welt.\n\n"
-        msg += util.li("Verfügbare Kommandos: siehe /help")
-        msg += util.li("Maintainer: @TriviaThorsten")
-        msg += util.li(f"Version: {util.get_version()}")
-        msg += util.li("Bugreports: https://github.com/TarEnethil/alfredo/issues")
+        if message.chat.type == "private" and self.user_is_admin(message.from_user):
+            return texts[f"{name}_admin"]
 
-        if self.user_is_admin(message.from_user) and message.chat.type == "private":
-            msg += "\n\nDu bist ein Admin!"
+        return texts[name]
 
-        self.safe_exec(self.bot.reply_to, message=message, text=msg, disable_web_page_preview=True)
+    def cmd_start(self, message):
+        self.safe_exec(self.bot.reply_to, message=message, text=self.static_text(message, "start"),
+                       disable_web_page_preview=True)
 
     def cmd_help(self, message):
-        self.log_command(message)
+        self.safe_exec(self.bot.reply_to, message=message, text=self.static_text(message, "help"))
+
+    def cmd_language(self, message, language=None):
+        catalog = self.catalog(message.chat.id)
 
-        msg = "Verfügbare Kommandos:\n"
+        if language is None:
+            languages = ", ".join(self.catalogs.languages)
+            msg = catalog.format("language", language=catalog.name, languages=languages)
+            self.safe_exec(self.bot.reply_to, message=message, text=msg)
+            return
+
+        # in groups, the language is changed for everyone
+        if message.chat.type != "private" and not self.user_is_admin(message.from_user):
+            self.send_error(message, catalog.text("not_admin"))
+            return
 
-        for cmd in self.default_commands:
-            msg += util.li(f"/{cmd.command}: {cmd.description}")
+        self.db.set_state(f"language:{message.chat.id}", language)
+        self.chat_languages[str(message.chat.id)] = language
 
-        if self.user_is_admin(message.from_user) and message.chat.type == "private":
-            msg += "\nAdminkommandos:\n"
-            for cmd in self.admin_commands:
-                msg += util.li(f"/{cmd.command} {cmd.description}")
+        # the board is shown in the language of the group
+        if str(message.chat.id) == str(self.config["group"]):
+            self.update_board()
 
+        msg = util.success(self.catalogs.get(language).text("language_set"))
         self.safe_exec(self.bot.reply_to, message=message, text=msg)
 
-    def cmd_menu(self, message):
-        self.log_command(message)
+    def send_pdf(self, message, name, link):
+        # serve our own build if there is one for the current sources, otherwise link to the release
+        pdf = self.builder.cached_pdf(name) if self.builder.cache_dir else None
 
-        url = "https://github.com/TarEnethil/alfredo/releases/latest/download/menu.pdf"
+        if pdf is None:
+            self.safe_exec(self.bot.reply_to, message=message, text=link, parse_mode="HTML")
+            return
+
+        file_id = self.builder.get_file_id(pdf)
+        kwargs = {
+            "chat_id": message.chat.id,
+            "reply_to_message_id": message.message_id,
+            "visible_file_name": f"{name}.pdf"
+        }
+
+        if file_id is not None:
+            self.log.debug(f"sending {name} by file_id")
+            self.safe_exec(self.bot.send_document, document=file_id, **kwargs)
+            return
+
+        with open(pdf, "rb") as document:
+            sent = self.safe_exec(self.bot.send_document, document=document, **kwargs)
+
+        if sent is not None:
+            self.builder.set_file_id(pdf, sent.document.file_id)
+
+    def cmd_menu(self, message, mode=None):
+        catalog = self.catalog(message.chat.id)
+        url = f"{RELEASE_URL}/menu.pdf"
+        link = f'<a href="{url}">{catalog.text("menu_link")}</a>'
+
+        if mode == "pdf":
+            self.send_pdf(message, "menu", link)
+            return
+
+        try:
+            menu = self.menu.get()
+        except Exception as ex:
+            self.log.error(f"could not read menu: {ex}")
+            menu = None
+
+        # without a readable menu.tex, only the link to the release can be sent
+        msg = f"{menu.text(catalog.choices('menu_markers'))}\n\n{link}" if menu is not None else link
 
-        msg = f"Link zur aktuellen Karte: [Link]({url})"
         self.safe_exec(
            self.bot.reply_to,
            message=message,
            text=msg,
            disable_web_page_preview=True,
-           parse_mode="MarkdownV2"
+           parse_mode="HTML"
         )
 
+    def cmd_recipes(self, message):
+        text = self.catalog(message.chat.id).text("recipes_link")
+        self.send_pdf(message, "recipes", f'<a href="{RELEASE_URL}/recipes.pdf">{text}</a>')
+
     def cmd_show_dates(self, message):
-        self.log_command(message)
+        catalog = self.catalog(message.chat.id)
+        msg, keyboard = self.pages.get(catalog.language, lambda page: self.render_page(page, catalog))
 
-        dates = self.db.get_future_dates()
+        self.safe_exec(self.bot.reply_to, message=message, text=msg, reply_markup=keyboard)
+
+    def render_page(self, page, catalog):
+        # returns the text and the navigation buttons (None if everything fits on one page)
+        if not page.has_prev and not page.has_next:
+            return self.render_dates(page.dates, catalog), None
+
+        msg = catalog.format("dates_page", start=page.offset + 1, end=page.offset + len(page.dates), count=page.total)
+        msg += "\n\n"
+
+        for date_ in page.dates:
+            msg += util.li(catalog.date(date_.date))
+
+        buttons = []
+        if page.has_prev:
+            buttons.append(InlineKeyboardButton(catalog.text("page_back"),
+                                                callback_data=f"dates:before:{page.dates[0].date.isoformat()}"))
+        if page.has_next:
+            buttons.append(InlineKeyboardButton(catalog.text("page_next"),
+                                                callback_data=f"dates:after:{page.dates[-1].date.isoformat()}"))
+
+        keyboard = InlineKeyboardMarkup()
+        keyboard.row(*buttons)
+
+        return msg, keyboard
+
+    def render_dates(self, dates, catalog=None):
+        # inline queries don't belong to a chat, they use the default language
+        catalog = catalog or self.catalogs.default
         num = len(dates)
 
         if num == 0:
-            msg = f"Es wurden keine weiteren Termine angekündigt {util.emoji('frowning')}"
+            msg = catalog.text("dates_none")
         elif num == 1:
-            msg = f"Der (einzige) nächste Termin ist am {util.format_date(dates[0].date)}."
+            msg = catalog.format("dates_one", date=catalog.date(dates[0].date))
         else:
-            msg = f"Die nächsten {len(dates)} Termine:\n\n"
+            msg = f"{catalog.format('dates_many', count=num)}\n\n"
 
             for date_ in dates:
-                msg += f"{util.emoji('bullet')} {util.format_date(date_.date)}\n"
+                msg += util.li(catalog.date(date_.date))
 
-        self.safe_exec(self.bot.reply_to, message=message, text=msg)
+        return msg
 
-    @util.admin_command_check()
-    def acmd_new_alfredo(self, message):
-        params = message.text.strip().split(" ")
+    def render_board(self, rows):
+        catalog = self.catalog(self.config["group"])
 
-        if len(params) != 2:
-            self.send_error(message, f"Befehl erwartet nur einen Parameter, geparsed wurden {len(params) - 1}")
-            return
+        if len(rows) == 0:
+            return catalog.text("dates_none")
 
-        try:
-            date_ = date.fromisoformat(params[1])
-        except ValueError as verr:
-            self.send_error(message, f"String konnte nicht in ein Datum konvertiert werden: {verr}")
+        msg = f"{catalog.text('board')}\n\n"
+
+        # the stored description is the poll question, which repeats the date in the language of its creation
+        for row in rows:
+            msg += util.li(catalog.format("board_date", date=catalog.date(row.date), attendees=row.attendees))
+
+        return msg
+
+    @staticmethod
+    def format_statistic(catalog, held, attendees):
+        average = attendees / held if held > 0 else 0
+        key = "statistic_one" if held == 1 else "statistic"
+        return catalog.format(key, held=held, attendees=attendees, average=average)
+
+    def cmd_statistics(self, message):
+        years = {}
+        months = []
+
+        # the summary table has at most one row per month, so this does not grow with the number of dates
+        for row in self.db.get_statistics():
+            held, attendees, cancelled = years.get(row.year, (0, 0, 0))
+            years[row.year] = (held + row.held, attendees + row.attendees, cancelled + row.cancelled)
+
+            if row.held > 0:
+                months.append(row)
+
+        catalog = self.catalog(message.chat.id)
+
+        if len(months) == 0:
+            self.safe_exec(self.bot.reply_to, message=message, text=catalog.text("statistics_none"))
             return
 
+        msg = f"{catalog.text('statistics')}\n\n{catalog.text('statistics_years')}\n"
+
+        for year, (held, attendees, cancelled) in years.items():
+            statistic = self.format_statistic(catalog, held, attendees)
+            msg += util.li(catalog.format("statistics_year", year=year, statistic=statistic, cancelled=cancelled))
+
+        msg += f"\n{catalog.text('statistics_months')}\n"
+
+        for row in months[-6:]:
+            month = catalog.month(row.year, row.month)
+            msg += util.li(f"{month}: {self.format_statistic(catalog, row.held, row.attendees)}")
+
+        self.safe_exec(self.bot.reply_to, message=message, text=msg)
+
+    def acmd_new_alfredo(self, message, date_):
         today = date.today()
+        # replies are in the language of the admin's chat, everything posted in the group in the group's
+        catalog = self.catalog(message.chat.id)
+        group = self.catalog(self.config["group"])
 
         if date_ <= today:
-            self.send_error(message, "Datum darf frühstens heute sein.")
+            self.send_error(message, catalog.text("new_date_past"))
             return
 
         if self.db.get_by_date(date_) is not None:
-            msg = f"An diesem Termin ist bereits ein Alfredo eingetragen ({util.format_date(date_)})"
-            self.send_error(message, msg)
+            self.send_error(message, catalog.format("new_date_exists", date=catalog.date(date_)))
             return
 
-        description = f"Alfredo am {util.format_date(date_)} (18:00 Uhr)"
+        description = group.format("poll", date=group.date(date_))
 
         msg = ""
 
@@ -205,19 +799,20 @@ class BotRunner:
                 reraise=True,
                 chat_id=self.config["group"],
                 question=description,
-                options=["Teilnahme", "Teilnahme (+1 Gast)"],
+                options=list(group.choices("poll_options")),
                 is_anonymous=False
             )
-            msg += util.li(util.success("Umfrage erstellt"))
+            msg += util.li(util.success(catalog.text("poll_created")))
         except Exception as ex:
             # early exit
-            self.send_error(message, f"Telegram API meldete einen Fehler: {ex}")
+            self.send_error(message, catalog.format("api_error", error=self.error_text(catalog, ex)))
             return
 
-        self.db.create_alfredo_date(date_, description, poll.message_id)
+        self.db.create_alfredo_date(date_, description, poll.message_id, poll.poll.id,
+                                    actor=self.actor(message.from_user))
 
         file = util.generate_ics_file(self.tmpdir, date_)
-        text = f'.ics für {util.format_date(date_)}'
+        text = group.format("ics", date=group.date(date_))
 
         try:
             self.safe_exec(
@@ -229,50 +824,156 @@ class BotRunner:
                 document=open(file, 'rb'),
                 disable_notification=True,
             )
-            msg += util.li(util.success(".ics File gesendet"))
+            msg += util.li(util.success(catalog.text("ics_sent")))
         except Exception as ex:
-            msg += util.li(util.failure(f".ics File gesendet ({ex})"))
+            msg += util.li(util.failure(catalog.format("ics_failed", error=self.error_text(catalog, ex))))
+
+        if self.config.get("orders", False):
+            msg += self.post_order(date_, poll.message_id, catalog)
 
         self.do_pinning()
 
         self.safe_exec(self.bot.reply_to, message=message, text=msg)
 
-    @util.admin_command_check()
-    def acmd_reminder(self, message):
-        sent = self.reminder_internal(message)
+    def post_order(self, date_, reply_to_message_id, catalog):
+        group = self.catalog(self.config["group"])
+        keyboard = self.order_keyboard(date_, group)
 
-        if sent:
-            self.safe_exec(self.bot.reply_to, message=message, text=util.success("Erinnerung gesendet"))
+        # without a readable menu the message would only have the button to clear the order
+        if keyboard is None:
+            self.log.warning(f"no order posted for {date_}, the menu has no items of the order groups")
+            return util.li(util.failure(catalog.text("order_unavailable")))
 
-    @util.admin_command_check()
-    def acmd_cancel(self, message):  # noqa: C901
-        params = message.text.strip().split(" ")
+        try:
+            self.safe_exec(
+                self.bot.send_message,
+                reraise=True,
+                chat_id=self.config["group"],
+                text=group.format("order", date=group.date(date_)),
+                reply_to_message_id=reply_to_message_id,
+                reply_markup=keyboard,
+                disable_notification=True
+            )
+        except Exception as ex:
+            return util.li(util.failure(catalog.format("order_failed", error=self.error_text(catalog, ex))))
 
-        if len(params) != 2:
-            self.send_error(message, f"Befehl erwartet nur einen Parameter, geparsed wurden {len(params) - 1}")
-            return
+        return util.li(util.success(catalog.text("order_sent")))
 
+    def order_items(self):
         try:
-            date_ = date.fromisoformat(params[1])
-        except ValueError as verr:
-            self.send_error(message, f"String konnte nicht in ein Datum konvertiert werden: {verr}")
+            menu = self.menu.get()
+        except Exception as ex:
+            self.log.error(f"could not read menu: {ex}")
+            menu = None
+
+        if menu is None:
+            return []
+
+        groups = self.config.get("order_groups", DEFAULT_ORDER_GROUPS)
+        return [item.name for group in menu.groups if group.name in groups for item in group.items]
+
+    def order_keyboard(self, date_, catalog):
+        # the button of an item carries the date and the name, so taps need neither state nor the database,
+        # returns None if nothing can be ordered
+        prefix = f"order:{date_.isoformat()}:"
+        buttons = []
+
+        for name in self.order_items():
+            data = f"{prefix}{name}"
+
+            if len(data.encode("utf-8")) > CALLBACK_DATA_LIMIT:
+                self.log.warning(f"'{name}' is too long for a button, it can't be ordered")
+                continue
+
+            buttons.append(InlineKeyboardButton(name, callback_data=data))
+
+        if not buttons:
+            return None
+
+        keyboard = InlineKeyboardMarkup(row_width=2)
+        keyboard.add(*buttons)
+        keyboard.row(InlineKeyboardButton(catalog.text("order_clear"), callback_data=prefix))
+
+        return keyboard
+
+    def acmd_orders(self, message, date_=None):
+        catalog = self.catalog(message.chat.id)
+
+        if date_ is None:
+            dates = self.db.get_future_dates()
+
+            if len(dates) == 0:
+                self.send_error(message, catalog.text("dates_none"))
+                return
+
+            date_ = dates[0].date
+        elif self.db.get_by_date(date_) is None:
+            self.send_error(message, catalog.format("cancel_none", date=catalog.date(date_)))
+            return
+
+        # the summary is read from memory, flushing just makes sure the database agrees with it
+        self.orders.flush()
+        totals, users = self.orders.summary(date_)
+
+        if users == 0:
+            self.safe_exec(self.bot.reply_to, message=message,
+                           text=catalog.format("orders_none", date=catalog.date(date_)))
             return
 
+        msg = f"{catalog.format('orders', date=catalog.date(date_), users=users)}\n\n"
+
+        for item, count in totals.most_common():
+            msg += util.li(f"{count}× {item}")
+
+        msg += f"\n{catalog.format('orders_total', total=sum(totals.values()))}"
+
+        self.safe_exec(self.bot.reply_to, message=message, text=msg)
+
+    def acmd_reminder(self, message):
+        sent = self.reminder_internal(message)
+
+        if sent:
+            text = util.success(self.catalog(message.chat.id).text("reminder_sent"))
+            self.safe_exec(self.bot.reply_to, message=message, text=text)
+
+    def acmd_cancel(self, message, date_range):
+        start, end = date_range
         today = date.today()
+        catalog = self.catalog(message.chat.id)
 
-        if date_ <= today:
-            self.send_error(message, "Man kann nur Termine in der Zukunft absagen")
+        if start <= today:
+            self.send_error(message, catalog.text("cancel_past"))
             return
 
-        row = self.db.get_by_date(date_)
-        if row is None:
-            msg = f"An diesem Termin ist kein Alfredo eingetragen ({util.format_date(date_)})"
+        rows = self.db.get_dates_between(start, end)
+        if len(rows) == 0:
+            if start == end:
+                msg = catalog.format("cancel_none", date=catalog.date(start))
+            else:
+                msg = catalog.format("cancel_none_between", start=catalog.date(start), end=catalog.date(end))
             self.send_error(message, msg)
             return
 
+        # the calls for different dates are independent, the number of workers bounds the load on the API
+        workers = min(len(rows), self.config.get("api_workers", DEFAULT_API_WORKERS))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cancel") as pool:
+            results = list(pool.map(lambda row: self.cancel_date(row, catalog), rows))
+
+        self.db.delete_dates(rows, actor=self.actor(message.from_user))
+        self.orders.discard({row.date for row in rows})
+        self.do_pinning()
+
+        msg = ""
+        for row, result in zip(rows, results):
+            msg += f"{catalog.date(row.date)}:\n{result}{util.li(util.success(catalog.text('cancel_removed')))}"
+
+        self.safe_exec(self.bot.reply_to, message=message, text=msg)
+
+    def cancel_date(self, row, catalog):
+        group = self.catalog(self.config["group"])
         msg = ""
         try:
-            text = f"Der Alfredo am {util.format_date(row.date)} wurde leider abgesagt {util.emoji('frowning')}"
+            text = group.format("cancel_message", date=group.date(row.date))
             self.safe_exec(
                 self.bot.send_message,
                 reraise=True,
@@ -280,9 +981,9 @@ class BotRunner:
                 text=text,
                 reply_to_message_id=row.message_id
             )
-            msg += util.li(util.success("Absage gesendet"))
+            msg += util.li(util.success(catalog.text("cancel_sent")))
         except Exception as ex:
-            msg += util.li(util.failure(f"Absage gesendet ({ex})"))
+            msg += util.li(util.failure(catalog.format("cancel_failed", error=self.error_text(catalog, ex))))
 
         try:
             self.safe_exec(
@@ -291,26 +992,14 @@ class BotRunner:
                 chat_id=self.config["group"],
                 message_id=row.message_id
             )
-            msg += util.li(util.success("Umfrage gestoppt"))
+            msg += util.li(util.success(catalog.text("cancel_poll_stopped")))
         except Exception as ex:
-            msg += util.li(util.failure(f"Umfrage gestoppt ({ex})"))
+            msg += util.li(util.failure(catalog.format("cancel_poll_failed", error=self.error_text(catalog, ex))))
 
-        self.db.delete_date(row)
-        msg += util.li(util.success("Aus Datenbank entfernt"))
+        return msg
 
-        self.do_pinning()
-
-        self.safe_exec(self.bot.reply_to, message=message, text=msg)
-
-    @util.admin_command_check()
-    def acmd_announce(self, message):
-        params = message.text.strip().split(" ")
-
-        if len(params) < 2:
-            self.send_error(message, "Befehl benötigt Parameter")
-            return
-
-        announcement = f"{util.emoji('megaphone')} {' '.join(params[1:])}"
+    def acmd_announce(self, message, text):
+        announcement = f"{util.emoji('megaphone')} {text}"
 
         try:
             self.safe_exec(
@@ -321,10 +1010,183 @@ class BotRunner:
                 disable_web_page_preview=True
             )
         except Exception as ex:
-            self.send_error(message, f"Telegram API meldete einen Fehler: {ex}")
+            catalog = self.catalog(message.chat.id)
+            self.send_error(message, catalog.format("api_error", error=self.error_text(catalog, ex)))
+            return
+
+        self.db.audit(self.actor(message.from_user), ANNOUNCE, details={"text": text})
+
+        text = util.success(self.catalog(message.chat.id).text("announce_sent"))
+        self.safe_exec(self.bot.reply_to, message=message, text=text)
+
+    def acmd_audit(self, message, date_=None):
+        catalog = self.catalog(message.chat.id)
+
+        if date_ is not None:
+            self.audit_state(message, catalog, date_)
+            return
+
+        entries = self.db.get_audit(self.config.get("audit_entries", DEFAULT_AUDIT_ENTRIES))
+
+        if len(entries) == 0:
+            self.safe_exec(self.bot.reply_to, message=message, text=catalog.text("audit_none"))
+            return
+
+        msg = f"{catalog.text('audit')}\n\n"
+
+        for entry in entries:
+            action = f"/{entry.action} {entry.date.isoformat()}" if entry.date else f"/{entry.action}"
+            msg += util.li(f"{entry.created_at:%Y-%m-%d %H:%M} {entry.user_name}: {action}")
+
+        self.safe_exec(self.bot.reply_to, message=message, text=msg)
+
+    def audit_state(self, message, catalog, date_):
+        # the dates that were announced and not cancelled at the end of date_, reconstructed from the log
+        entry_id, state = self.db.get_audit_state(datetime.combine(date_, datetime.max.time()))
+
+        if entry_id is None:
+            text = catalog.format("audit_state_none", date=catalog.date(date_))
+        else:
+            # past dates are archived without an audit entry, so only the upcoming ones are of interest
+            upcoming = sorted(day for day in state if day >= date_.isoformat())
+
+            if upcoming:
+                text = f"{catalog.format('audit_state', date=catalog.date(date_))}\n\n"
+                text += "".join(util.li(catalog.date(date.fromisoformat(day))) for day in upcoming)
+            else:
+                text = catalog.format("audit_state_empty", date=catalog.date(date_))
+
+        self.safe_exec(self.bot.reply_to, message=message, text=text)
+
+    def acmd_rebuild_statistics(self, message):
+        self.db.rebuild_statistics()
+
+        text = util.success(self.catalog(message.chat.id).text("statistics_rebuilt"))
+        self.safe_exec(self.bot.reply_to, message=message, text=text)
+
+    def acmd_rebuild(self, message):
+        catalog = self.catalog(message.chat.id)
+
+        if self.builder.cache_dir is None:
+            self.send_error(message, catalog.text("rebuild_no_dir"))
             return
 
-        self.safe_exec(self.bot.reply_to, message=message, text=util.success("Ankündigung gesendet"))
+        # the report is sent after the command returned, so the build is tracked separately
+        self.shutdown.begin()
+
+        def report(results):
+            try:
+                self.report_build(message, results)
+            finally:
+                self.shutdown.end()
+
+        if not self.builder.build_all_async(report):
+            self.shutdown.end()
+            self.send_error(message, catalog.text("rebuild_running"))
+            return
+
+        self.safe_exec(self.bot.reply_to, message=message, text=util.success(catalog.text("rebuild_started")))
+
+    def report_build(self, message, results):
+        catalog = self.catalog(message.chat.id)
+        msg = ""
+
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                msg += util.li(util.failure(catalog.format("build_failed", name=name, error=result)))
+            elif result[1]:
+                msg += util.li(util.success(catalog.format("build_rebuilt", name=name)))
+            else:
+                msg += util.li(util.success(catalog.format("build_unchanged", name=name)))
+
+        self.safe_exec(self.bot.reply_to, message=message, text=msg)
+
+    def handle_poll_answer(self, answer):
+        # option 0: "Teilnahme", option 1: "Teilnahme (+1 Gast)", no options: vote retracted
+        if len(answer.option_ids) == 0:
+            guests = None
+        else:
+            guests = 1 if 1 in answer.option_ids else 0
+
+        if self.db.set_attendance(answer.poll_id, answer.user.id, guests):
+            self.log.debug("%s voted %s in poll %s", Lazy(util.format_user, answer.user), answer.option_ids,
+                           answer.poll_id)
+            self.update_board()
+
+    def handle_inline_query(self, query):
+        self.log.debug("inline query '%s' from %s", query.query, Lazy(util.format_user, query.from_user))
+
+        self.safe_exec(
+            self.bot.answer_inline_query,
+            inline_query_id=query.id,
+            results=self.inline.get(query.query),
+            cache_time=self.config.get("inline_cache_time", DEFAULT_INLINE_CACHE_TIME),
+            is_personal=False
+        )
+
+    def handle_callback_query(self, call):
+        prefix, _, data = (call.data or "").partition(":")
+        handler = self.callbacks.get(prefix)
+
+        if handler is None:
+            self.log.debug(f"ignoring unknown callback data '{call.data}'")
+            # without an answer, the client shows a loading indicator on the button
+            self.safe_exec(self.bot.answer_callback_query, callback_query_id=call.id)
+            return
+
+        getattr(self, handler)(call, data)
+
+    def handle_order(self, call, data):
+        # answered within Telegram's deadline for callbacks, the database is written later in batches
+        catalog = self.catalog(call.message.chat.id)
+        day, _, item = data.partition(":")
+
+        try:
+            date_ = date.fromisoformat(day)
+        except ValueError:
+            date_ = None
+
+        if date_ is None or not self.orders.is_open(date_):
+            text = catalog.text("order_closed")
+        elif item == "":
+            self.orders.clear(date_, call.from_user.id)
+            text = catalog.text("order_empty")
+        elif item not in self.order_items():
+            text = catalog.text("order_unknown")
+        else:
+            order = self.orders.add(date_, call.from_user.id, item)
+            text = catalog.format("order_current", order=", ".join(f"{n}× {i}" for i, n in order.items()))
+
+        self.safe_exec(self.bot.answer_callback_query, callback_query_id=call.id, text=text)
+
+    def handle_dates_page(self, call, data):
+        catalog = self.catalog(call.message.chat.id)
+        direction, _, day = data.partition(":")
+
+        try:
+            anchor = {direction: date.fromisoformat(day)} if direction in ["after", "before"] else {}
+        except ValueError:
+            anchor = {}
+
+        msg, keyboard = self.pages.get(catalog.language, lambda page: self.render_page(page, catalog), **anchor)
+
+        # the page is edited in place, editing without a change is an error for telegram
+        if msg != call.message.text:
+            self.safe_exec(self.bot.edit_message_text, chat_id=call.message.chat.id,
+                           message_id=call.message.message_id, text=msg, reply_markup=keyboard)
+
+        self.safe_exec(self.bot.answer_callback_query, callback_query_id=call.id)
+
+    def handle_chat_member(self, update):
+        if self.group_admins is None or str(update.chat.id) != str(self.config["group"]):
+            return
+
+        was_admin = update.old_chat_member.status in ADMIN_STATUSES
+        is_admin = update.new_chat_member.status in ADMIN_STATUSES
+
+        if was_admin != is_admin:
+            self.log.info("admin status of %s changed", Lazy(util.format_user, update.new_chat_member.user))
+            self.group_admins.invalidate()
 
     def signal_usr1(self, signum, frame):
         self.log.debug(f"Received signal {signum}, triggering reminder and cleanup functions")
@@ -335,19 +1197,37 @@ class BotRunner:
 
         # logging inside
         self.do_pinning()
+        self.run_maintenance()
+
+    def signal_hup(self, signum, frame):
+        self.log.debug(f"Received signal {signum}, reloading config")
+
+        # logging inside
+        self.reload_config()
+
+    def signal_term(self, signum, frame):
+        if not self.shutdown.request():
+            self.log.info(f"Received signal {signum}, already shutting down")
+            return
+
+        # polling ends after the current getUpdates call, draining happens in run()
+        self.log.info(f"Received signal {signum}, shutting down")
+        self.bot.stop_polling()
 
     def reminder_internal(self, message=None):
         tomorrow = date.today() + timedelta(days=1)
 
+        catalog = self.catalog(message.chat.id) if message is not None else None
+        group = self.catalog(self.config["group"])
+
         row = self.db.get_by_date(tomorrow)
         if row is None:
             if message is not None:
-                msg = f"Für den morgigen Tag ist kein Alfredo angekündigt ({util.format_date(tomorrow)})"
-                self.send_error(message, msg)
+                self.send_error(message, catalog.format("reminder_none", date=catalog.date(tomorrow)))
             return False
 
         try:
-            text = f"Attenzione!\n\n{util.get_reminder()}"
+            text = group.format("reminder", reminder=group.random("reminders"))
             self.safe_exec(
                 self.bot.send_message,
                 reraise=True,
@@ -357,14 +1237,27 @@ class BotRunner:
             )
         except Exception as ex:
             if message is not None:
-                self.send_error(message, f"Telegram API meldete einen Fehler: ({ex})")
+                self.send_error(message, catalog.format("api_error", error=self.error_text(catalog, ex)))
             else:
                 self.log.error(f"Telegram API error when sending reminder for tomorrow: ({ex})")
             return False
 
+        # reminders on SIGUSR1 are sent by the bot itself
+        actor = self.actor(message.from_user) if message is not None else SYSTEM
+        self.db.audit(actor, REMINDER, tomorrow)
+
         return True
 
+    @staticmethod
+    def actor(user):
+        return Actor(user.id, util.format_user(user))
+
     def do_pinning(self):
+        # the board stays pinned instead of the poll of the next date
+        if self.config.get("board", False):
+            self.update_board()
+            return
+
         dates = self.db.get_future_dates()
 
         chat = self.safe_exec(
@@ -410,6 +1303,115 @@ class BotRunner:
                 message_id=chat.pinned_message.message_id
             )
 
+    def update_board(self):
+        # returns True if the board message was posted or edited
+        if not self.config.get("board", False):
+            return False
+
+        text = self.render_board(self.db.get_future_attendance())
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+        with self.board_lock:
+            message_id = self.db.get_state("board_message_id")
+
+            if message_id is not None and self.db.get_state("board_hash") == digest:
+                return False
+
+            if message_id is not None:
+                try:
+                    self.safe_exec(self.bot.edit_message_text, reraise=True, chat_id=self.config["group"],
+                                   message_id=int(message_id), text=text)
+                except Exception as ex:
+                    # on other errors the hash stays outdated, so the next update tries again
+                    if "message to edit not found" not in str(ex):
+                        return False
+
+                    self.log.warning("board message was deleted, posting a new one")
+                    message_id = None
+
+            if message_id is None:
+                message_id = self.post_board(text)
+
+                if message_id is None:
+                    return False
+
+            self.db.set_state("board_message_id", str(message_id))
+            self.db.set_state("board_hash", digest)
+
+        self.log.debug(f"updated board message {message_id}")
+        return True
+
+    def post_board(self, text):
+        message = self.safe_exec(self.bot.send_message, chat_id=self.config["group"], text=text,
+                                 disable_notification=True)
+
+        if message is None:
+            return None
+
+        self.log.info(f"posted board message {message.message_id}")
+        self.safe_exec(
+            self.bot.pin_chat_message,
+            chat_id=self.config["group"],
+            message_id=message.message_id,
+            disable_notification=True
+        )
+
+        return message.message_id
+
+    def run_maintenance(self):
+        # keep alfredo_date small by moving past dates to the archive,
+        # compaction only pays off if rows were actually removed
+        try:
+            if self.db.archive_past_dates() > 0:
+                self.db.compact()
+        except Exception as ex:
+            self.log.error(f"Database maintenance failed: {ex}")
+
     def run(self):
-        self.log.info("bot starts polling now")
-        self.bot.infinity_polling()
+        if self.health_server is not None:
+            self.health_server.start()
+
+        # catches up on changes made while the bot was not running
+        self.update_board()
+
+        # a signal during startup already stopped polling, infinity_polling would start it again and keep running
+        if self.shutdown.stopping:
+            self.log.info("shutdown requested before polling started")
+        else:
+            self.log.info("bot starts polling now")
+            # chat_member updates are only sent if requested explicitly
+            self.bot.infinity_polling(allowed_updates=telebot.util.update_types, **self.transport.polling_kwargs())
+
+        if self.shutdown.stopping:
+            self.finish_shutdown()
+
+    def handler_queue_depth(self):
+        # updates fetched by polling, but not yet picked up by one of telebot's worker threads
+        pool = getattr(self.bot, "worker_pool", None)
+        return pool.tasks.qsize() if pool is not None else 0
+
+    def finish_shutdown(self):
+        timeout = self.config.get("shutdown_timeout", DEFAULT_SHUTDOWN_TIMEOUT)
+        drained = self.shutdown.drain(timeout, self.handler_queue_depth)
+
+        if drained:
+            # updates are confirmed with the next getUpdates call, without it they would be handled again
+            self.safe_exec(
+                self.bot.get_updates,
+                offset=self.bot.last_update_id + 1,
+                limit=1,
+                timeout=1,
+                long_polling_timeout=0
+            )
+            self.bot.stop_bot()
+
+        if self.health_server is not None:
+            self.health_server.stop()
+
+        self.orders.flush()
+        self.db.close()
+
+        elapsed = time.monotonic() - self.shutdown.requested_at
+        self.log.info(f"shutdown {'complete' if drained else 'incomplete'}, draining took {elapsed:.2f}s")
+
+        return drained
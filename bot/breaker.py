@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+
+from telebot.apihelper import ApiTelegramException
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# methods sharing a breaker, everything else gets one of its own
+API_FAMILIES = {
+    "send_message": "send",
+    "reply_to": "send",
+    "send_document": "send",
+    "send_poll": "send",
+    "edit_message_text": "send",
+    "get_chat": "chat",
+    "get_chat_administrators": "chat",
+    "pin_chat_message": "chat",
+    "unpin_chat_message": "chat",
+    "stop_poll": "chat",
+    "answer_inline_query": "answer",
+    "answer_callback_query": "answer"
+}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, circuit):
+        super().__init__(f"circuit {circuit} is open")
+        self.circuit = circuit
+
+
+def is_outage(ex):
+    # errors in the request itself (400, 403) prove that telegram is reachable
+    if isinstance(ex, ApiTelegramException):
+        return ex.error_code >= 500 or ex.error_code == 429
+
+    return True
+
+
+class CircuitBreaker:
+    def __init__(self, name, threshold, cooldown, clock=time.monotonic):
+        self.log = logging.getLogger("CircuitBreaker")
+
+        self.name = name
+        # consecutive failures that open the circuit and seconds until a probe call is let through
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+        # metrics
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self):
+        with self.lock:
+            if self.state == OPEN and self.clock() - self.opened_at >= self.cooldown:
+                self.transition(HALF_OPEN)
+
+            # only one probe at a time, the others fail fast until it returns
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+
+            if self.state == CLOSED:
+                return True
+
+            self.rejected += 1
+            return False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.probing = False
+
+            if self.state != CLOSED:
+                self.transition(CLOSED)
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.threshold):
+                self.opened_at = self.clock()
+                self.opened += 1
+                self.transition(OPEN)
+
+    def transition(self, state):
+        log = self.log.warning if state == OPEN else self.log.info
+        log(f"circuit {self.name}: {self.state} -> {state} after {self.failures} consecutive failure(s)")
+        self.state = state
+
+    def metrics(self):
+        return {"state": self.state, "failures": self.failures, "opened": self.opened, "rejected": self.rejected}
+
+
+class CircuitBreakers:
+    def __init__(self, threshold, cooldown, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.breakers = {}
+
+    def get(self, method):
+        family = API_FAMILIES.get(method, method)
+
+        with self.lock:
+            if family not in self.breakers:
+                self.breakers[family] = CircuitBreaker(family, self.threshold, self.cooldown, self.clock)
+
+            return self.breakers[family]
+
+    def metrics(self):
+        with self.lock:
+            return {family: breaker.metrics() for family, breaker in self.breakers.items()}
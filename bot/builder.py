@@ -0,0 +1,179 @@
+import hashlib
+import json
+import logging
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from os import listdir, makedirs, path, remove
+
+# same options as in the Makefile
+LATEXMK = ["latexmk", "-pdf", "-pdflatex=pdflatex -interaction=nonstopmode", "-use-make"]
+
+BUILD_TIMEOUT = 300
+
+# files pulled into the document, e.g. \includegraphics[width=...]{alfredo.png}
+ASSET_RE = re.compile(rb"\\includegraphics(?:\[[^\]]*\])?\{([^}]+)\}")
+ASSET_EXTENSIONS = ["", ".png", ".pdf", ".jpg", ".jpeg"]
+
+
+def find_assets(texfile, content):
+    assets = []
+
+    for match in ASSET_RE.finditer(content):
+        name = match.group(1).decode("utf-8")
+
+        for ext in ASSET_EXTENSIONS:
+            candidate = path.join(path.dirname(texfile), name + ext)
+
+            if path.isfile(candidate):
+                assets.append(candidate)
+                break
+
+    return sorted(assets)
+
+
+class PdfBuilder:
+    def __init__(self, documents, cache_dir, command=None):
+        self.log = logging.getLogger("PdfBuilder")
+
+        # document name -> path of the .tex file
+        self.documents = documents
+        self.cache_dir = cache_dir
+        self.command = command if command is not None else LATEXMK
+
+        self.lock = threading.Lock()
+        self.building = False
+        self.file_ids = None
+
+    def content_hash(self, name):
+        texfile = self.documents[name]
+
+        with open(texfile, "rb") as f:
+            content = f.read()
+
+        digest = hashlib.sha256(content)
+
+        for asset in find_assets(texfile, content):
+            digest.update(path.basename(asset).encode("utf-8"))
+
+            with open(asset, "rb") as f:
+                digest.update(f.read())
+
+        return digest.hexdigest()
+
+    def pdf_path(self, name, digest):
+        return path.join(self.cache_dir, f"{name}-{digest}.pdf")
+
+    def cached_pdf(self, name):
+        try:
+            pdf = self.pdf_path(name, self.content_hash(name))
+        except OSError as ex:
+            self.log.error(f"could not hash sources of {name}: {ex}")
+            return None
+
+        return pdf if path.isfile(pdf) else None
+
+    def build(self, name):
+        # returns the path of the pdf and whether it actually had to be built
+        texfile = self.documents[name]
+        target = self.pdf_path(name, self.content_hash(name))
+
+        if path.isfile(target):
+            self.log.info(f"skipping build of {name}, {path.basename(target)} is cached")
+            return target, False
+
+        makedirs(self.cache_dir, exist_ok=True)
+        self.log.info(f"building {name} from {texfile}")
+
+        # build outside of the source dir, so aborted builds don't leave stale aux files behind
+        with tempfile.TemporaryDirectory() as outdir:
+            result = subprocess.run(
+                self.command + [f"-outdir={outdir}", path.basename(texfile)],
+                cwd=path.dirname(path.abspath(texfile)),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                timeout=BUILD_TIMEOUT
+            )
+
+            if result.returncode != 0:
+                self.log.error(f"build of {name} failed: {result.stdout.decode('utf-8', 'replace')[-1000:]}")
+                raise Exception(f"latexmk exited with code {result.returncode}")
+
+            stem = path.splitext(path.basename(texfile))[0]
+            shutil.move(path.join(outdir, f"{stem}.pdf"), target)
+
+        self.prune(name, target)
+        return target, True
+
+    def prune(self, name, keep):
+        # older builds of a document are never sent again, neither are their file_ids
+        pattern = re.compile(re.escape(name) + r"-[0-9a-f]{64}\.pdf")
+        outdated = [f for f in listdir(self.cache_dir) if pattern.fullmatch(f) and f != path.basename(keep)]
+
+        for pdf in outdated:
+            self.log.debug(f"removing outdated {pdf}")
+            remove(path.join(self.cache_dir, pdf))
+
+        with self.lock:
+            file_ids = self.load_file_ids()
+
+            if any(pdf in file_ids for pdf in outdated):
+                for pdf in outdated:
+                    file_ids.pop(pdf, None)
+
+                self.write_file_ids()
+
+    def build_all_async(self, callback):
+        # latexmk runs in its own process, the thread only waits for it so polling can continue
+        with self.lock:
+            if self.building:
+                return False
+
+            self.building = True
+
+        threading.Thread(target=self.build_all, args=(callback,), name="PdfBuilder", daemon=True).start()
+        return True
+
+    def build_all(self, callback):
+        results = {}
+
+        try:
+            for name in self.documents.keys():
+                try:
+                    results[name] = self.build(name)
+                except Exception as ex:
+                    results[name] = ex
+        finally:
+            with self.lock:
+                self.building = False
+
+        callback(results)
+
+    def file_id_store(self):
+        return path.join(self.cache_dir, "file_ids.json")
+
+    def load_file_ids(self):
+        if self.file_ids is None:
+            self.file_ids = {}
+
+            if path.isfile(self.file_id_store()):
+                with open(self.file_id_store()) as f:
+                    self.file_ids = json.load(f)
+
+        return self.file_ids
+
+    def get_file_id(self, pdf):
+        # pdf names contain the content hash, so a file_id never refers to an outdated document
+        return self.load_file_ids().get(path.basename(pdf))
+
+    def set_file_id(self, pdf, file_id):
+        with self.lock:
+            self.load_file_ids()[path.basename(pdf)] = file_id
+            self.write_file_ids()
+
+    def write_file_ids(self):
+        # has to be called with the lock held
+        with open(self.file_id_store(), "w") as f:
+            json.dump(self.file_ids, f)
@@ -0,0 +1,69 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+
+class Coalescer:
+    def __init__(self, window, latest=False, tracker=None, clock=time.monotonic):
+        self.log = logging.getLogger("Coalescer")
+
+        # identical requests within window seconds are answered once,
+        # either right away for the first one or after the window for the latest one
+        self.window = window
+        self.latest = latest
+        # begin()/end() of the ShutdownCoordinator, so delayed replies are waited for
+        self.tracker = tracker
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        # key -> time of the first request (first) or the latest message (latest), oldest first
+        self.entries = OrderedDict()
+
+    def submit(self, key, message, handler):
+        # returns False if the message was coalesced with an earlier one
+        if self.latest:
+            return self.submit_latest(key, message, handler)
+
+        now = self.clock()
+
+        with self.lock:
+            # every entry has the same lifetime, so expired ones are always at the front
+            while self.entries and now - next(iter(self.entries.values())) >= self.window:
+                self.entries.popitem(last=False)
+
+            if key in self.entries:
+                self.log.debug(f"coalesced {key}")
+                return False
+
+            self.entries[key] = now
+
+        handler(message)
+        return True
+
+    def submit_latest(self, key, message, handler):
+        with self.lock:
+            pending = key in self.entries
+            self.entries[key] = message
+
+        if pending:
+            self.log.debug(f"coalesced {key}, replying to the latest message")
+            return True
+
+        if self.tracker is not None:
+            self.tracker.begin()
+
+        timer = threading.Timer(self.window, self.flush, args=(key, handler))
+        timer.daemon = True
+        timer.start()
+        return True
+
+    def flush(self, key, handler):
+        try:
+            with self.lock:
+                message = self.entries.pop(key)
+
+            handler(message)
+        finally:
+            if self.tracker is not None:
+                self.tracker.end()
@@ -0,0 +1,163 @@
+import re
+from datetime import date
+
+import telebot
+
+# "/command@botname arguments", the slash is optional
+COMMAND_RE = re.compile(r"^/?(?P<name>\w+)(?:@\w+)?(?:\s+(?P<args>.*))?$", re.DOTALL)
+DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+DATE_RANGE_RE = re.compile(r"(?P<start>\d{4}-\d{2}-\d{2})\.\.(?P<end>\d{4}-\d{2}-\d{2})")
+
+
+class ArgumentError(Exception):
+    # key and fields of the message in the catalogs, so the error is shown in the language of the chat
+    def __init__(self, key, **fields):
+        super().__init__(key, fields)
+        self.key = key
+        self.fields = fields
+
+
+def parse_date(string):
+    if not DATE_RE.fullmatch(string):
+        raise ArgumentError("arg_date", value=string)
+
+    try:
+        return date.fromisoformat(string)
+    except ValueError:
+        raise ArgumentError("arg_date_invalid", value=string)
+
+
+class DateArg:
+    greedy = False
+
+    def __init__(self, usage="iso-date", optional=False):
+        self.usage = usage
+        self.optional = optional
+
+    def parse(self, token):
+        return parse_date(token)
+
+
+class DateRangeArg:
+    greedy = False
+
+    def __init__(self, usage="iso-date[..iso-date]", optional=False):
+        self.usage = usage
+        self.optional = optional
+
+    def parse(self, token):
+        # a single date is a range of one day
+        match = DATE_RANGE_RE.fullmatch(token)
+
+        if match is None:
+            date_ = parse_date(token)
+            return date_, date_
+
+        start = parse_date(match.group("start"))
+        end = parse_date(match.group("end"))
+
+        if end < start:
+            raise ArgumentError("arg_range")
+
+        return start, end
+
+
+class ChoiceArg:
+    greedy = False
+
+    def __init__(self, choices, optional=True):
+        self.choices = choices
+        self.usage = "|".join(choices)
+        self.optional = optional
+
+    def parse(self, token):
+        if token not in self.choices:
+            raise ArgumentError("arg_choice", value=token, choices=", ".join(self.choices))
+
+        return token
+
+
+class TextArg:
+    # takes the rest of the message, including whitespace and newlines
+    greedy = True
+
+    def __init__(self, usage="text", optional=False):
+        self.usage = usage
+        self.optional = optional
+
+    def parse(self, token):
+        return token
+
+
+class Command:
+    def __init__(self, name, description, handler, args=None, admin=False, idempotent=False):
+        self.name = name
+        self.description = description
+        # name of the BotRunner method, called with the message and the parsed arguments
+        self.handler = handler
+        self.args = args if args is not None else []
+        self.admin = admin
+        # the reply only depends on the chat and the arguments, so duplicates may share one
+        self.idempotent = idempotent
+
+        # everything needed for parsing is computed once
+        self.required = len([a for a in self.args if not a.optional])
+        greedy = len(self.args) > 0 and self.args[-1].greedy
+        self.maxsplit = len(self.args) - 1 if greedy else -1
+
+    @property
+    def usage(self):
+        return " ".join(f"[{a.usage}]" if a.optional else f"<{a.usage}>" for a in self.args)
+
+    @property
+    def shows_usage(self):
+        return self.admin or len(self.args) > 0
+
+    def bot_command(self, description=None):
+        # the description may be a translation of the one given here
+        description = description or self.description
+
+        if self.shows_usage:
+            return telebot.types.BotCommand(self.name, f"{self.usage}: {description}".lstrip())
+
+        return telebot.types.BotCommand(self.name, description)
+
+    def help_line(self, description=None):
+        # "/name <usage>: description", the usage already ends with the separator
+        cmd = self.bot_command(description)
+        return f"/{cmd.command}{' ' if self.shows_usage else ': '}{cmd.description}"
+
+    def parse(self, args):
+        # commands without arguments ignore any text after them (e.g. deep link payloads of /start)
+        if len(self.args) == 0:
+            return []
+
+        tokens = args.split(None, self.maxsplit) if args else []
+
+        if not self.required <= len(tokens) <= len(self.args):
+            if self.required == 1 and len(self.args) == 1 and self.args[0].greedy:
+                raise ArgumentError("arg_missing")
+            elif len(self.args) == 1:
+                raise ArgumentError("arg_count_one", count=len(tokens))
+
+            raise ArgumentError("arg_count", expected=len(self.args), count=len(tokens))
+
+        return [arg.parse(token) for arg, token in zip(self.args, tokens)]
+
+
+class CommandRouter:
+    def __init__(self, commands):
+        # the single lookup table for all commands
+        self.table = {command.name: command for command in commands}
+
+    def names(self):
+        return list(self.table.keys())
+
+    def resolve(self, text):
+        # returns the command (or None) and the unparsed arguments
+        match = COMMAND_RE.match(text.strip())
+
+        if match is None:
+            return None, None
+
+        return self.table.get(match.group("name").lower()), match.group("args")
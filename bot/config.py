@@ -0,0 +1,99 @@
+import json
+from collections.abc import Mapping
+from os import path
+from types import MappingProxyType
+
+from i18n import available_languages
+
+REQUIRED_KEYS = ["token", "group", "admins"]
+
+# optional keys and their minimum, missing ones get the defaults of BotRunner
+INTEGER_KEYS = {
+    "api_pool_size": 1, "api_workers": 1, "audit_entries": 1, "circuit_threshold": 1, "dates_page_size": 1,
+    "health_port": 1, "order_batch_size": 1
+}
+NUMBER_KEYS = {
+    "api_connect_timeout": 0, "api_read_timeout": 0, "api_long_poll_timeout": 0, "circuit_cooldown": 0,
+    "coalesce_window": 0, "group_admins_ttl": 0, "health_max_lag": 0, "inline_cache_time": 0,
+    "order_flush_interval": 0, "shutdown_timeout": 0
+}
+# [burst, seconds], null (or false) disables the throttle
+THROTTLE_KEYS = ["throttle_user", "throttle_chat"]
+CHOICE_KEYS = {"coalesce_reply": ["first", "latest"]}
+
+
+def is_number(value, integer=False):
+    # bool is a subclass of int, but true is no valid timeout
+    types = int if integer else (int, float)
+    return isinstance(value, types) and not isinstance(value, bool)
+
+
+def check_optional(cfg):
+    # everything derived from the config is built after loading it, so bad values must not get that far
+    for keys, integer in [(INTEGER_KEYS, True), (NUMBER_KEYS, False)]:
+        for key, minimum in keys.items():
+            if key in cfg and not (is_number(cfg[key], integer) and cfg[key] >= minimum):
+                kind = "an integer" if integer else "a number"
+                raise Exception(f"config key {key} has to be {kind} of at least {minimum}, not {cfg[key]!r}")
+
+    for key in THROTTLE_KEYS:
+        budget = cfg.get(key)
+        if budget and not (isinstance(budget, list) and len(budget) == 2
+                           and all(is_number(v) and v > 0 for v in budget)):
+            raise Exception(f"config key {key} has to be [burst, seconds] or null, not {budget!r}")
+
+    for key, choices in CHOICE_KEYS.items():
+        if key in cfg and cfg[key] not in choices:
+            raise Exception(f"config key {key} has to be one of {', '.join(choices)}, not {cfg[key]!r}")
+
+
+class Config(Mapping):
+    # read-only view of config.json, reloading creates a new instance instead of changing this one
+    def __init__(self, values):
+        values = dict(values)
+        # checked for every command, so membership tests should not scan a list
+        values["admins"] = frozenset(values["admins"])
+
+        object.__setattr__(self, "_values", MappingProxyType(values))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Config is immutable")
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def admins(self):
+        return self._values["admins"]
+
+
+def load_config(cfgfile):
+    if not path.exists(cfgfile):
+        raise Exception(f"{cfgfile} does not exist")
+
+    with open(cfgfile) as c:
+        cfg = json.load(c)
+
+    for req in REQUIRED_KEYS:
+        if req not in cfg.keys():
+            raise Exception(f"config key {req} not found in {cfgfile}")
+
+    if not isinstance(cfg["admins"], list) or not len(cfg["admins"]) > 0:
+        raise Exception("need at least one admin")
+
+    for admin in cfg["admins"]:
+        if not isinstance(admin, int):
+            raise Exception(f"admin {admin} is not a user id")
+
+    if "language" in cfg and cfg["language"] not in available_languages():
+        raise Exception(f"no catalog for language {cfg['language']}, available: {', '.join(available_languages())}")
+
+    check_optional(cfg)
+
+    return Config(cfg)
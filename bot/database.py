@@ -1,9 +1,34 @@
 import logging
 import os.path
-from datetime import date
-from sqlalchemy import create_engine, select, func
+import time
+from collections import Counter
+from datetime import date, datetime
+from itertools import groupby, islice
+from sqlalchemy import create_engine, select, insert, delete, inspect, func, text, tuple_
+from sqlalchemy.dialects.sqlite import insert as upsert
 from sqlalchemy.orm import Session
-from models import Base, AlfredoDate
+import audit
+from models import Base, AlfredoDate, AlfredoDateRecord, AlfredoDateArchive, Attendance, AlfredoStatistic, BotState, \
+    PizzaOrder, AuditLog, AuditSnapshot
+
+# values of "PRAGMA auto_vacuum"
+AUTO_VACUUM_INCREMENTAL = 2
+
+STATISTIC_COUNTERS = ["created", "cancelled", "held", "attendees"]
+
+# selected by the read methods, in the order of AlfredoDateRecord's fields
+DATE_COLUMNS = [AlfredoDate.id, AlfredoDate.date, AlfredoDate.description, AlfredoDate.message_id,
+                AlfredoDate.poll_id]
+
+# rows fetched per round trip when exporting and written per transaction when importing
+TRANSFER_BATCH_SIZE = 1000
+
+# the audit log is append-only, enforced by sqlite itself
+AUDIT_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS audit_{table}_{op.lower()} BEFORE {op} ON {table} "
+    f"BEGIN SELECT RAISE(ABORT, '{table} is append-only'); END"
+    for table in ["audit_log", "audit_snapshot"] for op in ["UPDATE", "DELETE"]
+]
 
 
 class Database:
@@ -12,32 +37,486 @@ class Database:
 
         if os.path.isfile(output_file):
             self.log.info(f"loading Database {output_file}")
+            new = False
         else:
             self.log.info(f"creating Database {output_file}")
+            new = True
 
         self.engine = create_engine(f"sqlite:///{output_file}", echo=False, future=True)
+
+        # incremented on every change of alfredo_date, lets callers cache anything derived from it
+        self.version = 0
+        self.audit_snapshot_interval = audit.SNAPSHOT_INTERVAL
+
+        if new:
+            # has to be set before the first table is created
+            with self.engine.connect() as conn:
+                conn.exec_driver_sql(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+
         Base.metadata.create_all(self.engine)
+        self.upgrade_schema()
+
+    def upgrade_schema(self):
+        with self.engine.begin() as conn:
+            self.upgrade_tables(conn, self.log)
+
+    @staticmethod
+    def upgrade_tables(conn, log):
+        # create_all() only creates missing tables, columns and indexes of existing tables have to be added manually
+        inspector = inspect(conn)
+
+        for table in Base.metadata.sorted_tables:
+            existing = [c["name"] for c in inspector.get_columns(table.name)]
+
+            for column in table.columns:
+                if column.name not in existing:
+                    log.info(f"adding column {column.name} to table {table.name}")
+                    coltype = column.type.compile(dialect=conn.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {coltype}")
+
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+        for trigger in AUDIT_TRIGGERS:
+            conn.exec_driver_sql(trigger)
 
-    def create_alfredo_date(self, date, description=None, message_id=None):
-        new_date = AlfredoDate(date=date, description=description, message_id=message_id)
+        # databases from before the summary table have dates, but no statistics,
+        # they have to be counted before the first archival adds only the held dates
+        if conn.execute(select(func.count()).select_from(AlfredoStatistic)).scalar() == 0:
+            if Database.count_statistics(conn) > 0:
+                log.info("filled the statistics from the stored dates")
+
+    def ping(self):
+        # returns the round trip time of a trivial query in seconds
+        start = time.perf_counter()
+
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+        return time.perf_counter() - start
+
+    def close(self):
+        # every write is committed immediately, so only the connections are left to close
+        self.engine.dispose()
+        self.log.info("closed database")
+
+    def create_alfredo_date(self, date, description=None, message_id=None, poll_id=None, actor=None):
+        # with an actor, the audit entry is part of the same transaction
+        new_date = AlfredoDate(date=date, description=description, message_id=message_id, poll_id=poll_id)
 
         with Session(self.engine) as session:
             session.add(new_date)
+            self.update_statistic(session, date, created=1)
+
+            if actor is not None:
+                self.write_audit(session, actor, audit.CREATE, date,
+                                 {"description": description, "message_id": message_id, "poll_id": poll_id})
+
             session.commit()
 
+        self.version += 1
+
     def get_future_dates(self):
-        with Session(self.engine) as session:
-            dates = session.scalars(select(AlfredoDate)
-                                    .where(func.DATE(AlfredoDate.date) >= date.today())
-                                    .order_by(AlfredoDate.date)).all()
+        return self.get_records(select(*DATE_COLUMNS)
+                                .where(AlfredoDate.date >= date.today())
+                                .order_by(AlfredoDate.date))
+
+    def get_date_page(self, after=None, before=None, limit=10):
+        # future dates right after (or before) a date, ascending, the index on date makes this a range scan
+        stmt = select(*DATE_COLUMNS).where(AlfredoDate.date >= date.today())
+
+        if before is not None:
+            records = self.get_records(stmt.where(AlfredoDate.date < before)
+                                       .order_by(AlfredoDate.date.desc())
+                                       .limit(limit))
+            return records[::-1]
+
+        if after is not None:
+            stmt = stmt.where(AlfredoDate.date > after)
+
+        return self.get_records(stmt.order_by(AlfredoDate.date).limit(limit))
+
+    def count_future_dates(self, before=None):
+        stmt = select(func.count()).where(AlfredoDate.date >= date.today())
 
-        return dates
+        if before is not None:
+            stmt = stmt.where(AlfredoDate.date < before)
+
+        with self.engine.connect() as conn:
+            return conn.execute(stmt).scalar()
+
+    def get_records(self, stmt):
+        # plain rows are cheaper than ORM instances and can't be used after their session is gone by mistake
+        with self.engine.connect() as conn:
+            return [AlfredoDateRecord(*row) for row in conn.execute(stmt)]
+
+    def get_future_attendance(self):
+        with self.engine.connect() as conn:
+            return conn.execute(select(AlfredoDate.date, AlfredoDate.description,
+                                       self.attendees_of(AlfredoDate.poll_id))
+                                .where(AlfredoDate.date >= date.today())
+                                .order_by(AlfredoDate.date)).all()
 
     def get_by_date(self, date):
-        with Session(self.engine) as session:
-            return session.scalars(select(AlfredoDate).where(AlfredoDate.date.is_(date))).first()
+        records = self.get_records(select(*DATE_COLUMNS).where(AlfredoDate.date.is_(date)).limit(1))
+        return records[0] if records else None
+
+    def get_dates_between(self, start, end):
+        return self.get_records(select(*DATE_COLUMNS)
+                                .where(AlfredoDate.date >= start)
+                                .where(AlfredoDate.date <= end)
+                                .order_by(AlfredoDate.date))
 
     def delete_date(self, date):
+        self.delete_dates([date])
+
+    def delete_dates(self, dates, actor=None):
+        return self.delete_dates_by_id([d.id for d in dates], actor)
+
+    def delete_dates_by_id(self, ids, actor=None):
+        # returns the number of deleted dates, unknown ids are ignored
+        with self.engine.begin() as conn:
+            rows = conn.execute(select(AlfredoDate.date, AlfredoDate.description, AlfredoDate.message_id,
+                                       AlfredoDate.poll_id).where(AlfredoDate.id.in_(ids))).all()
+            poll_ids = [row.poll_id for row in rows if row.poll_id is not None]
+
+            conn.execute(delete(AlfredoDate).where(AlfredoDate.id.in_(ids)))
+            conn.execute(delete(Attendance).where(Attendance.poll_id.in_(poll_ids)))
+            conn.execute(delete(PizzaOrder).where(PizzaOrder.date.in_([row.date for row in rows])))
+
+            for row in rows:
+                self.update_statistic(conn, row.date, cancelled=1)
+
+                if actor is not None:
+                    self.write_audit(conn, actor, audit.CANCEL, row.date,
+                                     {"description": row.description, "message_id": row.message_id,
+                                      "poll_id": row.poll_id})
+
+        self.version += 1
+        return len(rows)
+
+    def set_attendance(self, poll_id, user_id, guests):
+        # guests=None means the user retracted their vote
         with Session(self.engine) as session:
-            session.delete(date)
+            known = session.scalars(select(AlfredoDate.id).where(AlfredoDate.poll_id == poll_id)).first()
+
+            if known is None:
+                return False
+
+            session.execute(self.attendance_change(poll_id, user_id, guests))
             session.commit()
+
+        return True
+
+    @staticmethod
+    def attendance_change(poll_id, user_id, guests):
+        if guests is None:
+            return delete(Attendance).where(Attendance.poll_id == poll_id).where(Attendance.user_id == user_id)
+
+        stmt = upsert(Attendance).values(poll_id=poll_id, user_id=user_id, guests=guests)
+        return stmt.on_conflict_do_update(index_elements=["poll_id", "user_id"], set_={"guests": guests})
+
+    def get_attendees(self, poll_id):
+        with self.engine.connect() as conn:
+            return conn.execute(select(self.attendees_of(poll_id))).scalar()
+
+    @staticmethod
+    def attendees_of(poll_id):
+        # every vote counts its user plus their guests
+        return select(func.coalesce(func.count() + func.sum(Attendance.guests), 0)) \
+            .where(Attendance.poll_id == poll_id) \
+            .scalar_subquery() \
+            .label("attendees")
+
+    def get_orders(self, date):
+        with self.engine.connect() as conn:
+            return conn.execute(select(PizzaOrder.user_id, PizzaOrder.item, PizzaOrder.count)
+                                .where(PizzaOrder.date == date)
+                                .order_by(PizzaOrder.user_id, PizzaOrder.item)).all()
+
+    def set_orders(self, changes):
+        # changes are (date, user_id, {item: count}) and replace the whole order of that user,
+        # orders of dates that were cancelled or archived in the meantime are dropped
+        with self.engine.begin() as conn:
+            dates = {d for d, _, _ in changes}
+            known = set(conn.scalars(select(AlfredoDate.date).where(AlfredoDate.date.in_(dates))))
+
+            conn.execute(delete(PizzaOrder).where(tuple_(PizzaOrder.date, PizzaOrder.user_id)
+                                                  .in_([(d, u) for d, u, _ in changes])))
+
+            rows = [{"date": d, "user_id": u, "item": item, "count": count}
+                    for d, u, order in changes if d in known for item, count in order.items() if count > 0]
+            if rows:
+                conn.execute(insert(PizzaOrder), rows)
+
+        return len(rows)
+
+    def iter_dates(self, batch_size=TRANSFER_BATCH_SIZE):
+        # yields every date (archived ones first, they are older) with its attendance, one at a time
+        archived = select(AlfredoDateArchive.date_id, AlfredoDateArchive.date, AlfredoDateArchive.description,
+                          AlfredoDateArchive.message_id, AlfredoDateArchive.attendees) \
+            .order_by(AlfredoDateArchive.date) \
+            .execution_options(yield_per=batch_size)
+        # one row per vote, grouped by date below
+        current = select(AlfredoDate.id, AlfredoDate.date, AlfredoDate.description, AlfredoDate.message_id,
+                         AlfredoDate.poll_id, Attendance.user_id, Attendance.guests) \
+            .outerjoin(Attendance, Attendance.poll_id == AlfredoDate.poll_id) \
+            .order_by(AlfredoDate.date, AlfredoDate.id, Attendance.user_id) \
+            .execution_options(yield_per=batch_size)
+
+        with self.engine.connect() as conn:
+            for row in conn.execute(archived):
+                yield {"id": row.date_id, "date": row.date, "description": row.description,
+                       "message_id": row.message_id, "poll_id": None, "archived": True,
+                       "attendees": row.attendees, "attendance": []}
+
+            for _, rows in groupby(conn.execute(current), key=lambda r: r.id):
+                rows = list(rows)
+                attendance = [{"user_id": r.user_id, "guests": r.guests} for r in rows if r.user_id is not None]
+                first = rows[0]
+
+                yield {"id": first.id, "date": first.date, "description": first.description,
+                       "message_id": first.message_id, "poll_id": first.poll_id, "archived": False,
+                       "attendees": sum(1 + a["guests"] for a in attendance), "attendance": attendance}
+
+    def import_dates(self, records, batch_size=TRANSFER_BATCH_SIZE):
+        # records have the format of iter_dates(), dates that already exist are skipped
+        imported = skipped = 0
+        records = iter(records)
+
+        while batch := list(islice(records, batch_size)):
+            with Session(self.engine) as session:
+                dates = [r["date"] for r in batch]
+                existing = set(session.scalars(select(AlfredoDate.date).where(AlfredoDate.date.in_(dates))))
+                existing.update(session.scalars(select(AlfredoDateArchive.date)
+                                                .where(AlfredoDateArchive.date.in_(dates))))
+
+                new = []
+                for record in batch:
+                    if record["date"] in existing:
+                        self.log.warning(f"skipping {record['date']}, the date already exists")
+                        skipped += 1
+                        continue
+
+                    existing.add(record["date"])
+                    new.append(record)
+
+                poll_ids = [r["poll_id"] for r in new if r["poll_id"] is not None]
+                used = session.scalars(select(AlfredoDate.poll_id).where(AlfredoDate.poll_id.in_(poll_ids))).first()
+                if used is not None:
+                    raise ValueError(f"poll_id {used} is already used by a stored date")
+
+                self.insert_records(session, new)
+                session.commit()
+
+            imported += len(new)
+            self.version += 1
+            self.log.info(f"imported {imported} date(s)")
+
+        return imported, skipped
+
+    def insert_records(self, session, records):
+        current = [r for r in records if not r["archived"]]
+        archived = [r for r in records if r["archived"]]
+        columns = ["date", "description", "message_id"]
+
+        if current:
+            session.execute(insert(AlfredoDate), [{**{c: r[c] for c in columns}, "poll_id": r["poll_id"]}
+                                                  for r in current])
+
+        attendance = [{"poll_id": r["poll_id"], **a} for r in current for a in r["attendance"]]
+        if attendance:
+            session.execute(insert(Attendance), attendance)
+
+        archived_at = datetime.now()
+        if archived:
+            session.execute(insert(AlfredoDateArchive), [{**{c: r[c] for c in columns}, "date_id": r["id"] or 0,
+                                                          "attendees": r["attendees"], "archived_at": archived_at}
+                                                         for r in archived])
+
+        # one statement per month instead of one per date
+        counters = {}
+        for r in records:
+            month = counters.setdefault((r["date"].year, r["date"].month), Counter())
+            month["created"] += 1
+
+            if r["archived"]:
+                month["held"] += 1
+                month["attendees"] += r["attendees"] or 0
+
+        for (year, month), values in counters.items():
+            self.update_statistic(session, date(year, month, 1), **values)
+
+    def get_state(self, key):
+        with self.engine.connect() as conn:
+            return conn.execute(select(BotState.value).where(BotState.key == key)).scalar()
+
+    def set_state(self, key, value):
+        stmt = upsert(BotState).values(key=key, value=value)
+
+        with self.engine.begin() as conn:
+            conn.execute(stmt.on_conflict_do_update(index_elements=["key"], set_={"value": value}))
+
+    def audit(self, actor, action, date=None, details=None):
+        # for actions that don't change any table, the others pass their actor to the changing method
+        with self.engine.begin() as conn:
+            self.write_audit(conn, actor, action, date, details)
+
+    def write_audit(self, session, actor, action, date=None, details=None):
+        # session may be a Session or a Connection, a due snapshot is written in the same transaction
+        now = datetime.now()
+        entry_id = session.execute(insert(AuditLog).values(
+            created_at=now, user_id=actor.user_id, user_name=actor.name, action=action, date=date,
+            details=audit.dump(details)
+        )).inserted_primary_key[0]
+
+        last = session.execute(select(func.max(AuditSnapshot.entry_id))).scalar() or 0
+
+        if entry_id - last >= self.audit_snapshot_interval:
+            state = self.audit_state(session, entry_id)
+            session.execute(insert(AuditSnapshot).values(entry_id=entry_id, created_at=now,
+                                                         state=audit.dump(state)))
+            self.log.debug(f"wrote audit snapshot after entry {entry_id}")
+
+    @staticmethod
+    def audit_state(session, entry_id):
+        # the latest snapshot up to entry_id, plus the entries written after it
+        snapshot = session.execute(select(AuditSnapshot.entry_id, AuditSnapshot.state)
+                                   .where(AuditSnapshot.entry_id <= entry_id)
+                                   .order_by(AuditSnapshot.entry_id.desc())
+                                   .limit(1)).first()
+        start, state = (snapshot.entry_id, audit.load(snapshot.state)) if snapshot else (0, {})
+
+        entries = session.execute(select(AuditLog.action, AuditLog.date, AuditLog.details)
+                                  .where(AuditLog.id > start)
+                                  .where(AuditLog.id <= entry_id)
+                                  .where(AuditLog.action.in_([audit.CREATE, audit.CANCEL]))
+                                  .order_by(AuditLog.id))
+
+        return audit.replay(state, ((r.action, r.date, audit.load(r.details)) for r in entries))
+
+    def get_audit(self, limit=10):
+        # the latest entries, newest first
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(AuditLog.id, AuditLog.created_at, AuditLog.user_id, AuditLog.user_name,
+                                       AuditLog.action, AuditLog.date, AuditLog.details)
+                                .order_by(AuditLog.id.desc())
+                                .limit(limit)).all()
+
+        return [audit.AuditEntry(*row[:-1], audit.load(row.details)) for row in rows]
+
+    def get_audit_state(self, at):
+        # returns the id of the last entry written until at and the announced dates after it
+        with self.engine.connect() as conn:
+            entry_id = conn.execute(select(func.max(AuditLog.id)).where(AuditLog.created_at <= at)).scalar()
+
+            if entry_id is None:
+                return None, {}
+
+            return entry_id, self.audit_state(conn, entry_id)
+
+    @staticmethod
+    def update_statistic(session, date, **counters):
+        # session may be a Session or a Connection
+        session.execute(Database.statistic_change(date, **counters))
+
+    @staticmethod
+    def statistic_change(date, **counters):
+        values = {c: counters.get(c, 0) for c in STATISTIC_COUNTERS}
+        stmt = upsert(AlfredoStatistic).values(year=date.year, month=date.month, **values)
+        return stmt.on_conflict_do_update(
+            index_elements=["year", "month"],
+            set_={c: getattr(AlfredoStatistic, c) + v for c, v in values.items() if v != 0}
+        )
+
+    def get_statistics(self):
+        with self.engine.connect() as conn:
+            return conn.execute(select(AlfredoStatistic.year, AlfredoStatistic.month, AlfredoStatistic.created,
+                                       AlfredoStatistic.cancelled, AlfredoStatistic.held,
+                                       AlfredoStatistic.attendees)
+                                .order_by(AlfredoStatistic.year, AlfredoStatistic.month)).all()
+
+    def rebuild_statistics(self):
+        with self.engine.begin() as conn:
+            self.count_statistics(conn)
+
+        self.log.info("rebuilt statistics")
+
+    @staticmethod
+    def count_statistics(conn):
+        # recounts the statistics from the stored dates and returns the number of counted dates
+        # cancelled dates are deleted, so their counts can only be carried over
+        cancelled = {(s.year, s.month): s.cancelled
+                     for s in conn.execute(select(AlfredoStatistic.year, AlfredoStatistic.month,
+                                                  AlfredoStatistic.cancelled)).all()}
+        conn.execute(delete(AlfredoStatistic))
+
+        for cancelled_date, count in cancelled.items():
+            if count > 0:
+                Database.update_statistic(conn, date(*cancelled_date, 1), created=count, cancelled=count)
+
+        dates = conn.execute(select(AlfredoDate.date)).all()
+        for row in dates:
+            Database.update_statistic(conn, row.date, created=1)
+
+        archived = conn.execute(select(AlfredoDateArchive.date, AlfredoDateArchive.attendees)).all()
+        for row in archived:
+            Database.update_statistic(conn, row.date, created=1, held=1, attendees=row.attendees or 0)
+
+        return len(dates) + len(archived)
+
+    def archive_past_dates(self, today=None):
+        if today is None:
+            today = date.today()
+
+        archived_at = datetime.now()
+
+        # move in one transaction so a date is never missing from (or duplicated in) both tables
+        with Session(self.engine) as session:
+            past = session.execute(select(AlfredoDate.id, AlfredoDate.date, AlfredoDate.description,
+                                          AlfredoDate.message_id, AlfredoDate.poll_id,
+                                          self.attendees_of(AlfredoDate.poll_id))
+                                   .where(AlfredoDate.date < today)).all()
+
+            if len(past) == 0:
+                return 0
+
+            session.execute(insert(AlfredoDateArchive), [{
+                "date_id": row.id,
+                "date": row.date,
+                "description": row.description,
+                "message_id": row.message_id,
+                "attendees": row.attendees,
+                "archived_at": archived_at
+            } for row in past])
+
+            for row in past:
+                self.update_statistic(session, row.date, held=1, attendees=row.attendees)
+
+            poll_ids = [row.poll_id for row in past if row.poll_id is not None]
+            session.execute(delete(Attendance).where(Attendance.poll_id.in_(poll_ids)))
+            session.execute(delete(PizzaOrder).where(PizzaOrder.date < today))
+            session.execute(delete(AlfredoDate).where(AlfredoDate.id.in_([row.id for row in past])))
+            session.commit()
+
+        self.version += 1
+        self.log.info(f"archived {len(past)} past date(s)")
+
+        return len(past)
+
+    def compact(self):
+        # VACUUM must not run inside a transaction
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            mode = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+
+            if mode != AUTO_VACUUM_INCREMENTAL:
+                # databases created before archival existed need one full VACUUM to switch modes
+                self.log.info("switching database to incremental auto_vacuum")
+                conn.exec_driver_sql(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+                conn.exec_driver_sql("VACUUM")
+            else:
+                conn.exec_driver_sql("PRAGMA incremental_vacuum")
+
+            conn.execute(text("ANALYZE"))
+
+        self.log.debug("compacted database")
@@ -1,2 +1,3 @@
 #!/bin/sh
-python3 bot.py -l debug -c ext/config.json -d ext/alfredo.sqlite
+# exec, so signals (SIGTERM from docker stop, SIGUSR1, SIGHUP) reach the bot
+exec python3 bot.py -l debug --log-sample BotRunner.api=10 -c ext/config.json -d ext/alfredo.sqlite --health-port 8080
@@ -0,0 +1,105 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class HealthMonitor:
+    def __init__(self, max_lag, queue_depth, running, db_ping, stopping, circuits=dict, connections=dict):
+        # callables, evaluated when the state is requested
+        self.queue_depth = queue_depth
+        self.running = running
+        self.db_ping = db_ping
+        self.stopping = stopping
+        self.circuits = circuits
+        self.connections = connections
+
+        self.max_lag = max_lag
+        self.started_at = time.monotonic()
+        self.last_poll = None
+        self.last_error = None
+
+    def polled(self):
+        self.last_poll = time.monotonic()
+
+    def api_error(self, method, ex):
+        self.last_error = (method, str(ex), time.monotonic())
+
+    def polling_lag(self):
+        # until the first successful poll, the lag counts from startup
+        return time.monotonic() - (self.last_poll if self.last_poll is not None else self.started_at)
+
+    def state(self):
+        lag = self.polling_lag()
+        now = time.monotonic()
+
+        try:
+            db_round_trip = round(self.db_ping() * 1000, 3)
+        except Exception as ex:
+            db_round_trip = None
+            self.api_error("database", ex)
+
+        ready = lag <= self.max_lag and db_round_trip is not None and not self.stopping()
+
+        last_error = None
+        if self.last_error is not None:
+            method, error, at = self.last_error
+            last_error = {"method": method, "error": error, "seconds_ago": round(now - at, 1)}
+
+        return {
+            "ready": ready,
+            "polling_lag": round(lag, 1),
+            "max_polling_lag": self.max_lag,
+            "handler_queue_depth": self.queue_depth(),
+            "handlers_running": self.running(),
+            "db_round_trip_ms": db_round_trip,
+            "last_api_error": last_error,
+            "circuits": self.circuits(),
+            "connections": self.connections()
+        }
+
+
+class HealthRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ["/health", "/ready"]:
+            self.send_error(404)
+            return
+
+        state = self.server.monitor.state()
+        body = json.dumps(state).encode("utf-8")
+
+        # /health only shows whether the process answers, /ready whether polling works
+        status = 503 if self.path == "/ready" and not state["ready"] else 200
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.getLogger("HealthServer").debug(format % args)
+
+
+class HealthServer:
+    def __init__(self, monitor, host, port):
+        self.log = logging.getLogger("HealthServer")
+
+        self.server = ThreadingHTTPServer((host, port), HealthRequestHandler)
+        self.server.daemon_threads = True
+        self.server.monitor = monitor
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self.log.info(f"serving health endpoint on port {self.port}")
+        self.thread = threading.Thread(target=self.server.serve_forever, name="HealthServer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,155 @@
+import json
+import logging
+from os import listdir, path
+from random import choice
+from string import Formatter
+
+import util
+
+LOCALES_DIR = path.join(path.dirname(path.abspath(__file__)), "locales")
+
+# the reference catalog, other languages fall back to it for missing texts
+DEFAULT_LANGUAGE = "de"
+
+log = logging.getLogger("i18n")
+
+
+class CatalogError(Exception):
+    pass
+
+
+def available_languages(directory=LOCALES_DIR):
+    return sorted(name[:-len(".json")] for name in listdir(directory) if name.endswith(".json"))
+
+
+def compile_template(template):
+    # emojis are filled in right away, the remaining fields are returned for the check against the reference
+    parts = []
+    fields = set()
+
+    for literal, field, spec, conversion in Formatter().parse(template):
+        parts.append(literal.replace("{", "{{").replace("}", "}}"))
+
+        if field is None:
+            continue
+
+        if field in util.emojis:
+            parts.append(util.emojis[field])
+            continue
+
+        fields.add(field)
+        conversion = f"!{conversion}" if conversion else ""
+        spec = f":{spec}" if spec else ""
+        parts.append(f"{{{field}{conversion}{spec}}}")
+
+    return "".join(parts), fields
+
+
+class Catalog:
+    # lookup tables of one language, nothing is parsed after the catalog was compiled
+    def __init__(self, language, entries, reference=None):
+        self.language = language
+        self.locale = entries.get("locale", "de_DE")
+        self.name = entries.get("name", language)
+        self.commands = dict(entries.get("commands", {}))
+
+        # texts without fields are rendered once, the others keep the bound format method of their template
+        self.texts = {}
+        self.templates = {}
+        self.lists = {}
+        # placeholders of every template, so other languages can be checked against them
+        self.fields = {}
+
+        for key, value in entries.get("messages", {}).items():
+            if isinstance(value, list):
+                self.lists[key] = tuple(compile_template(item)[0].format() for item in value)
+                continue
+
+            template, fields = compile_template(value)
+            self.fields[key] = fields
+
+            if fields:
+                self.templates[key] = template.format
+            else:
+                self.texts[key] = template.format()
+
+        if reference is not None:
+            self.check(reference)
+
+    def check(self, reference):
+        for key, fields in self.fields.items():
+            if key not in reference.fields:
+                raise CatalogError(f"{self.language}: unknown message '{key}'")
+
+            if fields != reference.fields[key]:
+                raise CatalogError(f"{self.language}: message '{key}' expects {sorted(reference.fields[key])}, "
+                                   f"not {sorted(fields)}")
+
+        for key in self.lists:
+            if key not in reference.lists:
+                raise CatalogError(f"{self.language}: unknown list '{key}'")
+
+        missing = [key for key in reference.fields if key not in self.fields]
+        missing += [key for key in reference.lists if key not in self.lists]
+
+        if missing:
+            log.warning(f"{self.language}: {len(missing)} messages missing, using {reference.language} for them")
+
+        for table in ["texts", "templates", "lists"]:
+            own = getattr(self, table)
+            for key, value in getattr(reference, table).items():
+                own.setdefault(key, value)
+
+    def text(self, key):
+        return self.texts[key]
+
+    def format(self, key, **kwargs):
+        return self.templates[key](**kwargs)
+
+    def message(self, key, fields):
+        # for keys that are only known at runtime, which may or may not have fields
+        return self.format(key, **fields) if key in self.templates else self.text(key)
+
+    def choices(self, key):
+        return self.lists[key]
+
+    def random(self, key):
+        return choice(self.lists[key])
+
+    def command(self, name, default):
+        return self.commands.get(name, default)
+
+    def date(self, date_):
+        return util.format_date(date_, self.locale)
+
+    def month(self, year, month):
+        return util.format_month(year, month, self.locale)
+
+
+class Catalogs:
+    # all catalogs are compiled at startup, errors in a translation stop the bot right away
+    def __init__(self, default=DEFAULT_LANGUAGE, directory=LOCALES_DIR):
+        self.languages = available_languages(directory)
+
+        if DEFAULT_LANGUAGE not in self.languages:
+            raise CatalogError(f"reference catalog {DEFAULT_LANGUAGE}.json not found in {directory}")
+
+        if default not in self.languages:
+            raise CatalogError(f"no catalog for language '{default}', available: {', '.join(self.languages)}")
+
+        reference = Catalog(DEFAULT_LANGUAGE, self.load(directory, DEFAULT_LANGUAGE))
+        self.catalogs = {DEFAULT_LANGUAGE: reference}
+
+        for language in self.languages:
+            if language != DEFAULT_LANGUAGE:
+                self.catalogs[language] = Catalog(language, self.load(directory, language), reference)
+
+        self.default = self.catalogs[default]
+
+    @staticmethod
+    def load(directory, language):
+        with open(path.join(directory, f"{language}.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, language):
+        return self.catalogs.get(language, self.default)
@@ -0,0 +1,95 @@
+import logging
+import threading
+from datetime import date
+
+from telebot.types import InlineQueryResultArticle, InputTextMessageContent
+
+# queries are matched by prefix, so "term" already shows the dates
+QUERIES = ["termine", "karte"]
+
+
+class InlineResults:
+    def __init__(self, db, menu, render_dates, catalog):
+        self.log = logging.getLogger("InlineResults")
+
+        self.db = db
+        self.menu_cache = menu
+        self.render_dates = render_dates
+        # inline queries don't belong to a chat, results are in the default language
+        self.catalog = catalog
+
+        # result sets are only regenerated if their source changed, see dates() and menu()
+        self.lock = threading.Lock()
+        self.dates_key = None
+        self.dates_results = []
+        self.menu_key = None
+        self.menu_results = []
+
+    def dates(self):
+        # the set of future dates also changes at midnight without any write
+        key = (self.db.version, date.today())
+
+        with self.lock:
+            if key != self.dates_key:
+                self.log.debug("regenerating inline results for dates")
+                self.dates_results = self.build_dates()
+                self.dates_key = key
+
+            return self.dates_results
+
+    def build_dates(self):
+        dates = self.db.get_future_dates()
+
+        results = [InlineQueryResultArticle(
+            id="termine",
+            title=self.catalog.text("inline_dates"),
+            description=self.catalog.format("inline_dates_count", count=len(dates)),
+            input_message_content=InputTextMessageContent(self.render_dates(dates))
+        )]
+
+        for date_ in dates:
+            text = self.catalog.format("inline_date", date=self.catalog.date(date_.date))
+            results.append(InlineQueryResultArticle(
+                id=f"termine-{date_.id}",
+                title=self.catalog.date(date_.date),
+                description=date_.description,
+                input_message_content=InputTextMessageContent(text)
+            ))
+
+        return results
+
+    def menu(self):
+        menu = self.menu_cache.get()
+
+        with self.lock:
+            # the cache hands out a new object whenever menu.tex was parsed again
+            if menu is not self.menu_key:
+                self.log.debug("regenerating inline results for menu")
+                self.menu_results = self.build_menu(menu)
+                self.menu_key = menu
+
+            return self.menu_results
+
+    def build_menu(self, menu):
+        if menu is None:
+            return []
+
+        return [InlineQueryResultArticle(
+            id="karte",
+            title=self.catalog.text("inline_menu"),
+            description=", ".join(group.name for group in menu.groups),
+            input_message_content=InputTextMessageContent(menu.text(self.catalog.choices("menu_markers")),
+                                                          parse_mode="HTML")
+        )]
+
+    def get(self, query):
+        query = query.strip().lower()
+        results = []
+
+        if QUERIES[0].startswith(query):
+            results += self.dates()
+
+        if QUERIES[1].startswith(query):
+            results += self.menu()
+
+        return results
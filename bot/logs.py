@@ -0,0 +1,117 @@
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+
+
+class Lazy:
+    # defers an expensive log argument until a handler actually formats the record
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+
+        # structured fields passed with extra={"fields": {...}}, callables are evaluated here
+        for key, value in getattr(record, "fields", {}).items():
+            entry[key] = value() if callable(value) else value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # the stock QueueHandler formats the message in the calling thread, leave that to the listener
+    def prepare(self, record):
+        if record.exc_info:
+            # tracebacks reference frames which may change until the listener gets to them
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    # keeps only every n-th debug record of the configured loggers (including their children)
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+        self.counters = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def rate(self, name):
+        while name:
+            if name in self.rates:
+                return name, self.rates[name]
+            name = name.rpartition(".")[0]
+
+        return None, 1
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+
+        name, rate = self.rate(record.name)
+        if rate <= 1:
+            return True
+
+        with self.lock:
+            keep = self.counters[name] % rate == 0
+            self.counters[name] += 1
+
+        return keep
+
+
+def parse_sampling(value):
+    name, _, rate = value.partition("=")
+
+    if not name or not rate.isdigit() or int(rate) < 1:
+        raise ValueError(f"invalid sampling '{value}', expected LOGGER=N")
+
+    return name, int(rate)
+
+
+def setup_logging(level, json_lines=True, sampling=None, stream=None):
+    # handlers only write from the listener thread, so slow disks do not block handlers
+    handler = logging.StreamHandler(stream or sys.stderr)
+
+    if json_lines:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    # SimpleQueue is reentrant, so logging from signal handlers is safe
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sampling or {}))
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+
+    return listener
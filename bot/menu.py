@@ -0,0 +1,143 @@
+import hashlib
+import html
+import logging
+import os
+import re
+import threading
+
+import util
+
+log = logging.getLogger("menu")
+
+# \Entry{name}{price} (the second argument is missing for some entries), the name of each
+# group is the name of the alternative that matched
+TOKEN_RE = re.compile(
+    r"\\begin\{Group\}\{(?P<group>[^}]*)\}"
+    r"|(?P<end>\\end\{Group\})"
+    r"|\\Entry\{(?P<entry>[^}]*)\}"
+    r"|\\Expl\{(?P<expl>[^}]*)\}"
+)
+
+MARKER = r"$\ast$"
+
+# latex constructs that occur in menu texts
+replacements = [
+    ("\\-", ""),
+    ("``", "\u201E"),
+    ("''", "\u201C"),
+    ("~", " "),
+]
+
+
+def clean_text(text):
+    for old, new in replacements:
+        text = text.replace(old, new)
+
+    return " ".join(text.split())
+
+
+class MenuItem:
+    def __init__(self, name, description=None, markers=0):
+        self.name = name
+        self.description = description
+        self.markers = markers
+
+
+class MenuGroup:
+    def __init__(self, name):
+        self.name = name
+        self.items = []
+
+
+class Menu:
+    def __init__(self, groups):
+        self.groups = groups
+        self.body = self.render()
+        self.used_markers = sorted({item.markers for group in groups for item in group.items if item.markers > 0})
+
+    def text(self, labels):
+        # labels[n - 1] explains n markers (see \FooterOne in menu.tex), they come from the catalog of the chat
+        legend = ", ".join(f"{'*' * m} {labels[m - 1] if m <= len(labels) else ''}" for m in self.used_markers)
+        return f"{self.body}\n\n{legend}".strip()
+
+    def render(self):
+        # the items are rendered once per parsed file, the result is sent as HTML message
+        text = ""
+
+        for group in self.groups:
+            text += f"<b>{html.escape(group.name)}</b>\n"
+
+            for item in group.items:
+                text += f"{util.emoji('bullet')} {html.escape(item.name)}{'*' * item.markers}\n"
+
+                if item.description:
+                    text += f"    <i>{html.escape(item.description)}</i>\n"
+
+            text += "\n"
+
+        return text.strip()
+
+
+def parse_menu(source):
+    groups = []
+    group = None
+    item = None
+
+    for match in TOKEN_RE.finditer(source):
+        kind = match.lastgroup
+        value = match.group(kind)
+
+        if kind == "group":
+            group = MenuGroup(clean_text(value))
+            groups.append(group)
+            item = None
+        elif kind == "end":
+            group = None
+            item = None
+        elif group is None:
+            # \Entry and \Expl are only used inside of groups (and in the macro definitions)
+            continue
+        elif kind == "entry":
+            item = MenuItem(clean_text(value.replace(MARKER, "")), markers=value.count(MARKER))
+            group.items.append(item)
+        elif kind == "expl" and item is not None:
+            item.description = clean_text(value)
+
+    return Menu(groups)
+
+
+class MenuCache:
+    def __init__(self, menu_file):
+        self.menu_file = menu_file
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.digest = None
+        self.menu = None
+
+    def get(self):
+        # stat() on every call, the file is only read if its mtime changed and only parsed if its content did
+        try:
+            mtime = os.stat(self.menu_file).st_mtime_ns
+        except OSError as ex:
+            log.error(f"could not stat menu file: {ex}")
+            return self.menu
+
+        with self.lock:
+            if mtime == self.mtime:
+                return self.menu
+
+            with open(self.menu_file, "rb") as f:
+                content = f.read()
+
+            digest = hashlib.sha256(content).hexdigest()
+            self.mtime = mtime
+
+            if digest == self.digest:
+                log.debug("menu file was touched, but did not change")
+                return self.menu
+
+            log.info(f"parsing menu file {self.menu_file}")
+            self.menu = parse_menu(content.decode("utf-8"))
+            self.digest = digest
+
+            return self.menu
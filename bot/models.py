@@ -1,5 +1,5 @@
 from typing import Optional
-from sqlalchemy import Integer, String, Date
+from sqlalchemy import Integer, String, Date, DateTime
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -11,6 +11,111 @@ class AlfredoDate(Base):
     __tablename__ = "alfredo_date"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    date: Mapped[Date] = mapped_column(Date)
+    date: Mapped[Date] = mapped_column(Date, index=True)
     description: Mapped[Optional[String]] = mapped_column(String)
     message_id: Mapped[Optional[Integer]] = mapped_column(Integer)
+    poll_id: Mapped[Optional[String]] = mapped_column(String, index=True)
+
+
+class AlfredoDateRecord:
+    # immutable copy of an alfredo_date row, read methods return these instead of detached ORM instances
+    __slots__ = ("id", "date", "description", "message_id", "poll_id")
+
+    def __init__(self, id, date, description=None, message_id=None, poll_id=None):
+        for name, value in zip(self.__slots__, (id, date, description, message_id, poll_id)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AlfredoDateRecord is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("AlfredoDateRecord is immutable")
+
+    def astuple(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, AlfredoDateRecord) and self.astuple() == other.astuple()
+
+    def __hash__(self):
+        return hash(self.astuple())
+
+    def __repr__(self):
+        return f"AlfredoDateRecord(id={self.id}, date={self.date}, poll_id={self.poll_id})"
+
+
+class AlfredoDateArchive(Base):
+    __tablename__ = "alfredo_date_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # sqlite may reuse ids of deleted rows, so the original id is not unique in here
+    date_id: Mapped[int] = mapped_column(Integer)
+    date: Mapped[Date] = mapped_column(Date, index=True)
+    description: Mapped[Optional[String]] = mapped_column(String)
+    message_id: Mapped[Optional[Integer]] = mapped_column(Integer)
+    archived_at: Mapped[DateTime] = mapped_column(DateTime)
+    # participants including guests, summed up from the poll answers
+    attendees: Mapped[Optional[Integer]] = mapped_column(Integer)
+
+
+class Attendance(Base):
+    __tablename__ = "attendance"
+
+    poll_id: Mapped[String] = mapped_column(String, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    guests: Mapped[int] = mapped_column(Integer)
+
+
+class AlfredoStatistic(Base):
+    __tablename__ = "alfredo_statistic"
+
+    year: Mapped[int] = mapped_column(Integer, primary_key=True)
+    month: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # announced dates, including cancelled ones
+    created: Mapped[int] = mapped_column(Integer, default=0)
+    cancelled: Mapped[int] = mapped_column(Integer, default=0)
+    # dates that were not cancelled and lie in the past
+    held: Mapped[int] = mapped_column(Integer, default=0)
+    attendees: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class BotState(Base):
+    __tablename__ = "bot_state"
+
+    # small values that have to survive a restart, e.g. the id of the board message
+    key: Mapped[String] = mapped_column(String, primary_key=True)
+    value: Mapped[Optional[String]] = mapped_column(String)
+
+
+class PizzaOrder(Base):
+    __tablename__ = "pizza_order"
+
+    # one row per date, user and item, a date is unique among the current dates
+    date: Mapped[Date] = mapped_column(Date, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    item: Mapped[String] = mapped_column(String, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer)
+
+
+class AuditLog(Base):
+    __tablename__ = "audit_log"
+    # ids are never reused, triggers reject updates and deletes (see Database.upgrade_tables)
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, index=True)
+    user_id: Mapped[Optional[Integer]] = mapped_column(Integer)
+    user_name: Mapped[Optional[String]] = mapped_column(String)
+    action: Mapped[String] = mapped_column(String)
+    date: Mapped[Optional[Date]] = mapped_column(Date)
+    # JSON, e.g. the announced date or the text of an announcement
+    details: Mapped[Optional[String]] = mapped_column(String)
+
+
+class AuditSnapshot(Base):
+    __tablename__ = "audit_snapshot"
+
+    # announced dates after the audit entry entry_id, as JSON
+    entry_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime)
+    state: Mapped[String] = mapped_column(String)
@@ -0,0 +1,130 @@
+import logging
+import threading
+from collections import Counter
+from datetime import date
+
+
+class OrderBook:
+    def __init__(self, db, interval, batch_size):
+        self.log = logging.getLogger("OrderBook")
+
+        # taps only change memory, the changed orders are written after interval seconds
+        # or as soon as batch_size users changed theirs
+        self.db = db
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self.lock = threading.Lock()
+        # date -> user_id -> Counter of items, dates are loaded from the database on first use
+        self.orders = {}
+        # (date, user_id) of orders that differ from the database
+        self.dirty = set()
+        self.timer = None
+        # flushes are written one after the other, so an older state never overwrites a newer one
+        self.flush_lock = threading.Lock()
+
+        # future dates, only read again after a change of the dates or at midnight
+        self.open_key = None
+        self.open_dates = frozenset()
+
+    def is_open(self, date_):
+        key = (self.db.version, date.today())
+
+        if key != self.open_key:
+            self.open_dates = frozenset(row.date for row in self.db.get_future_dates())
+            self.open_key = key
+
+        return date_ in self.open_dates
+
+    def load(self, date_):
+        # has to be called with the lock held
+        orders = self.orders.get(date_)
+
+        if orders is None:
+            orders = self.orders[date_] = {}
+
+            for row in self.db.get_orders(date_):
+                orders.setdefault(row.user_id, Counter())[row.item] = row.count
+
+        return orders
+
+    def add(self, date_, user_id, item):
+        # returns the user's order after adding one of item
+        with self.lock:
+            order = self.load(date_).setdefault(user_id, Counter())
+            order[item] += 1
+            self.changed(date_, user_id)
+
+            return dict(order)
+
+    def clear(self, date_, user_id):
+        with self.lock:
+            if self.load(date_).pop(user_id, None) is not None:
+                self.changed(date_, user_id)
+
+        return {}
+
+    def get(self, date_, user_id):
+        with self.lock:
+            return dict(self.load(date_).get(user_id, {}))
+
+    def summary(self, date_):
+        # returns the total of every item and the number of users who ordered
+        with self.lock:
+            orders = self.load(date_)
+            totals = sum(orders.values(), Counter())
+
+            return totals, len(orders)
+
+    def discard(self, dates):
+        # orders of cancelled dates are deleted together with the date
+        with self.lock:
+            for date_ in dates:
+                self.orders.pop(date_, None)
+
+            self.dirty = {(d, u) for d, u in self.dirty if d not in dates}
+
+    def changed(self, date_, user_id):
+        self.dirty.add((date_, user_id))
+
+        if len(self.dirty) >= self.batch_size:
+            # written by another thread, the reply to the tap is not delayed by the database
+            self.schedule(0)
+        elif self.timer is None:
+            self.schedule(self.interval)
+
+    def schedule(self, delay):
+        if self.timer is not None:
+            self.timer.cancel()
+
+        self.timer = threading.Timer(delay, self.flush)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def flush(self):
+        # returns the number of written orders
+        with self.flush_lock:
+            with self.lock:
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+
+                changes = [(d, u, dict(self.orders[d].get(u, {}))) for d, u in self.dirty]
+                self.dirty = set()
+
+            if not changes:
+                return 0
+
+            try:
+                self.db.set_orders(changes)
+            except Exception as ex:
+                self.log.error(f"could not write {len(changes)} order(s), retrying later: {ex}")
+
+                with self.lock:
+                    self.dirty.update((d, u) for d, u, _ in changes)
+                    if self.timer is None:
+                        self.schedule(self.interval)
+                return 0
+
+        self.log.debug(f"wrote {len(changes)} order(s)")
+        return len(changes)
@@ -0,0 +1,66 @@
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date
+
+
+class Page(namedtuple("Page", ["dates", "offset", "total"])):
+    # offset is the number of future dates before the first one on this page
+    @property
+    def has_prev(self):
+        return self.offset > 0
+
+    @property
+    def has_next(self):
+        return self.offset + len(self.dates) < self.total
+
+
+class DatePages:
+    def __init__(self, db, page_size, max_entries=128):
+        self.log = logging.getLogger("DatePages")
+
+        self.db = db
+        self.page_size = page_size
+        self.max_entries = max_entries
+
+        # rendered pages of the current dates, dropped as a whole when the dates change or at midnight
+        self.lock = threading.Lock()
+        self.key = None
+        self.entries = OrderedDict()
+
+    def page(self, after=None, before=None):
+        # pages are found by the date of their neighbour (keyset), so no query has to skip rows
+        dates = self.db.get_date_page(after=after, before=before, limit=self.page_size)
+
+        if len(dates) == 0 and (after is not None or before is not None):
+            # the neighbour was the last (or first) date and got cancelled in the meantime
+            return self.page()
+
+        offset = self.db.count_future_dates(before=dates[0].date) if dates else 0
+        return Page(dates, offset, self.db.count_future_dates())
+
+    def get(self, key, render, after=None, before=None):
+        # returns render(page) for the page after or before a date, cached per version of the dates
+        version = (self.db.version, date.today())
+        key = (key, after, before)
+
+        with self.lock:
+            if version != self.key:
+                self.entries.clear()
+                self.key = version
+
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+
+        result = render(self.page(after, before))
+
+        with self.lock:
+            # a change of the dates during rendering makes the result outdated
+            if version == self.key:
+                self.entries[key] = result
+
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+
+        return result
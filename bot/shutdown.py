@@ -0,0 +1,60 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ShutdownCoordinator:
+    def __init__(self):
+        self.log = logging.getLogger("ShutdownCoordinator")
+
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.stopping = False
+        self.requested_at = None
+
+    def request(self):
+        # returns False if a shutdown is already in progress
+        with self.cond:
+            if self.stopping:
+                return False
+
+            self.stopping = True
+            self.requested_at = time.monotonic()
+
+        return True
+
+    def begin(self):
+        with self.cond:
+            self.in_flight += 1
+
+    def end(self):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+
+    @contextmanager
+    def track(self):
+        self.begin()
+
+        try:
+            yield
+        finally:
+            self.end()
+
+    def drain(self, timeout, pending=lambda: 0):
+        # waits for tracked work and for pending(), the number of queued but not yet started handlers
+        deadline = time.monotonic() + timeout
+
+        with self.cond:
+            while self.in_flight > 0 or pending() > 0:
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+                    self.log.warning(f"drain timed out, {self.in_flight} running and {pending()} queued handlers left")
+                    return False
+
+                # queued handlers don't notify, so check again periodically
+                self.cond.wait(min(remaining, 0.1))
+
+        return True
@@ -0,0 +1,414 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from datetime import date, datetime
+from typing import Protocol
+
+import audit
+from database import Database, STATISTIC_COUNTERS
+from models import AlfredoDateRecord
+
+STORAGE_BACKENDS = ["sqlite", "memory"]
+# used if no path is given, the backends can't read each other's files
+DEFAULT_PATHS = {"sqlite": "alfredo.sqlite", "memory": "alfredo.json"}
+# first bytes of every sqlite database file
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+# same fields as the rows of the corresponding Database queries, PastDate as the rows of alfredo_date_archive
+PastDate = namedtuple("PastDate", ["id", "date", "description", "message_id", "attendees"])
+DateAttendance = namedtuple("DateAttendance", ["date", "description", "attendees"])
+Statistic = namedtuple("Statistic", ["year", "month"] + STATISTIC_COUNTERS)
+Order = namedtuple("Order", ["user_id", "item", "count"])
+
+
+class Storage(Protocol):
+    # everything BotRunner needs from a backend, Database is the reference implementation
+    version: int
+
+    def create_alfredo_date(self, date, description=None, message_id=None, poll_id=None, actor=None): ...
+    def get_future_dates(self): ...
+    def get_future_attendance(self): ...
+    def get_date_page(self, after=None, before=None, limit=10): ...
+    def count_future_dates(self, before=None): ...
+    def get_by_date(self, date): ...
+    def get_dates_between(self, start, end): ...
+    def delete_date(self, date): ...
+    def delete_dates(self, dates, actor=None): ...
+    def delete_dates_by_id(self, ids, actor=None): ...
+    def set_attendance(self, poll_id, user_id, guests): ...
+    def get_attendees(self, poll_id): ...
+    def get_orders(self, date): ...
+    def set_orders(self, changes): ...
+    def get_statistics(self): ...
+    def rebuild_statistics(self): ...
+    def archive_past_dates(self, today=None): ...
+    def get_state(self, key): ...
+    def set_state(self, key, value): ...
+    def audit(self, actor, action, date=None, details=None): ...
+    def get_audit(self, limit=10): ...
+    def get_audit_state(self, at): ...
+    def compact(self): ...
+    def ping(self): ...
+    def close(self): ...
+
+
+class MemoryStorage:
+    def __init__(self, snapshot_file=None):
+        self.log = logging.getLogger("MemoryStorage")
+
+        # without a file (or with ":memory:") nothing survives a restart
+        self.snapshot_file = snapshot_file if snapshot_file != ":memory:" else None
+        self.lock = threading.RLock()
+        self.version = 0
+
+        self.dates = {}
+        # poll_id -> id, votes are only accepted for known polls
+        self.polls = {}
+        # (date, id) of every row in self.dates, sorted, so date ranges are found by bisection
+        self.index = []
+        self.next_id = 1
+        self.archive = []
+        self.attendance = {}
+        self.statistics = {}
+        self.state = {}
+        # date -> user_id -> item -> count
+        self.orders = {}
+        # AuditEntry in the order they were written, (entry_id, created_at, state) every audit_snapshot_interval
+        self.audit_log = []
+        self.audit_snapshots = []
+        self.audit_snapshot_interval = audit.SNAPSHOT_INTERVAL
+
+        if self.snapshot_file is not None and os.path.isfile(self.snapshot_file):
+            self.load()
+
+    def load(self):
+        self.log.info(f"loading snapshot {self.snapshot_file}")
+
+        with open(self.snapshot_file, "rb") as f:
+            if f.read(len(SQLITE_HEADER)) == SQLITE_HEADER:
+                raise Exception(f"{self.snapshot_file} is a sqlite database, not a snapshot of the memory storage")
+
+        with open(self.snapshot_file) as f:
+            snapshot = json.load(f)
+
+        for row in snapshot["dates"]:
+            self.insert(AlfredoDateRecord(row["id"], date.fromisoformat(row["date"]), row["description"],
+                                          row["message_id"], row["poll_id"]))
+
+        self.next_id = snapshot["next_id"]
+        self.archive = [PastDate(row[0], date.fromisoformat(row[1]), *row[2:]) for row in snapshot["archive"]]
+        self.attendance = {poll_id: {int(user_id): guests for user_id, guests in votes.items()}
+                           for poll_id, votes in snapshot["attendance"].items()}
+        self.statistics = {(row[0], row[1]): list(row[2:]) for row in snapshot["statistics"]}
+        self.state = snapshot["state"]
+
+        # snapshots written before orders existed don't have them
+        for day, user_id, item, count in snapshot.get("orders", []):
+            self.orders.setdefault(date.fromisoformat(day), {}).setdefault(user_id, {})[item] = count
+
+        for row in snapshot.get("audit_log", []):
+            self.audit_log.append(audit.AuditEntry(row[0], datetime.fromisoformat(row[1]), *row[2:5],
+                                                   date.fromisoformat(row[5]) if row[5] else None, row[6]))
+
+        self.audit_snapshots = [(row[0], datetime.fromisoformat(row[1]), row[2])
+                                for row in snapshot.get("audit_snapshots", [])]
+
+    def save(self):
+        if self.snapshot_file is None:
+            return
+
+        snapshot = {
+            "dates": [{"id": d.id, "date": d.date.isoformat(), "description": d.description,
+                       "message_id": d.message_id, "poll_id": d.poll_id} for d in self.dates.values()],
+            "next_id": self.next_id,
+            "archive": [[row.id, row.date.isoformat(), *row[2:]] for row in self.archive],
+            "attendance": self.attendance,
+            "statistics": [[*key, *values] for key, values in self.statistics.items()],
+            "state": self.state,
+            "orders": [[day.isoformat(), user_id, item, count] for day, users in self.orders.items()
+                       for user_id, order in users.items() for item, count in order.items()],
+            "audit_log": [[e.id, e.created_at.isoformat(), e.user_id, e.user_name, e.action,
+                           e.date.isoformat() if e.date else None, e.details] for e in self.audit_log],
+            "audit_snapshots": [[entry_id, created_at.isoformat(), state]
+                                for entry_id, created_at, state in self.audit_snapshots]
+        }
+
+        # written to a temporary file first, so a crash never leaves a truncated snapshot behind
+        directory = os.path.dirname(os.path.abspath(self.snapshot_file))
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as f:
+            json.dump(snapshot, f)
+
+        os.replace(f.name, self.snapshot_file)
+
+    def insert(self, row):
+        self.dates[row.id] = row
+        insort(self.index, (row.date, row.id))
+
+        if row.poll_id is not None:
+            self.polls[row.poll_id] = row.id
+
+    def remove(self, row):
+        del self.dates[row.id]
+        self.index.pop(bisect_left(self.index, (row.date, row.id)))
+        self.polls.pop(row.poll_id, None)
+        self.attendance.pop(row.poll_id, None)
+        self.orders.pop(row.date, None)
+
+    def between(self, start=None, end=None):
+        # (date,) sorts before and (date, inf) after every (date, id)
+        lo = bisect_left(self.index, (start,)) if start is not None else 0
+        hi = bisect_right(self.index, (end, float("inf"))) if end is not None else len(self.index)
+        return [self.dates[i] for _, i in self.index[lo:hi]]
+
+    def count_statistic(self, date, **counters):
+        values = self.statistics.setdefault((date.year, date.month), [0] * len(STATISTIC_COUNTERS))
+
+        for i, counter in enumerate(STATISTIC_COUNTERS):
+            values[i] += counters.get(counter, 0)
+
+    def create_alfredo_date(self, date, description=None, message_id=None, poll_id=None, actor=None):
+        with self.lock:
+            self.insert(AlfredoDateRecord(self.next_id, date, description, message_id, poll_id))
+            self.next_id += 1
+            self.count_statistic(date, created=1)
+
+            if actor is not None:
+                self.write_audit(actor, audit.CREATE, date,
+                                 {"description": description, "message_id": message_id, "poll_id": poll_id})
+
+            self.version += 1
+            self.save()
+
+    def get_future_dates(self):
+        with self.lock:
+            return self.between(date.today())
+
+    def get_date_page(self, after=None, before=None, limit=10):
+        with self.lock:
+            start = date.today()
+            if after is not None:
+                start = max(start, date.fromordinal(after.toordinal() + 1))
+
+            end = date.fromordinal(before.toordinal() - 1) if before is not None else None
+            rows = self.between(start, end) if end is None or start <= end else []
+
+            return rows[-limit:] if before is not None else rows[:limit]
+
+    def count_future_dates(self, before=None):
+        with self.lock:
+            end = bisect_left(self.index, (before,)) if before is not None else len(self.index)
+            return max(0, end - bisect_left(self.index, (date.today(),)))
+
+    def get_future_attendance(self):
+        with self.lock:
+            return [DateAttendance(d.date, d.description, self.get_attendees(d.poll_id))
+                    for d in self.between(date.today())]
+
+    def get_by_date(self, date):
+        with self.lock:
+            rows = self.between(date, date)
+            return rows[0] if rows else None
+
+    def get_dates_between(self, start, end):
+        with self.lock:
+            return self.between(start, end)
+
+    def delete_date(self, date):
+        self.delete_dates([date])
+
+    def delete_dates(self, dates, actor=None):
+        return self.delete_dates_by_id([d.id for d in dates], actor)
+
+    def delete_dates_by_id(self, ids, actor=None):
+        with self.lock:
+            rows = [self.dates[i] for i in ids if i in self.dates]
+
+            for row in rows:
+                self.remove(row)
+                self.count_statistic(row.date, cancelled=1)
+
+                if actor is not None:
+                    self.write_audit(actor, audit.CANCEL, row.date,
+                                     {"description": row.description, "message_id": row.message_id,
+                                      "poll_id": row.poll_id})
+
+            self.version += 1
+            self.save()
+
+        return len(rows)
+
+    def set_attendance(self, poll_id, user_id, guests):
+        with self.lock:
+            if poll_id not in self.polls:
+                return False
+
+            votes = self.attendance.setdefault(poll_id, {})
+            if guests is None:
+                votes.pop(user_id, None)
+            else:
+                votes[user_id] = guests
+
+            self.save()
+
+        return True
+
+    def get_attendees(self, poll_id):
+        with self.lock:
+            return sum(1 + guests for guests in self.attendance.get(poll_id, {}).values())
+
+    def get_orders(self, date):
+        with self.lock:
+            return [Order(user_id, item, count) for user_id, order in sorted(self.orders.get(date, {}).items())
+                    for item, count in sorted(order.items())]
+
+    def set_orders(self, changes):
+        written = 0
+
+        with self.lock:
+            for day, user_id, order in changes:
+                users = self.orders.get(day, {})
+                users.pop(user_id, None)
+                order = {item: count for item, count in order.items() if count > 0}
+
+                # orders of dates that were cancelled or archived in the meantime are dropped
+                if order and self.between(day, day):
+                    users[user_id] = order
+                    written += len(order)
+
+                if users:
+                    self.orders[day] = users
+                else:
+                    self.orders.pop(day, None)
+
+            self.save()
+
+        return written
+
+    def get_statistics(self):
+        with self.lock:
+            return [Statistic(*key, *values) for key, values in sorted(self.statistics.items())]
+
+    def rebuild_statistics(self):
+        with self.lock:
+            # cancelled dates are deleted, so their counts can only be carried over
+            cancelled = {key: values[STATISTIC_COUNTERS.index("cancelled")] for key, values in self.statistics.items()}
+            self.statistics = {}
+
+            for (year, month), count in cancelled.items():
+                if count > 0:
+                    self.count_statistic(date(year, month, 1), created=count, cancelled=count)
+
+            for row in self.dates.values():
+                self.count_statistic(row.date, created=1)
+
+            for row in self.archive:
+                self.count_statistic(row.date, created=1, held=1, attendees=row.attendees or 0)
+
+            self.save()
+
+        self.log.info("rebuilt statistics")
+
+    def archive_past_dates(self, today=None):
+        if today is None:
+            today = date.today()
+
+        with self.lock:
+            past = self.between(end=date.fromordinal(today.toordinal() - 1))
+
+            if len(past) == 0:
+                return 0
+
+            for row in past:
+                attendees = self.get_attendees(row.poll_id)
+                insort(self.archive, PastDate(row.id, row.date, row.description, row.message_id, attendees),
+                       key=lambda r: r.date)
+                self.count_statistic(row.date, held=1, attendees=attendees)
+                self.remove(row)
+
+            self.version += 1
+            self.save()
+
+        self.log.info(f"archived {len(past)} past date(s)")
+        return len(past)
+
+    def get_state(self, key):
+        with self.lock:
+            return self.state.get(key)
+
+    def set_state(self, key, value):
+        with self.lock:
+            self.state[key] = value
+            self.save()
+
+    def audit(self, actor, action, date=None, details=None):
+        with self.lock:
+            self.write_audit(actor, action, date, details)
+            self.save()
+
+    def write_audit(self, actor, action, date=None, details=None):
+        # has to be called with the lock held, the caller saves the snapshot file
+        now = datetime.now()
+        entry_id = self.audit_log[-1].id + 1 if self.audit_log else 1
+        # details are stored as JSON like in the database, so callers can't change an entry afterwards
+        self.audit_log.append(audit.AuditEntry(entry_id, now, actor.user_id, actor.name, action, date,
+                                               audit.dump(details)))
+
+        last = self.audit_snapshots[-1][0] if self.audit_snapshots else 0
+
+        if entry_id - last >= self.audit_snapshot_interval:
+            self.audit_snapshots.append((entry_id, now, audit.dump(self.audit_state(entry_id))))
+
+    def audit_state(self, entry_id):
+        start, state = 0, {}
+
+        for snapshot_id, _, snapshot in reversed(self.audit_snapshots):
+            if snapshot_id <= entry_id:
+                start, state = snapshot_id, audit.load(snapshot)
+                break
+
+        # ids are consecutive, so entry n is at index n - 1
+        entries = self.audit_log[start:entry_id]
+        return audit.replay(state, ((e.action, e.date, audit.load(e.details)) for e in entries))
+
+    def get_audit(self, limit=10):
+        with self.lock:
+            return [e._replace(details=audit.load(e.details)) for e in reversed(self.audit_log[-limit:])]
+
+    def get_audit_state(self, at):
+        with self.lock:
+            entry_id = max((e.id for e in self.audit_log if e.created_at <= at), default=None)
+
+            if entry_id is None:
+                return None, {}
+
+            return entry_id, self.audit_state(entry_id)
+
+    def compact(self):
+        # the snapshot is rewritten on every change anyway
+        pass
+
+    def ping(self):
+        start = time.perf_counter()
+
+        with self.lock:
+            pass
+
+        return time.perf_counter() - start
+
+    def close(self):
+        with self.lock:
+            self.save()
+
+        self.log.info("closed storage")
+
+
+def open_storage(backend, path):
+    if backend == "memory":
+        return MemoryStorage(path)
+
+    return Database(path)
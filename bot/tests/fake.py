@@ -1,3 +1,4 @@
+import copy
 from functools import wraps
 
 
@@ -28,19 +29,72 @@ class FakeBot:
         self.exceptions = 0
         self.polls = {}
         self.pinned_message_ids = []
+        self.poll_answer_handler = None
+        self.documents = 0
+        # message id -> text of messages sent with send_message
+        self.messages = {}
+        self.chat_administrators = []
+        self.last_update_id = 0
+        self.is_stopped = False
+        self.localized_commands = {}
 
-    def set_my_commands(self, commands):
-        self.commands = commands
+    def set_my_commands(self, commands, language_code=None):
+        if language_code is None:
+            self.commands = commands
+        else:
+            self.localized_commands[language_code] = commands
 
     def register_message_handler(self, func, commands):
         for cmd in commands:
             assert cmd not in self.handlers.keys()
             self.handlers[cmd] = func
 
+    def register_poll_answer_handler(self, callback, func):
+        self.poll_answer_handler = callback
+
+    def register_inline_handler(self, callback, func):
+        self.inline_handler = callback
+
+    def register_chat_member_handler(self, callback, func):
+        self.chat_member_handler = callback
+
+    def register_callback_query_handler(self, callback, func):
+        self.callback_query_handler = callback
+
+    @raise_exception_if_needed()
+    def get_chat_administrators(self, chat_id):
+        return self.chat_administrators
+
+    @raise_exception_if_needed()
+    def answer_inline_query(self, inline_query_id, results, **kwargs):
+        self.last_inline_query_id = inline_query_id
+        self.last_inline_results = results
+        self.last_inline_kwargs = kwargs
+
+    @raise_exception_if_needed()
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        self.last_callback_query_id = callback_query_id
+        self.last_callback_text = text
+
     @raise_exception_if_needed()
     def send_message(self, chat_id, text, **kwargs):
         self.last_message_chat_id = chat_id
         self.last_message_text = text
+        self.last_message_kwargs = kwargs
+
+        # separate range, so message ids of polls stay predictable
+        message_id = 1000 + len(self.messages)
+        self.messages[message_id] = text
+        return FakeMessage(message_id=message_id)
+
+    @raise_exception_if_needed()
+    def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        if message_id not in self.messages:
+            raise Exception("A request to the Telegram API was unsuccessful. Error code: 400. "
+                            "Description: Bad Request: message to edit not found")
+
+        self.messages[message_id] = text
+        self.last_edit_kwargs = kwargs
 
     @raise_exception_if_needed()
     def send_poll(self, chat_id, question, **kwargs):
@@ -59,10 +113,18 @@ class FakeBot:
     @raise_exception_if_needed()
     def reply_to(self, message, text, **kwargs):
         self.last_reply_text = text
+        self.last_reply_kwargs = kwargs
 
     @raise_exception_if_needed()
     def send_document(self, document, **kwargs):
         self.last_document = document
+        self.last_document_kwargs = kwargs
+
+        # separate counter, so message ids of polls stay predictable
+        self.documents += 1
+        message = FakeMessage()
+        message.document = FakeDocument(f"file{self.documents}")
+        return message
 
     @raise_exception_if_needed()
     def get_chat(self, chat_id):
@@ -80,8 +142,21 @@ class FakeBot:
         assert message_id in self.pinned_message_ids
         self.pinned_message_ids.remove(message_id)
 
-    def infinity_polling(self):
+    def infinity_polling(self, **kwargs):
         self.is_polling = True
+        self.polling_kwargs = kwargs
+
+    def stop_polling(self):
+        self.is_polling = False
+
+    def stop_bot(self):
+        self.stop_polling()
+        self.is_stopped = True
+
+    @raise_exception_if_needed()
+    def get_updates(self, offset, **kwargs):
+        self.last_get_updates_offset = offset
+        return []
 
     def raise_on_next_action(self, n=1, delay_by=0):
         self.delay = delay_by
@@ -90,8 +165,27 @@ class FakeBot:
     def handle_command(self, cmd, msg):
         assert cmd in self.handlers.keys()
 
+        # telegram only routes messages starting with the command
+        if msg.text is None:
+            msg = copy.copy(msg)
+            msg.text = f"/{cmd}"
+
         self.handlers[cmd](msg)
 
+    def handle_inline_query(self, query):
+        self.inline_handler(query)
+
+    def handle_chat_member(self, update):
+        self.chat_member_handler(update)
+
+    def handle_callback_query(self, call):
+        self.callback_query_handler(call)
+
+    def handle_poll_answer(self, answer):
+        assert self.poll_answer_handler is not None
+
+        self.poll_answer_handler(answer)
+
 
 class FakeMessage:
     def __init__(self, user=None, chat_type=None, text=None, message_id=None):
@@ -102,18 +196,77 @@ class FakeMessage:
 
 
 class FakeChat:
-    def __init__(self, chat_type, pinned_message=None):
+    def __init__(self, chat_type, pinned_message=None, id_=None):
+        self.id = id_
         self.type = chat_type
         self.pinned_message = pinned_message
 
 
+class FakeDocument:
+    def __init__(self, file_id):
+        self.file_id = file_id
+
+
 class FakeUser:
-    def __init__(self, id_, first_name, username):
+    def __init__(self, id_, first_name, username, is_bot=False):
         self.id = id_
         self.first_name = first_name
         self.username = username
+        self.is_bot = is_bot
+
+
+class FakeChatMember:
+    def __init__(self, user, status):
+        self.user = user
+        self.status = status
+
+
+class FakeChatMemberUpdated:
+    def __init__(self, chat_id, user, old_status, new_status):
+        self.chat = FakeChat("group", id_=chat_id)
+        self.old_chat_member = FakeChatMember(user, old_status)
+        self.new_chat_member = FakeChatMember(user, new_status)
 
 
 class FakePoll:
     def __init__(self, message_id):
         self.message_id = message_id
+        self.poll = FakePollInfo(f"poll{message_id}")
+
+
+class FakePollInfo:
+    def __init__(self, id_):
+        self.id = id_
+
+
+class FakeInlineQuery:
+    def __init__(self, id_, user, query):
+        self.id = id_
+        self.from_user = user
+        self.query = query
+
+
+class FakePollAnswer:
+    def __init__(self, poll_id, user, option_ids):
+        self.poll_id = poll_id
+        self.user = user
+        self.option_ids = option_ids
+
+
+class FakeCallbackQuery:
+    def __init__(self, id_, user, data, chat_id=None, message=None):
+        self.id = id_
+        self.from_user = user
+        self.data = data
+        # the message with the button
+        self.message = message if message is not None else FakeMessage(chat_type="group")
+        self.message.chat.id = chat_id
+
+
+class FakeClock:
+    # replaces time.monotonic, tests advance now by hand
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
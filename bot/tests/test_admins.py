@@ -0,0 +1,115 @@
+import threading
+import time
+
+from admins import GroupAdminCache
+from fake import FakeUser, FakeChatMember
+
+ADMIN = FakeUser(1, "Admin", "admin")
+CREATOR = FakeUser(2, "Creator", None)
+MEMBER = FakeUser(3, "Member", None)
+BOT = FakeUser(4, "Bot", "bot", is_bot=True)
+
+
+class FakeFetch:
+    def __init__(self, members):
+        self.members = members
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.done = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(10)
+        self.done.set()
+        return self.members
+
+
+def refreshed(cache, fetch):
+    # waits for the background refresh to finish
+    assert fetch.done.wait(10)
+    fetch.done.clear()
+
+    for _ in range(1000):
+        if not cache.refreshing:
+            return
+
+        time.sleep(0.01)
+
+
+class TestGroupAdminCache:
+    def test_get(self):
+        fetch = FakeFetch([
+            FakeChatMember(ADMIN, "administrator"),
+            FakeChatMember(CREATOR, "creator"),
+            FakeChatMember(MEMBER, "member"),
+            FakeChatMember(BOT, "administrator")
+        ])
+        cache = GroupAdminCache(fetch, 60)
+
+        # nothing cached yet, get() does not wait for the result
+        fetch.release.clear()
+        assert cache.get() == frozenset()
+        fetch.release.set()
+        refreshed(cache, fetch)
+
+        assert cache.get() == frozenset([ADMIN.id, CREATOR.id])
+        assert fetch.calls == 1
+
+        # fresh data is not fetched again
+        cache.get()
+        assert fetch.calls == 1
+
+    def test_ttl(self):
+        fetch = FakeFetch([FakeChatMember(ADMIN, "administrator")])
+        cache = GroupAdminCache(fetch, 60)
+
+        cache.refresh()
+        assert cache.is_stale() is False
+
+        # stale data is returned until the refresh is done
+        cache.fetched_at -= 61
+        fetch.members = []
+        fetch.release.clear()
+        assert cache.get() == frozenset([ADMIN.id])
+        fetch.release.set()
+        refreshed(cache, fetch)
+        assert cache.get() == frozenset()
+
+    def test_invalidate(self):
+        fetch = FakeFetch([FakeChatMember(ADMIN, "administrator")])
+        cache = GroupAdminCache(fetch, 60)
+
+        cache.refresh()
+        fetch.members = [FakeChatMember(MEMBER, "creator")]
+        fetch.done.clear()
+
+        cache.invalidate()
+        refreshed(cache, fetch)
+        assert cache.get() == frozenset([MEMBER.id])
+
+    def test_single_refresh(self):
+        fetch = FakeFetch([])
+        cache = GroupAdminCache(fetch, 60)
+
+        fetch.release.clear()
+        assert cache.refresh_async()
+        assert cache.refresh_async() is False
+        fetch.release.set()
+        refreshed(cache, fetch)
+
+        assert fetch.calls == 1
+        assert cache.refresh_async()
+        refreshed(cache, fetch)
+
+    def test_fetch_error(self):
+        fetch = FakeFetch([FakeChatMember(ADMIN, "administrator")])
+        cache = GroupAdminCache(fetch, 60)
+        cache.refresh()
+
+        # errors keep the old admins
+        fetch.members = None
+        cache.refresh()
+
+        assert cache.get() == frozenset([ADMIN.id])
+        assert cache.refreshing is False
@@ -0,0 +1,26 @@
+from datetime import date
+
+import audit
+
+
+class TestAudit:
+    def test_dump(self):
+        assert audit.dump(None) is None
+        assert audit.load(audit.dump({"text": "Ä", "poll_id": None})) == {"text": "Ä", "poll_id": None}
+
+    def test_replay(self):
+        entries = [
+            (audit.CREATE, date(2199, 1, 1), {"message_id": 1}),
+            (audit.CREATE, date(2199, 1, 2), {"message_id": 2}),
+            (audit.ANNOUNCE, None, {"text": "Alfredo!"}),
+            (audit.CANCEL, date(2199, 1, 1), {"message_id": 1}),
+            # cancelling an unknown date changes nothing
+            (audit.CANCEL, date(2199, 1, 3), None)
+        ]
+
+        assert audit.replay({}, entries) == {"2199-01-02": {"message_id": 2}}
+
+        # replaying the rest from an intermediate state gives the same result
+        snapshot = audit.replay({}, entries[:2])
+        assert audit.replay(snapshot, entries[2:]) == audit.replay({}, entries)
+        assert len(snapshot) == 2
@@ -1,13 +1,21 @@
 import logging
 from datetime import date, timedelta
 import json
-from fake import FakeBot, FakeUser, FakeMessage
+from fake import FakeBot, FakeUser, FakeMessage, FakePollAnswer, FakeInlineQuery, FakeChatMember, \
+    FakeChatMemberUpdated, FakeCallbackQuery
 from bot_runner import BotRunner
+from breaker import CircuitOpenError
+from config import Config
+from models import AlfredoDateArchive
 import util
 import signal
 from ics import Calendar
 
 import pytest
+import threading
+import time
+from test_builder import FAKE_LATEXMK
+from test_database import assert_row_count
 
 ADMIN1 = FakeUser(42, "Armin", "DerAdmin")
 ADMIN2 = FakeUser(69, "Bernhard", "b0ss")
@@ -26,6 +34,22 @@ def defaultRunner(tmp_path=None):
     return BotRunner(TESTCFG, FakeBot, ":memory:", tmp_path)
 
 
+def group_admin_runner(tmp_path, cfg):
+    tmp_cfg = tmp_path / "tmp.json"
+    cfg["group_admins"] = True
+
+    with open(tmp_cfg, "w") as out:
+        json.dump(cfg, out)
+
+    runner = BotRunner(tmp_cfg, FakeBot, ":memory:", None)
+
+    # wait for the initial refresh, so it can't overwrite the test's data
+    while runner.group_admins.refreshing:
+        time.sleep(0.01)
+
+    return runner, tmp_cfg
+
+
 def assert_num_dates(db, num):
     from models import AlfredoDate
     from sqlalchemy import select, func
@@ -84,6 +108,116 @@ class TestBotRunner:
 
         assert "at least one admin" in ex.value.args[0]
 
+    def test_reload_config(self, tmp_path, caplog):
+        tmp_cfg = tmp_path / "tmp.json"
+
+        with open(TESTCFG) as c:
+            cfg = json.load(c)
+
+        with open(tmp_cfg, "w") as out:
+            json.dump(cfg, out)
+
+        runner = BotRunner(tmp_cfg, FakeBot, ":memory:", None)
+        menu = runner.menu
+        assert runner.user_is_admin(ADMIN1)
+        assert runner.user_is_admin(USER) is False
+
+        # goodcase
+        cfg["admins"] = [USER.id]
+        cfg["group"] = "-42"
+        with open(tmp_cfg, "w") as out:
+            json.dump(cfg, out)
+
+        signal.raise_signal(signal.SIGHUP)
+        assert runner.user_is_admin(ADMIN1) is False
+        assert runner.user_is_admin(USER)
+        assert runner.config["group"] == "-42"
+        # menu and builder are unchanged
+        assert runner.menu is menu
+
+        # invalid config is not applied
+        with caplog.at_level(logging.INFO):
+            cfg["admins"] = []
+            with open(tmp_cfg, "w") as out:
+                json.dump(cfg, out)
+
+            assert runner.reload_config() is False
+            assert "keeping the old one" in caplog.text
+            assert runner.user_is_admin(USER)
+
+            with open(tmp_cfg, "w") as out:
+                out.write("{")
+
+            assert runner.reload_config() is False
+            assert runner.user_is_admin(USER)
+            caplog.clear()
+
+            # changed token and menu file
+            cfg["admins"] = [USER.id]
+            cfg["token"] = "new"
+            cfg["menu_file"] = "menu.tex"
+            with open(tmp_cfg, "w") as out:
+                json.dump(cfg, out)
+
+            assert runner.reload_config()
+            assert "restart the bot" in caplog.text
+            assert runner.bot.token == "abcdefghijklmnopqrstuvwxyz"
+            assert runner.menu is not menu
+            assert runner.menu.menu_file == "menu.tex"
+
+    def test_reload_config_partial(self, tmp_path, caplog):
+        tmp_cfg = tmp_path / "tmp.json"
+
+        with open(TESTCFG) as c:
+            cfg = json.load(c)
+
+        with open(tmp_cfg, "w") as out:
+            json.dump(cfg, out)
+
+        runner = BotRunner(tmp_cfg, FakeBot, ":memory:", None)
+        config, throttle, orders = runner.config, runner.user_throttle, runner.orders
+
+        # the page size is applied, values only read at startup are reported
+        cfg["dates_page_size"] = 3
+        cfg["order_batch_size"] = 5
+        with open(tmp_cfg, "w") as out:
+            json.dump(cfg, out)
+
+        with caplog.at_level(logging.WARNING):
+            assert runner.reload_config()
+        assert "order_batch_size can't be changed at runtime" in caplog.text
+        assert runner.pages.page_size == 3
+        assert runner.orders is orders
+        config = runner.config
+        caplog.clear()
+
+        # values that would only fail when a command is handled are rejected when loading
+        cfg["throttle_user"] = "abc"
+        with open(tmp_cfg, "w") as out:
+            json.dump(cfg, out)
+
+        assert runner.reload_config() is False
+        assert runner.config is config
+
+        def failing(config):
+            raise Exception("broken coalescer")
+
+        # nothing is applied if building one of the objects fails
+        runner.create_coalescer = failing
+        cfg["throttle_user"] = [3, 60]
+        cfg["coalesce_window"] = 10
+        with open(tmp_cfg, "w") as out:
+            json.dump(cfg, out)
+
+        with caplog.at_level(logging.ERROR):
+            assert runner.reload_config() is False
+        assert "broken coalescer" in caplog.text
+        assert runner.config is config
+        assert runner.user_throttle is throttle
+
+        runner.bot.handle_command("help", FakeMessage(USER, text="help"))
+        assert "Kommandos" in runner.bot.last_reply_text
+
     def test_log_command(self, caplog):
         runner = defaultRunner()
 
@@ -119,6 +253,22 @@ class TestBotRunner:
             assert str(ADMIN1.id) in caplog.text
             assert ADMIN1.first_name in caplog.text
 
+    def test_dispatch(self, caplog):
+        runner = defaultRunner()
+
+        # every command is routed through the same handler
+        assert len(set(runner.bot.handlers.values())) == 1
+
+        with caplog.at_level(logging.DEBUG):
+            runner.dispatch(FakeMessage(USER, text="/unknown"))
+            assert "ignoring unknown command" in caplog.text
+
+        runner.dispatch(FakeMessage(USER, text="/karte html"))
+        assert "Unbekannter Parameter" in runner.bot.last_reply_text
+
+        runner.dispatch(FakeMessage(USER, text="/start deeplink"))
+        assert "Mamma Mia" in runner.bot.last_reply_text
+
     def test_send_error(self):
         runner = defaultRunner()
         msg = DEFAULT_MESSAGE
@@ -129,6 +279,23 @@ class TestBotRunner:
         assert "Fehler" in error
         assert "Test" in error
 
+    def test_lazy_user_logging(self, monkeypatch, caplog):
+        runner = defaultRunner()
+        formatted = []
+        monkeypatch.setattr(util, "format_user", lambda user: formatted.append(user) or "someone")
+
+        # users are only formatted for messages that are actually logged
+        with caplog.at_level(logging.WARNING):
+            runner.send_error(DEFAULT_MESSAGE, "Test")
+            runner.bot.handle_inline_query(FakeInlineQuery("q1", USER, "termine"))
+            runner.bot.handle_poll_answer(FakePollAnswer("unknown", USER, [0]))
+        assert formatted == []
+
+        with caplog.at_level(logging.DEBUG):
+            runner.bot.handle_inline_query(FakeInlineQuery("q2", USER, "termine"))
+        assert USER in formatted
+        assert "inline query 'termine' from someone" in caplog.text
+
     def test_user_is_admin(self):
         runner = defaultRunner()
 
@@ -136,6 +303,60 @@ class TestBotRunner:
         assert runner.user_is_admin(ADMIN2)
         assert runner.user_is_admin(USER) is False
 
+    def test_group_admins(self, tmp_path):
+        runner = defaultRunner()
+        assert runner.group_admins is None
+
+        with open(TESTCFG) as c:
+            runner, _ = group_admin_runner(tmp_path, json.load(c))
+
+        runner.bot.chat_administrators = [FakeChatMember(USER, "administrator")]
+        runner.group_admins.refresh()
+
+        assert runner.user_is_admin(USER)
+        assert runner.user_is_admin(ADMIN1)
+
+        # demoted, but the cache is still valid
+        runner.bot.chat_administrators = []
+        assert runner.user_is_admin(USER)
+
+        # telegram error on refresh keeps the old admins
+        runner.bot.raise_on_next_action()
+        runner.group_admins.refresh()
+        assert runner.user_is_admin(USER)
+
+        runner.group_admins.refresh()
+        assert runner.user_is_admin(USER) is False
+
+    def test_handle_chat_member(self, tmp_path):
+        with open(TESTCFG) as c:
+            cfg = json.load(c)
+
+        runner, tmp_cfg = group_admin_runner(tmp_path, cfg)
+
+        invalidated = []
+        runner.group_admins.invalidate = lambda: invalidated.append(True)
+
+        # other chat
+        runner.bot.handle_chat_member(FakeChatMemberUpdated("-1", USER, "member", "administrator"))
+        # no change of admin status
+        runner.bot.handle_chat_member(FakeChatMemberUpdated(GROUP, USER, "member", "left"))
+        runner.bot.handle_chat_member(FakeChatMemberUpdated(GROUP, USER, "administrator", "creator"))
+        assert len(invalidated) == 0
+
+        runner.bot.handle_chat_member(FakeChatMemberUpdated(int(GROUP), USER, "member", "administrator"))
+        runner.bot.handle_chat_member(FakeChatMemberUpdated(GROUP, USER, "administrator", "member"))
+        assert len(invalidated) == 2
+
+        # disabled via config reload
+        del cfg["group_admins"]
+        with open(tmp_cfg, "w") as out:
+            json.dump(cfg, out)
+
+        runner.reload_config()
+        assert runner.group_admins is None
+        runner.bot.handle_chat_member(FakeChatMemberUpdated(GROUP, USER, "member", "administrator"))
+
     def test_safe_exec(self):
         runner = defaultRunner()
 
@@ -161,11 +382,18 @@ class TestBotRunner:
             "start": FakeMessage(USER, "channel"),
             "help": FakeMessage(USER, "channel"),
             "karte": DEFAULT_MESSAGE,
+            "rezepte": DEFAULT_MESSAGE,
             "termine": DEFAULT_MESSAGE,
+            "statistik": DEFAULT_MESSAGE,
+            "sprache": FakeMessage(USER, "private", text="sprache en"),
             "newalfredo": FakeMessage(ADMIN1, text=f"newalfredo {TOMORROW.isoformat()}"),
             "reminder": FakeMessage(ADMIN1, text="reminder"),
             "announce": FakeMessage(ADMIN1, text="announce Test Test Test"),
-            "cancel": FakeMessage(ADMIN1, text=f"cancel {TOMORROW.isoformat()}")
+            "cancel": FakeMessage(ADMIN1, text=f"cancel {TOMORROW.isoformat()}"),
+            "rebuildstats": FakeMessage(ADMIN1, text="rebuildstats"),
+            "rebuild": FakeMessage(ADMIN1, text="rebuild"),
+            "orders": FakeMessage(ADMIN1, text="orders"),
+            "audit": FakeMessage(ADMIN1, text="audit")
         }
 
         assert len(cmds) == len(runner.default_commands) + len(runner.admin_commands)
@@ -237,15 +465,168 @@ class TestBotRunner:
             for cmd in runner.default_commands:
                 assert f"/{cmd.command}" in msg
 
+            # the usage is shown once, between the command and its description
+            assert "/karte [pdf]: Zeigt die Alfredokarte" in msg
+            assert "/termine: Zeigt" in msg
+
         for msg in no_admin_output:
             assert "Adminkommandos" not in msg
 
         for msg in admin_output:
             assert "Adminkommandos" in msg
 
+    def test_cmd_language(self, tmp_path):
+        COMMAND = "sprache"
+        runner = BotRunner(TESTCFG, FakeBot, tmp_path / "alfredo.sqlite", tmp_path)
+
+        # commands are registered for every language
+        assert sorted(runner.bot.localized_commands.keys()) == ["de", "en"]
+        assert runner.bot.commands[0].description == runner.default_commands[0].description
+        assert runner.bot.localized_commands["en"][0].description == "Shows the upcoming Alfredo dates"
+
+        runner.bot.handle_command(COMMAND, FakeMessage(USER, "private"))
+        assert "Sprache dieses Chats: Deutsch" in runner.bot.last_reply_text
+
+        # users choose the language of private chats
+        msg = FakeMessage(USER, "private", text="sprache en")
+        msg.chat.id = USER.id
+        runner.bot.handle_command(COMMAND, msg)
+        assert "English" in runner.bot.last_reply_text
+
+        msg.text = "/help"
+        runner.bot.handle_command("help", msg)
+        assert "Available commands" in runner.bot.last_reply_text
+        assert "Shows the upcoming Alfredo dates" in runner.bot.last_reply_text
+
+        # other chats keep the default
+        runner.bot.handle_command("termine", FakeMessage(USER, "private", text="/termine"))
+        assert "keine weiteren Termine" in runner.bot.last_reply_text
+
+        # in groups, only admins may change it
+        msg = FakeMessage(USER, "group", text="sprache en")
+        msg.chat.id = GROUP
+        runner.bot.handle_command(COMMAND, msg)
+        assert "kein Admin" in runner.bot.last_reply_text
+
+        msg.from_user = ADMIN1
+        runner.bot.handle_command(COMMAND, msg)
+        assert "English" in runner.bot.last_reply_text
+
+        # unknown languages are rejected by the argument parser
+        msg.text = "sprache fr"
+        runner.bot.handle_command(COMMAND, msg)
+        assert "Unknown parameter 'fr', allowed: de, en" in runner.bot.last_reply_text
+
+        # so are the other argument errors, in the language of the chat
+        msg.text = "cancel foo"
+        runner.bot.handle_command("cancel", msg)
+        assert "Could not convert 'foo' to a date" in runner.bot.last_reply_text
+
+        # the choice survives a restart, posts in the group use the group's language
+        runner = BotRunner(TESTCFG, FakeBot, tmp_path / "alfredo.sqlite", tmp_path)
+        runner.bot.handle_command("newalfredo", FakeMessage(ADMIN1, text="newalfredo 2199-01-01"))
+        assert runner.bot.last_poll_text == "Alfredo on Tuesday, 1 January 2199 (6 pm)"
+        assert "Umfrage erstellt" in runner.bot.last_reply_text
+
+        msg = FakeMessage(USER, "private", text="/start")
+        msg.chat.id = USER.id
+        runner.bot.handle_command("start", msg)
+        assert "best pizza in the world" in runner.bot.last_reply_text
+
+    def test_language_config(self, tmp_path):
+        tmp_cfg = tmp_path / "tmp.json"
+
+        with open(TESTCFG) as c:
+            cfg = json.load(c)
+
+        cfg["language"] = "en"
+        with open(tmp_cfg, "w") as out:
+            json.dump(cfg, out)
+
+        runner = BotRunner(tmp_cfg, FakeBot, ":memory:", None)
+        runner.bot.handle_command("termine", DEFAULT_MESSAGE)
+        assert "No further dates" in runner.bot.last_reply_text
+        assert runner.bot.commands[0].description == "Shows the upcoming Alfredo dates"
+
+        del cfg["language"]
+        with open(tmp_cfg, "w") as out:
+            json.dump(cfg, out)
+
+        assert runner.reload_config()
+        runner.bot.handle_command("termine", DEFAULT_MESSAGE)
+        assert "keine weiteren Termine" in runner.bot.last_reply_text
+        assert runner.bot.commands[0].description == runner.default_commands[0].description
+
+    def test_orders(self, tmp_path):
+        runner = BotRunner(TESTCFG, FakeBot, tmp_path / "alfredo.sqlite", tmp_path)
+        runner.config = Config({**runner.config, "orders": True})
+        day = TOMORROW.isoformat()
+
+        runner.bot.handle_command("newalfredo", FakeMessage(ADMIN1, text=f"newalfredo {day}"))
+        assert "Bestellung gepostet" in runner.bot.last_reply_text
+        assert runner.bot.last_message_chat_id == GROUP
+
+        # one button per pizza, the last one clears the order
+        buttons = [b for row in runner.bot.last_message_kwargs["reply_markup"].keyboard for b in row]
+        assert (buttons[0].text, buttons[0].callback_data) == ("El Classico", f"order:{day}:El Classico")
+        assert buttons[-1].callback_data == f"order:{day}:"
+        assert "Margherita" not in [b.text for b in buttons]
+
+        def tap(user, data):
+            runner.bot.handle_callback_query(FakeCallbackQuery("query", user, data, GROUP))
+            assert runner.bot.last_callback_query_id == "query"
+            return runner.bot.last_callback_text
+
+        assert tap(USER, buttons[0].callback_data) == "Deine Bestellung: 1× El Classico"
+        assert tap(USER, buttons[0].callback_data) == "Deine Bestellung: 2× El Classico"
+        assert tap(USER, buttons[1].callback_data) == f"Deine Bestellung: 2× El Classico, 1× {buttons[1].text}"
+        assert tap(ADMIN2, buttons[0].callback_data) == "Deine Bestellung: 1× El Classico"
+        assert "gelöscht" in tap(ADMIN2, buttons[-1].callback_data)
+        assert tap(ADMIN2, buttons[0].callback_data) == "Deine Bestellung: 1× El Classico"
+
+        assert "nicht mehr auf der Karte" in tap(USER, f"order:{day}:Hawaii")
+        assert "nicht mehr bestellt" in tap(USER, f"order:{OVERMORROW.isoformat()}:El Classico")
+        assert "nicht mehr bestellt" in tap(USER, "order:tomorrow:El Classico")
+        assert tap(USER, "unknown:data") is None
+
+        # taps are only kept in memory, the summary writes them
+        assert runner.db.get_orders(TOMORROW) == []
+
+        runner.bot.handle_command("orders", FakeMessage(ADMIN1, text="orders"))
+        assert "(2 Personen)" in runner.bot.last_reply_text
+        assert "3× El Classico" in runner.bot.last_reply_text
+        assert "Gesamt: 4" in runner.bot.last_reply_text
+        assert len(runner.db.get_orders(TOMORROW)) == 3
+
+        runner.bot.handle_command("orders", FakeMessage(ADMIN1, text=f"orders {OVERMORROW.isoformat()}"))
+        assert "kein Alfredo eingetragen" in runner.bot.last_reply_text
+
+        runner.bot.handle_command("orders", FakeMessage(USER, text="orders"))
+        assert "kein Admin" in runner.bot.last_reply_text
+
+        # cancelled dates take their orders with them
+        runner.bot.handle_command("cancel", FakeMessage(ADMIN1, text=f"cancel {day}"))
+        assert runner.db.get_orders(TOMORROW) == []
+        assert runner.orders.summary(TOMORROW) == ({}, 0)
+
+        runner.bot.handle_command("newalfredo", FakeMessage(ADMIN1, text=f"newalfredo {day}"))
+        runner.bot.handle_command("orders", FakeMessage(ADMIN1, text="orders"))
+        assert "noch nichts bestellt" in runner.bot.last_reply_text
+
+        # without a menu there is nothing to order
+        runner.menu.menu_file = "does-not-exist.tex"
+        runner.menu.mtime = None
+        runner.menu.menu = None
+        runner.bot.last_message_kwargs = None
+        runner.bot.handle_command("newalfredo", FakeMessage(ADMIN1, text=f"newalfredo {OVERMORROW.isoformat()}"))
+        assert "Keine Bestellung gepostet" in runner.bot.last_reply_text
+        assert runner.bot.last_message_kwargs is None
+
     def test_cmd_menu(self):
         COMMAND = "karte"
         runner = defaultRunner()
+        # the menu changes between identical commands
+        runner.coalescer = None
 
         # goodcase
         runner.bot.handle_command(COMMAND, DEFAULT_MESSAGE)
@@ -253,6 +634,105 @@ class TestBotRunner:
 
         assert "github" in msg
         assert "menu.pdf" in msg
+        assert "<b>Pizza</b>" in msg
+
+        # no menu file, link only
+        runner.menu.menu_file = "does-not-exist.tex"
+        runner.menu.mtime = None
+        runner.menu.menu = None
+        runner.bot.handle_command(COMMAND, DEFAULT_MESSAGE)
+        msg = runner.bot.last_reply_text
+
+        assert "menu.pdf" in msg
+        assert "Pizza" not in msg
+
+    def test_cmd_menu_pdf(self, tmp_path):
+        runner = defaultRunner(tmp_path)
+        runner.builder.command = FAKE_LATEXMK
+        # the pdfs change between identical commands
+        runner.coalescer = None
+        msg = FakeMessage(USER, text="karte pdf", message_id=5)
+        msg.chat.id = GROUP
+
+        # nothing built yet, link to the release
+        runner.bot.handle_command("karte", msg)
+        assert "menu.pdf" in runner.bot.last_reply_text
+        assert "Pizza" not in runner.bot.last_reply_text
+
+        pdf, _ = runner.builder.build("menu")
+
+        # first upload
+        runner.bot.handle_command("karte", msg)
+        assert runner.bot.last_document.name == pdf
+        assert runner.bot.last_document_kwargs["chat_id"] == GROUP
+        assert runner.bot.last_document_kwargs["reply_to_message_id"] == 5
+        assert runner.bot.last_document_kwargs["visible_file_name"] == "menu.pdf"
+        assert runner.builder.get_file_id(pdf) == "file1"
+
+        # afterwards by file_id
+        runner.bot.handle_command("karte", msg)
+        assert runner.bot.last_document == "file1"
+
+        # no file_id is stored for failed uploads
+        msg = FakeMessage(USER, text="rezepte", message_id=6)
+        runner.builder.build("recipes")
+        runner.bot.raise_on_next_action()
+        runner.bot.handle_command("rezepte", msg)
+        assert runner.builder.get_file_id(runner.builder.cached_pdf("recipes")) is None
+
+        runner.bot.handle_command("rezepte", msg)
+        assert runner.bot.last_document_kwargs["visible_file_name"] == "recipes.pdf"
+
+    def test_acmd_rebuild(self, tmp_path):
+        COMMAND = "rebuild"
+        runner = defaultRunner(tmp_path)
+        runner.builder.command = FAKE_LATEXMK
+
+        done = threading.Event()
+        reports = []
+
+        # the report is sent from the build thread, capture it so the reply to the command can't interfere
+        def report(message, results):
+            reports.append(results)
+            done.set()
+
+        report_build = runner.report_build
+        runner.report_build = report
+
+        # error 1: no admin
+        runner.bot.handle_command(COMMAND, FakeMessage(USER, text=COMMAND))
+        assert "kein Admin" in runner.bot.last_reply_text
+
+        # error 2: build already running
+        runner.builder.building = True
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=COMMAND))
+        assert "läuft bereits" in runner.bot.last_reply_text
+        runner.builder.building = False
+
+        # goodcase
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=COMMAND))
+        assert "Build gestartet" in runner.bot.last_reply_text
+        assert done.wait(10)
+        report_build(FakeMessage(ADMIN1), reports[-1])
+        assert "menu: neu gebaut" in runner.bot.last_reply_text
+        assert "recipes: neu gebaut" in runner.bot.last_reply_text
+
+        # cached
+        done.clear()
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=COMMAND))
+        assert done.wait(10)
+        report_build(FakeMessage(ADMIN1), reports[-1])
+        assert "menu: unverändert" in runner.bot.last_reply_text
+
+        # build failure
+        report_build(FakeMessage(ADMIN1), {"menu": Exception("kaputt")})
+        assert "menu: fehlgeschlagen (kaputt)" in runner.bot.last_reply_text
+        assert util.emoji("cross") in runner.bot.last_reply_text
+
+        # no tmpdir
+        runner = defaultRunner()
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=COMMAND))
+        assert "Kein Verzeichnis" in runner.bot.last_reply_text
 
     def test_cmd_show_dates(self):
         COMMAND = "termine"
@@ -282,6 +762,152 @@ class TestBotRunner:
         assert "nächsten 3 Termine" in msg
         assert msg.count(util.emoji('bullet')) == 3
 
+    def test_dates_pages(self):
+        runner = defaultRunner()
+        runner.config = Config({**runner.config, "dates_page_size": 2})
+        runner.init_pages()
+
+        for offset in range(1, 6):
+            runner.db.create_alfredo_date(TODAY + timedelta(days=offset))
+
+        runner.bot.handle_command("termine", DEFAULT_MESSAGE)
+        assert "(1–2 von 5)" in runner.bot.last_reply_text
+        assert util.format_date(TODAY + timedelta(days=2)) in runner.bot.last_reply_text
+        assert util.format_date(TODAY + timedelta(days=3)) not in runner.bot.last_reply_text
+
+        def buttons(keyboard):
+            return [(b.text, b.callback_data) for row in keyboard.keyboard for b in row]
+
+        keyboard = runner.bot.last_reply_kwargs["reply_markup"]
+        assert buttons(keyboard) == [("weiter »", f"dates:after:{(TODAY + timedelta(days=2)).isoformat()}")]
+
+        # the reply is edited in place
+        runner.bot.messages[1] = runner.bot.last_reply_text
+
+        def tap(data):
+            message = FakeMessage(USER, text=runner.bot.messages[1], message_id=1)
+            runner.bot.handle_callback_query(FakeCallbackQuery("query", USER, data, GROUP, message))
+            assert runner.bot.last_callback_query_id == "query"
+            return buttons(runner.bot.last_edit_kwargs["reply_markup"])
+
+        assert [text for text, _ in tap(keyboard.keyboard[0][0].callback_data)] == ["« zurück", "weiter »"]
+        assert "(3–4 von 5)" in runner.bot.messages[1]
+
+        assert tap(f"dates:after:{(TODAY + timedelta(days=4)).isoformat()}") == [
+            ("« zurück", f"dates:before:{(TODAY + timedelta(days=5)).isoformat()}")
+        ]
+        assert "(5–5 von 5)" in runner.bot.messages[1]
+
+        tap(f"dates:before:{(TODAY + timedelta(days=5)).isoformat()}")
+        assert "(3–4 von 5)" in runner.bot.messages[1]
+
+        # invalid data shows the first page, unchanged pages are not edited
+        tap("dates:before:soon")
+        assert "(1–2 von 5)" in runner.bot.messages[1]
+
+        runner.bot.last_edit_kwargs = None
+        message = FakeMessage(USER, text=runner.bot.messages[1], message_id=1)
+        runner.bot.handle_callback_query(FakeCallbackQuery("query", USER, "dates:", GROUP, message))
+        assert runner.bot.last_edit_kwargs is None
+
+        # pages are rendered once per version of the dates
+        assert len(runner.pages.entries) == 4
+        runner.bot.handle_command("cancel", FakeMessage(ADMIN1, text=f"cancel {TOMORROW.isoformat()}"))
+        runner.bot.handle_command("termine", DEFAULT_MESSAGE)
+        assert "(1–2 von 4)" in runner.bot.last_reply_text
+        assert len(runner.pages.entries) == 1
+
+    def test_cmd_statistics(self):
+        COMMAND = "statistik"
+        runner = defaultRunner()
+
+        runner.bot.handle_command(COMMAND, DEFAULT_MESSAGE)
+        assert "noch kein Alfredo" in runner.bot.last_reply_text
+
+        # future dates are not counted
+        runner.db.create_alfredo_date(TOMORROW, None, 1)
+        runner.bot.handle_command(COMMAND, DEFAULT_MESSAGE)
+        assert "noch kein Alfredo" in runner.bot.last_reply_text
+
+        runner.db.create_alfredo_date(date.fromisoformat("2022-01-05"), None, 2, "p2")
+        runner.db.create_alfredo_date(date.fromisoformat("2022-01-19"), None, 3, "p3")
+        runner.db.create_alfredo_date(date.fromisoformat("2023-03-01"), None, 4, "p4")
+        runner.db.set_attendance("p2", ADMIN1.id, 0)
+        runner.db.set_attendance("p2", ADMIN2.id, 1)
+        runner.db.set_attendance("p3", USER.id, 0)
+        runner.run_maintenance()
+
+        runner.bot.handle_command(COMMAND, DEFAULT_MESSAGE)
+        msg = runner.bot.last_reply_text
+        assert "2022: 2 Alfredos, 4 Teilnehmer (Ø 2.0), 0 abgesagt" in msg
+        assert "2023: 1 Alfredo, 0 Teilnehmer" in msg
+        assert "Januar 2022: 2 Alfredos" in msg
+        assert "März 2023: 1 Alfredo" in msg
+
+    def test_acmd_rebuild_statistics(self):
+        COMMAND = "rebuildstats"
+        runner = defaultRunner()
+
+        # error 1: no admin
+        runner.bot.handle_command(COMMAND, FakeMessage(USER, text=COMMAND))
+        assert "kein Admin" in runner.bot.last_reply_text
+
+        runner.db.create_alfredo_date(date.fromisoformat("2022-01-05"), None, 1)
+        runner.run_maintenance()
+        before = runner.db.get_statistics()
+
+        # goodcase
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=COMMAND))
+        assert "Statistik neu berechnet" in runner.bot.last_reply_text
+        assert runner.db.get_statistics() == before
+
+    def test_handle_poll_answer(self, tmp_path):
+        runner = defaultRunner(tmp_path)
+
+        runner.bot.handle_command("newalfredo", FakeMessage(ADMIN1, text="newalfredo 2199-01-01"))
+        poll_id = runner.db.get_future_dates()[0].poll_id
+        assert poll_id is not None
+
+        runner.bot.handle_poll_answer(FakePollAnswer(poll_id, USER, [0]))
+        assert runner.db.get_attendees(poll_id) == 1
+
+        runner.bot.handle_poll_answer(FakePollAnswer(poll_id, ADMIN1, [1]))
+        assert runner.db.get_attendees(poll_id) == 3
+
+        # changed vote
+        runner.bot.handle_poll_answer(FakePollAnswer(poll_id, USER, [1]))
+        assert runner.db.get_attendees(poll_id) == 4
+
+        # retracted vote
+        runner.bot.handle_poll_answer(FakePollAnswer(poll_id, ADMIN1, []))
+        assert runner.db.get_attendees(poll_id) == 2
+
+        # unknown polls are ignored
+        runner.bot.handle_poll_answer(FakePollAnswer("unknown", USER, [0]))
+        assert runner.db.get_attendees("unknown") == 0
+
+    def test_handle_inline_query(self):
+        runner = defaultRunner()
+
+        runner.db.create_alfredo_date(TOMORROW, None, 1)
+
+        runner.bot.handle_inline_query(FakeInlineQuery("q1", USER, "termine"))
+        assert runner.bot.last_inline_query_id == "q1"
+        assert len(runner.bot.last_inline_results) == 2
+        assert "einzige" in runner.bot.last_inline_results[0].input_message_content.message_text
+        assert runner.bot.last_inline_kwargs["cache_time"] == 120
+        assert runner.bot.last_inline_kwargs["is_personal"] is False
+
+        runner.config = Config({**runner.config, "inline_cache_time": 5})
+        runner.bot.handle_inline_query(FakeInlineQuery("q2", USER, "karte"))
+        assert runner.bot.last_inline_results[0].id == "karte"
+        assert runner.bot.last_inline_kwargs["cache_time"] == 5
+
+        # no crash on telegram errors
+        runner.bot.raise_on_next_action()
+        runner.bot.handle_inline_query(FakeInlineQuery("q3", USER, ""))
+        assert runner.bot.last_inline_query_id == "q2"
+
     def test_acmd_new_alfredo(self, tmp_path):
         COMMAND = "newalfredo"
         runner = defaultRunner(tmp_path)
@@ -307,6 +933,10 @@ class TestBotRunner:
         assert "konnte nicht in ein Datum" in runner.bot.last_reply_text
         assert_num_dates(runner.db, 0)
 
+        # error 3.1: non-admins get no hints about the parameters
+        runner.bot.handle_command(COMMAND, FakeMessage(USER, text=f"{COMMAND} not-a-date"))
+        assert "kein Admin" in runner.bot.last_reply_text
+
         # error 4: before today
         runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=f"{COMMAND} 2022-01-01"))
         assert "frühstens heute" in runner.bot.last_reply_text
@@ -320,8 +950,8 @@ class TestBotRunner:
         assert "Telegram API" in runner.bot.last_reply_text
         assert_num_dates(runner.db, 0)
 
-        # goodcase
-        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=f"{COMMAND} 2199-01-01"))
+        # goodcase (double spaces and bot name are fine)
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=f"/{COMMAND}@alfredobot  2199-01-01 "))
         assert "Umfrage erstellt" in runner.bot.last_reply_text
         assert ".ics File gesendet" in runner.bot.last_reply_text
         assert runner.bot.last_reply_text.count(util.emoji("check")) == 2
@@ -453,6 +1083,48 @@ class TestBotRunner:
         # automatically unpinned
         assert len(runner.bot.pinned_message_ids) == 0
 
+    def test_acmd_cancel_range(self, tmp_path):
+        COMMAND = "cancel"
+        runner = defaultRunner(tmp_path)
+
+        for day in ["2199-01-01", "2199-01-05", "2199-01-10", "2199-02-01"]:
+            runner.bot.handle_command("newalfredo", FakeMessage(ADMIN1, text=f"newalfredo {day}"))
+        assert_num_dates(runner.db, 4)
+
+        # error 1: invalid range
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=f"{COMMAND} 2199-01-10..2199-01-01"))
+        assert "vor dessen Anfang" in runner.bot.last_reply_text
+
+        # error 2: range starts in the past
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=f"{COMMAND} {TODAY.isoformat()}..2199-01-10"))
+        assert "in der Zukunft" in runner.bot.last_reply_text
+
+        # error 3: no dates in range
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=f"{COMMAND} 2199-01-11..2199-01-31"))
+        assert "Zwischen" in runner.bot.last_reply_text
+        assert_num_dates(runner.db, 4)
+
+        # goodcase, range boundaries are included
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=f"{COMMAND} 2199-01-01..2199-01-10"))
+        msg = runner.bot.last_reply_text
+        assert msg.count(util.emoji('check')) == 9
+        assert msg.count(util.emoji('cross')) == 0
+        for day in ["2199-01-01", "2199-01-05", "2199-01-10"]:
+            assert util.format_date(date.fromisoformat(day)) in msg
+
+        assert runner.bot.polls == {1: False, 2: False, 3: False, 4: True}
+        assert_num_dates(runner.db, 1)
+        # the remaining date is pinned
+        assert runner.bot.pinned_message_ids == [4]
+
+        # a single worker works as well
+        runner.config = Config({**runner.config, "api_workers": 1})
+        runner.bot.handle_command("newalfredo", FakeMessage(ADMIN1, text="newalfredo 2199-02-02"))
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=f"{COMMAND} 2199-02-01..2199-02-02"))
+        assert runner.bot.last_reply_text.count(util.emoji('check')) == 6
+        assert_num_dates(runner.db, 0)
+        assert len(runner.bot.pinned_message_ids) == 0
+
     def test_acmd_announce(self):
         COMMAND = "announce"
         runner = defaultRunner()
@@ -480,6 +1152,51 @@ class TestBotRunner:
         assert runner.bot.last_message_text.endswith("Test Test Test")
         assert COMMAND not in runner.bot.last_message_text
 
+        # whitespace in the announcement is kept
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=f"{COMMAND}  Zeile  1\nZeile 2"))
+        assert runner.bot.last_message_text.endswith("Zeile  1\nZeile 2")
+
+    def test_acmd_audit(self, tmp_path):
+        COMMAND = "audit"
+        runner = defaultRunner(tmp_path)
+
+        # error 1: no admin
+        runner.bot.handle_command(COMMAND, FakeMessage(USER, text=COMMAND))
+        assert "kein Admin" in runner.bot.last_reply_text
+
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=COMMAND))
+        assert "noch nichts protokolliert" in runner.bot.last_reply_text
+
+        runner.bot.handle_command("newalfredo", FakeMessage(ADMIN1, text="newalfredo 2199-01-01"))
+        runner.bot.handle_command("newalfredo", FakeMessage(ADMIN2, text="newalfredo 2199-01-02"))
+        runner.bot.handle_command("announce", FakeMessage(ADMIN1, text="announce Test"))
+        runner.bot.handle_command("cancel", FakeMessage(ADMIN2, text="cancel 2199-01-01"))
+
+        # reminders on SIGUSR1 have no admin
+        runner.db.create_alfredo_date(TOMORROW, None, 1)
+        assert runner.reminder_internal()
+
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=COMMAND))
+        lines = runner.bot.last_reply_text.splitlines()[2:]
+        assert len(lines) == 5
+        assert lines[0].endswith(f"system: /reminder {TOMORROW.isoformat()}")
+        assert lines[1].endswith(f"{util.format_user(ADMIN2)}: /cancel 2199-01-01")
+        assert lines[2].endswith(f"{util.format_user(ADMIN1)}: /announce")
+        assert lines[4].endswith(f"{util.format_user(ADMIN1)}: /newalfredo 2199-01-01")
+        assert runner.db.get_audit(1)[0].details is None
+        assert runner.db.get_audit(3)[2].details == {"text": "Test"}
+
+        # the dates announced at the end of a day
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=f"{COMMAND} {TODAY.isoformat()}"))
+        assert util.format_date(date(2199, 1, 2)) in runner.bot.last_reply_text
+        assert util.format_date(date(2199, 1, 1)) not in runner.bot.last_reply_text
+
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=f"{COMMAND} {YESTERDAY.isoformat()}"))
+        assert "wurde nichts protokolliert" in runner.bot.last_reply_text
+
+        runner.bot.handle_command(COMMAND, FakeMessage(ADMIN1, text=f"{COMMAND} 2200-01-01"))
+        assert "kein Termin angekündigt" in runner.bot.last_reply_text
+
     def test_signal_handler(self, caplog, tmp_path):
         runner = defaultRunner(tmp_path)
 
@@ -506,6 +1223,27 @@ class TestBotRunner:
             assert "Sent reminder" in caplog.text
             assert runner.bot.pinned_message_ids[0] == 1
 
+    def test_run_maintenance(self, caplog):
+        runner = defaultRunner()
+
+        runner.db.create_alfredo_date(YESTERDAY, None, 1)
+        runner.db.create_alfredo_date(TOMORROW, None, 2)
+
+        with caplog.at_level(logging.DEBUG):
+            signal.raise_signal(signal.SIGUSR1)
+            assert "archived 1" in caplog.text
+            assert "compacted" in caplog.text
+
+        assert_num_dates(runner.db, 1)
+        assert_row_count(runner.db, AlfredoDateArchive, 1)
+
+        caplog.clear()
+
+        # no compaction without archived dates
+        with caplog.at_level(logging.DEBUG):
+            runner.run_maintenance()
+            assert "compacted" not in caplog.text
+
     def test_do_pinning(self, caplog):
         runner = defaultRunner()
 
@@ -566,8 +1304,272 @@ class TestBotRunner:
             assert "could not get chat info" not in caplog.text
             assert runner.bot.pinned_message_ids[0] == 25
 
+    def test_board(self, caplog, tmp_path):
+        runner = BotRunner(TESTCFG, FakeBot, tmp_path / "alfredo.sqlite", tmp_path)
+        assert runner.update_board() is False
+        assert runner.bot.messages == {}
+
+        runner.config = Config({**runner.config, "board": True})
+
+        # posted and pinned once
+        runner.do_pinning()
+        assert runner.bot.pinned_message_ids == [1000]
+        assert "keine weiteren Termine" in runner.bot.messages[1000]
+        assert runner.update_board() is False
+
+        # edited when the dates or the attendance change
+        runner.bot.handle_command("newalfredo", FakeMessage(ADMIN1, text="newalfredo 2199-01-01"))
+        assert "0 Teilnehmer" in runner.bot.messages[1000]
+
+        poll_id = runner.db.get_future_dates()[0].poll_id
+        runner.bot.handle_poll_answer(FakePollAnswer(poll_id, USER, [1]))
+        assert util.format_date(date(2199, 1, 1)) in runner.bot.messages[1000]
+        assert "2 Teilnehmer" in runner.bot.messages[1000]
+        # the date is shown once, not again as part of the poll question
+        assert runner.bot.messages[1000].count(util.format_date(date(2199, 1, 1))) == 1
+        assert runner.bot.pinned_message_ids == [1000]
+        assert len(runner.bot.messages) == 1
+
+        # the state survives a restart
+        runner = BotRunner(TESTCFG, FakeBot, tmp_path / "alfredo.sqlite", tmp_path)
+        runner.config = Config({**runner.config, "board": True})
+        runner.bot.messages = {1000: "old"}
+        assert runner.update_board() is False
+
+        # errors are retried on the next update
+        runner.db.create_alfredo_date(date(2199, 1, 2))
+        runner.bot.raise_on_next_action()
+        assert runner.update_board() is False
+        assert runner.update_board()
+        assert util.format_date(date(2199, 1, 2)) in runner.bot.messages[1000]
+
+        # a deleted board is posted again
+        runner.bot.messages = {}
+        runner.db.create_alfredo_date(date(2199, 1, 3))
+        with caplog.at_level(logging.INFO):
+            assert runner.update_board()
+            assert "board message was deleted" in caplog.text
+
+        assert runner.bot.pinned_message_ids == [1000]
+        assert runner.db.get_state("board_message_id") == "1000"
+
+    def test_shutdown(self, caplog, tmp_path):
+        runner = defaultRunner(tmp_path)
+        runner.bot.last_update_id = 41
+
+        with caplog.at_level(logging.INFO):
+            signal.raise_signal(signal.SIGTERM)
+            assert "shutting down" in caplog.text
+            assert runner.bot.is_polling is False
+
+            # second signal is ignored
+            signal.raise_signal(signal.SIGTERM)
+            assert "already shutting down" in caplog.text
+
+            runner.run()
+            assert "before polling started" in caplog.text
+            assert "shutdown complete" in caplog.text
+            assert "draining took" in caplog.text
+            assert "closed database" in caplog.text
+
+        # processed updates are confirmed, polling never started
+        assert runner.bot.last_get_updates_offset == 42
+        assert runner.bot.is_stopped
+        assert not hasattr(runner.bot, "polling_kwargs")
+
+    def test_shutdown_drain(self, caplog, tmp_path):
+        # in-memory databases are per thread
+        runner = BotRunner(TESTCFG, FakeBot, tmp_path / "alfredo.sqlite", tmp_path)
+        runner.config = Config({**runner.config, "shutdown_timeout": 0.2})
+
+        # a handler that is still running when the deadline is reached
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_reply(**kwargs):
+            started.set()
+            release.wait(10)
+
+        runner.bot.reply_to = slow_reply
+        handler = threading.Thread(target=runner.bot.handle_command, args=("termine", DEFAULT_MESSAGE))
+        handler.start()
+        assert started.wait(10)
+
+        runner.shutdown.request()
+        with caplog.at_level(logging.INFO):
+            assert runner.finish_shutdown() is False
+            assert "shutdown incomplete" in caplog.text
+
+        assert runner.bot.is_stopped is False
+        release.set()
+        handler.join()
+        assert runner.shutdown.in_flight == 0
+
+        # tracked builds
+        runner.shutdown.begin()
+        runner.shutdown.end()
+        assert runner.shutdown.drain(0)
+
+    def test_throttle(self):
+        runner = defaultRunner()
+        runner.config = Config({**runner.config, "throttle_user": [2, 60], "throttle_chat": [3, 60]})
+        runner.init_throttle()
+
+        for _ in range(2):
+            runner.bot.last_reply_text = None
+            runner.dispatch(FakeMessage(USER, text="/help"))
+            assert "Verfügbare Kommandos" in runner.bot.last_reply_text
+
+        # warned once, then ignored
+        runner.dispatch(FakeMessage(USER, text="/help"))
+        assert "Nicht so schnell" in runner.bot.last_reply_text
+        runner.bot.last_reply_text = None
+        runner.dispatch(FakeMessage(USER, text="/help"))
+        assert runner.bot.last_reply_text is None
+
+        # the chat still has one command left
+        other = FakeUser(1338, "Donald", "duck")
+        runner.dispatch(FakeMessage(other, text="/help"))
+        assert "Verfügbare Kommandos" in runner.bot.last_reply_text
+        runner.dispatch(FakeMessage(other, text="/help"))
+        assert "Nicht so schnell" in runner.bot.last_reply_text
+
+        # admins are exempt
+        for _ in range(5):
+            runner.bot.last_reply_text = None
+            runner.dispatch(FakeMessage(ADMIN1, text="/help"))
+            assert "Verfügbare Kommandos" in runner.bot.last_reply_text
+
+        # without warning
+        runner.config = Config({**runner.config, "throttle_warn": False})
+        runner.bot.last_reply_text = None
+        runner.dispatch(FakeMessage(FakeUser(1339, "Daisy", "duck"), text="/help"))
+        assert runner.bot.last_reply_text is None
+
+        # disabled
+        runner.config = Config({**runner.config, "throttle_user": None, "throttle_chat": None})
+        runner.init_throttle()
+        runner.dispatch(FakeMessage(USER, text="/help"))
+        assert "Verfügbare Kommandos" in runner.bot.last_reply_text
+
+    def test_coalesce(self):
+        runner = defaultRunner()
+
+        runner.bot.handle_command("termine", FakeMessage(USER, text="/termine", message_id=1))
+        assert runner.bot.last_reply_text is not None
+
+        runner.bot.last_reply_text = None
+        runner.bot.handle_command("termine", FakeMessage(USER, text="/termine", message_id=2))
+        assert runner.bot.last_reply_text is None
+
+        # other arguments, commands, chats and data are answered
+        runner.bot.handle_command("karte", FakeMessage(USER, text="/karte pdf"))
+        assert runner.bot.last_reply_text is not None
+
+        runner.bot.last_reply_text = None
+        runner.bot.handle_command("statistik", FakeMessage(USER, text="/statistik"))
+        assert runner.bot.last_reply_text is not None
+
+        runner.bot.last_reply_text = None
+        msg = FakeMessage(USER, text="/termine")
+        msg.chat.id = GROUP
+        runner.bot.handle_command("termine", msg)
+        assert runner.bot.last_reply_text is not None
+
+        runner.bot.last_reply_text = None
+        runner.db.create_alfredo_date(TOMORROW)
+        runner.bot.handle_command("termine", FakeMessage(USER, text="/termine"))
+        assert util.format_date(TOMORROW) in runner.bot.last_reply_text
+
+        # help depends on the user
+        for _ in range(2):
+            runner.bot.last_reply_text = None
+            runner.bot.handle_command("help", DEFAULT_MESSAGE)
+            assert runner.bot.last_reply_text is not None
+
+    def test_coalesce_latest(self, tmp_path):
+        # the reply is sent from a timer thread
+        runner = BotRunner(TESTCFG, FakeBot, tmp_path / "alfredo.sqlite", tmp_path)
+        runner.config = Config({**runner.config, "coalesce_window": 0.1, "coalesce_reply": "latest"})
+        runner.init_coalescer()
+
+        replies = []
+        runner.bot.reply_to = lambda message, **kwargs: replies.append(message.message_id)
+
+        for message_id in range(3):
+            runner.bot.handle_command("termine", FakeMessage(USER, text="/termine", message_id=message_id))
+
+        assert replies == []
+        assert runner.shutdown.drain(5)
+        assert replies == [2]
+
+    def test_memory_storage(self, tmp_path):
+        runner = BotRunner(TESTCFG, FakeBot, ":memory:", tmp_path, "memory")
+
+        runner.bot.handle_command("newalfredo", FakeMessage(ADMIN1, text=f"/newalfredo {TOMORROW.isoformat()}"))
+        runner.bot.handle_command("termine", DEFAULT_MESSAGE)
+        assert util.format_date(TOMORROW) in runner.bot.last_reply_text
+
+        runner.bot.handle_command("cancel", FakeMessage(ADMIN1, text=f"/cancel {TOMORROW.isoformat()}"))
+        assert runner.db.get_future_dates() == []
+
+    def test_circuit_breaker(self, caplog):
+        runner = defaultRunner()
+        runner.config = Config({**runner.config, "circuit_threshold": 2, "circuit_cooldown": 0.1})
+        runner.init_breakers()
+
+        # an outage of the send family
+        runner.bot.raise_on_next_action(2)
+        runner.safe_exec(runner.bot.reply_to, message=DEFAULT_MESSAGE, text="hallo")
+        runner.safe_exec(runner.bot.send_message, chat_id=GROUP, text="hallo")
+        assert runner.breakers.get("send_message").state == "open"
+
+        # calls fail fast without reaching the bot
+        runner.bot.last_message_text = None
+        assert runner.safe_exec(runner.bot.send_message, chat_id=GROUP, text="hallo") is None
+        assert runner.bot.last_message_text is None
+        with pytest.raises(CircuitOpenError, match="circuit send is open") as ex:
+            runner.safe_exec(runner.bot.send_message, reraise=True, chat_id=GROUP, text="hallo")
+
+        # shown to users in the language of their chat
+        assert runner.error_text(runner.catalogs.get("de"), ex.value) == "Telegram API nicht erreichbar (send)"
+        assert runner.error_text(runner.catalogs.get("en"), ex.value) == "Telegram API unreachable (send)"
+
+        # other families are not affected
+        assert runner.safe_exec(runner.bot.get_chat, chat_id=GROUP) is not None
+        assert runner.health.state()["circuits"]["send"]["rejected"] == 2
+
+        # a successful probe closes the circuit
+        time.sleep(0.1)
+        with caplog.at_level(logging.INFO):
+            runner.safe_exec(runner.bot.send_message, chat_id=GROUP, text="hallo")
+            assert "half-open -> closed" in caplog.text
+        assert runner.bot.last_message_text == "hallo"
+
+    def test_health(self, tmp_path):
+        runner = defaultRunner(tmp_path)
+        assert runner.health_server is None
+
+        runner.bot.get_updates(offset=1)
+        assert runner.health.last_poll is not None
+
+        runner.bot.raise_on_next_action()
+        runner.safe_exec(runner.bot.send_message, chat_id=GROUP, text="hallo")
+
+        state = runner.health.state()
+        assert state["ready"]
+        assert state["last_api_error"]["method"] == "send_message"
+        assert state["db_round_trip_ms"] >= 0
+
+        # the port of the docker entrypoint, used if the config doesn't have one
+        runner = BotRunner(TESTCFG, FakeBot, ":memory:", tmp_path, health_port=0)
+        assert runner.health_server is not None
+        assert runner.health_server.port > 0
+        runner.health_server.server.server_close()
+
     def test_run(self):
         runner = defaultRunner()
         runner.run()
 
         assert runner.bot.is_polling
+        assert "chat_member" in runner.bot.polling_kwargs["allowed_updates"]
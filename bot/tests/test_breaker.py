@@ -0,0 +1,70 @@
+from telebot.apihelper import ApiTelegramException
+
+from breaker import CircuitBreaker, CircuitBreakers, is_outage, CLOSED, OPEN, HALF_OPEN
+from fake import FakeClock
+
+
+def api_exception(code):
+    return ApiTelegramException("sendMessage", None, {"error_code": code, "description": "error"})
+
+
+class TestCircuitBreaker:
+    def test_open(self, caplog):
+        clock = FakeClock()
+        breaker = CircuitBreaker("send", 3, 30, clock)
+
+        for _ in range(2):
+            assert breaker.allow()
+            breaker.failure()
+        assert breaker.state == CLOSED
+
+        # a success resets the count
+        breaker.success()
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.failure()
+
+        assert breaker.state == OPEN
+        assert "closed -> open" in caplog.text
+        assert breaker.allow() is False
+        assert breaker.metrics() == {"state": OPEN, "failures": 3, "opened": 1, "rejected": 1}
+
+    def test_half_open(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("send", 1, 30, clock)
+        assert breaker.allow()
+        breaker.failure()
+
+        clock.now += 29
+        assert breaker.allow() is False
+
+        # a single probe after the cool-down
+        clock.now += 1
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() is False
+
+        # failed probes reopen the circuit
+        breaker.failure()
+        assert breaker.state == OPEN
+        assert breaker.opened == 2
+
+        clock.now += 30
+        assert breaker.allow()
+        breaker.success()
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+    def test_families(self):
+        breakers = CircuitBreakers(5, 30)
+
+        assert breakers.get("reply_to") is breakers.get("send_message")
+        assert breakers.get("get_chat") is not breakers.get("send_message")
+        assert breakers.get("get_updates").name == "get_updates"
+        assert set(breakers.metrics()) == {"send", "chat", "get_updates"}
+
+    def test_is_outage(self):
+        assert is_outage(Exception("Connection reset"))
+        assert is_outage(api_exception(502))
+        assert is_outage(api_exception(429))
+        assert is_outage(api_exception(400)) is False
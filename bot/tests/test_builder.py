@@ -0,0 +1,148 @@
+import json
+import sys
+import threading
+from os import path
+
+import pytest
+
+from builder import PdfBuilder, find_assets
+
+# stands in for latexmk: writes <outdir>/<stem>.pdf containing the source
+FAKE_LATEXMK = [sys.executable, "-c", """
+import sys, pathlib
+outdir = sys.argv[1].split("=", 1)[1]
+tex = pathlib.Path(sys.argv[2])
+pathlib.Path(outdir, tex.stem + ".pdf").write_bytes(b"%PDF " + tex.read_bytes())
+"""]
+
+FAILING_LATEXMK = [sys.executable, "-c", "import sys; print('! LaTeX Error'); sys.exit(12)"]
+
+SOURCE = r"""
+\begin{document}
+\includegraphics[width=0.25\textwidth]{logo.png}
+\includegraphics{missing}
+\end{document}
+"""
+
+
+def make_sources(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "menu.tex").write_text(SOURCE)
+    (src / "logo.png").write_bytes(b"logo")
+
+    return {"menu": str(src / "menu.tex")}
+
+
+def default_builder(tmp_path, command=FAKE_LATEXMK):
+    return PdfBuilder(make_sources(tmp_path), str(tmp_path / "cache"), command)
+
+
+class TestBuilder:
+    def test_find_assets(self, tmp_path):
+        texfile = make_sources(tmp_path)["menu"]
+
+        with open(texfile, "rb") as f:
+            assets = find_assets(texfile, f.read())
+
+        assert assets == [path.join(path.dirname(texfile), "logo.png")]
+
+    def test_content_hash(self, tmp_path):
+        builder = default_builder(tmp_path)
+        src = tmp_path / "src"
+
+        digest = builder.content_hash("menu")
+        assert digest == builder.content_hash("menu")
+
+        # assets are part of the hash
+        (src / "logo.png").write_bytes(b"new logo")
+        assert builder.content_hash("menu") != digest
+
+        digest = builder.content_hash("menu")
+        (src / "menu.tex").write_text(SOURCE + "%")
+        assert builder.content_hash("menu") != digest
+
+    def test_build(self, tmp_path):
+        builder = default_builder(tmp_path)
+
+        assert builder.cached_pdf("menu") is None
+
+        pdf, built = builder.build("menu")
+        assert built
+        assert path.isfile(pdf)
+        assert builder.content_hash("menu") in pdf
+        assert builder.cached_pdf("menu") == pdf
+
+        # same content, no build
+        builder.command = FAILING_LATEXMK
+        assert builder.build("menu") == (pdf, False)
+
+        # no aux files in the source dir
+        assert sorted(p.name for p in (tmp_path / "src").iterdir()) == ["logo.png", "menu.tex"]
+
+    def test_build_failure(self, tmp_path, caplog):
+        builder = default_builder(tmp_path, FAILING_LATEXMK)
+
+        with pytest.raises(Exception) as ex:
+            builder.build("menu")
+
+        assert "exited with code 12" in ex.value.args[0]
+        assert "LaTeX Error" in caplog.text
+        assert builder.cached_pdf("menu") is None
+
+    def test_build_all_async(self, tmp_path):
+        builder = default_builder(tmp_path)
+        builder.documents["broken"] = str(tmp_path / "does-not-exist.tex")
+
+        done = threading.Event()
+        results = {}
+
+        def callback(r):
+            results.update(r)
+            done.set()
+
+        assert builder.build_all_async(callback)
+        assert done.wait(10)
+
+        assert results["menu"][1] is True
+        assert isinstance(results["broken"], Exception)
+        assert builder.building is False
+
+        # only one build at a time
+        builder.building = True
+        assert builder.build_all_async(callback) is False
+
+    def test_file_ids(self, tmp_path):
+        builder = default_builder(tmp_path)
+        pdf, _ = builder.build("menu")
+
+        assert builder.get_file_id(pdf) is None
+
+        builder.set_file_id(pdf, "abc")
+        assert builder.get_file_id(pdf) == "abc"
+
+        with open(tmp_path / "cache" / "file_ids.json") as f:
+            assert json.load(f) == {path.basename(pdf): "abc"}
+
+        # persisted across instances
+        assert PdfBuilder({}, str(tmp_path / "cache")).get_file_id(pdf) == "abc"
+
+    def test_prune(self, tmp_path):
+        builder = default_builder(tmp_path)
+        pdf, _ = builder.build("menu")
+        builder.set_file_id(pdf, "abc")
+
+        # pdfs of other documents are kept
+        other = tmp_path / "cache" / f"recipes-{'0' * 64}.pdf"
+        other.write_bytes(b"%PDF")
+        builder.set_file_id(str(other), "def")
+
+        (tmp_path / "src" / "menu.tex").write_text(SOURCE + "%")
+        new_pdf, built = builder.build("menu")
+        assert built
+
+        assert sorted(p.name for p in (tmp_path / "cache").iterdir()) == \
+            sorted([path.basename(new_pdf), other.name, "file_ids.json"])
+
+        with open(tmp_path / "cache" / "file_ids.json") as f:
+            assert json.load(f) == {other.name: "def"}
@@ -0,0 +1,42 @@
+import threading
+
+from coalesce import Coalescer
+from fake import FakeClock
+from shutdown import ShutdownCoordinator
+
+
+class TestCoalescer:
+    def test_first(self):
+        clock = FakeClock()
+        coalescer = Coalescer(5, clock=clock)
+        handled = []
+
+        assert coalescer.submit("a", 1, handled.append)
+        assert coalescer.submit("a", 2, handled.append) is False
+        assert coalescer.submit("b", 3, handled.append)
+        assert handled == [1, 3]
+
+        # expired entries are removed
+        clock.now += 5
+        assert coalescer.submit("a", 4, handled.append)
+        assert handled == [1, 3, 4]
+        assert list(coalescer.entries) == ["a"]
+
+    def test_latest(self):
+        tracker = ShutdownCoordinator()
+        coalescer = Coalescer(0.1, latest=True, tracker=tracker)
+        handled = []
+        done = threading.Event()
+
+        def handler(message):
+            handled.append(message)
+            done.set()
+
+        for message in range(3):
+            assert coalescer.submit("a", message, handler)
+
+        assert tracker.in_flight == 1
+        assert done.wait(5)
+        assert tracker.drain(5)
+        assert handled == [2]
+        assert coalescer.entries == {}
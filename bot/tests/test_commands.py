@@ -0,0 +1,91 @@
+from datetime import date
+
+import pytest
+
+from commands import Command, CommandRouter, ArgumentError, ChoiceArg, DateArg, DateRangeArg, TextArg
+
+NEW = Command("new", "Neuer Termin", "acmd_new", [DateArg()], admin=True)
+ANNOUNCE = Command("announce", "Ankündigung", "acmd_announce", [TextArg("announcement")], admin=True)
+MENU = Command("karte", "Karte", "cmd_menu", [ChoiceArg(["pdf", "text"])])
+HELP = Command("help", "Hilfe", "cmd_help")
+
+
+def parse_error(command, args):
+    with pytest.raises(ArgumentError) as err:
+        command.parse(args)
+
+    return err.value.key, err.value.fields
+
+
+class TestCommands:
+    def test_date_arg(self):
+        assert NEW.parse("2199-01-01") == [date(2199, 1, 1)]
+        assert NEW.parse("  2199-01-01 ") == [date(2199, 1, 1)]
+
+        assert parse_error(NEW, "not-a-date") == ("arg_date", {"value": "not-a-date"})
+        assert parse_error(NEW, "30-01-01") == ("arg_date", {"value": "30-01-01"})
+        # valid for fromisoformat, but not the documented format
+        assert parse_error(NEW, "21990101") == ("arg_date", {"value": "21990101"})
+        assert parse_error(NEW, "2199-02-30") == ("arg_date_invalid", {"value": "2199-02-30"})
+
+    def test_date_range_arg(self):
+        arg = DateRangeArg()
+
+        assert arg.parse("2199-01-01") == (date(2199, 1, 1), date(2199, 1, 1))
+        assert arg.parse("2199-01-01..2199-02-01") == (date(2199, 1, 1), date(2199, 2, 1))
+
+        with pytest.raises(ArgumentError) as err:
+            arg.parse("2199-02-01..2199-01-01")
+        assert err.value.key == "arg_range"
+
+        for invalid in ["2199-01-01..", "..2199-01-01", "2199-01-01...2199-02-01", "2199-01-01..2199-13-01"]:
+            with pytest.raises(ArgumentError):
+                arg.parse(invalid)
+
+    def test_text_arg(self):
+        assert ANNOUNCE.parse("Test Test") == ["Test Test"]
+        # whitespace inside the text is kept
+        assert ANNOUNCE.parse("Test  Test\nZeile 2") == ["Test  Test\nZeile 2"]
+
+        assert parse_error(ANNOUNCE, None) == ("arg_missing", {})
+        assert parse_error(ANNOUNCE, "") == ("arg_missing", {})
+
+    def test_choice_arg(self):
+        assert MENU.parse(None) == []
+        assert MENU.parse("pdf") == ["pdf"]
+        assert parse_error(MENU, "html") == ("arg_choice", {"value": "html", "choices": "pdf, text"})
+
+    def test_argument_count(self):
+        assert parse_error(NEW, None) == ("arg_count_one", {"count": 0})
+        assert parse_error(NEW, "2199-01-01  2199-01-02") == ("arg_count_one", {"count": 2})
+        assert HELP.parse("x y") == []
+
+        two = Command("two", "", "cmd_two", [DateArg(), DateArg()])
+        assert parse_error(two, "2199-01-01") == ("arg_count", {"expected": 2, "count": 1})
+        assert two.parse("2199-01-01 2199-01-02") == [date(2199, 1, 1), date(2199, 1, 2)]
+
+    def test_bot_command(self):
+        assert NEW.bot_command().description == "<iso-date>: Neuer Termin"
+        assert ANNOUNCE.bot_command().description == "<announcement>: Ankündigung"
+        assert MENU.bot_command().description == "[pdf|text]: Karte"
+        assert HELP.bot_command().description == "Hilfe"
+        assert Command("a", "Admin", "a", admin=True).bot_command().description == ": Admin"
+
+    def test_help_line(self):
+        assert NEW.help_line() == "/new <iso-date>: Neuer Termin"
+        assert MENU.help_line("Menu") == "/karte [pdf|text]: Menu"
+        assert HELP.help_line() == "/help: Hilfe"
+
+    def test_router(self):
+        router = CommandRouter([NEW, ANNOUNCE, MENU, HELP])
+
+        assert router.names() == ["new", "announce", "karte", "help"]
+
+        assert router.resolve("/new 2199-01-01") == (NEW, "2199-01-01")
+        assert router.resolve("new   2199-01-01") == (NEW, "2199-01-01")
+        assert router.resolve("/new@alfredobot 2199-01-01") == (NEW, "2199-01-01")
+        assert router.resolve("/HELP") == (HELP, None)
+        assert router.resolve("/announce Zeile 1\nZeile 2") == (ANNOUNCE, "Zeile 1\nZeile 2")
+
+        assert router.resolve("/unknown") == (None, None)
+        assert router.resolve("") == (None, None)
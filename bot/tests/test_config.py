@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from config import Config, load_config
+
+TESTCFG = "tests/config-test.json"
+
+
+class TestConfig:
+    def test_load_config(self):
+        cfg = load_config(TESTCFG)
+
+        assert cfg["token"] == "abcdefghijklmnopqrstuvwxyz"
+        assert cfg["group"] == "-1337"
+        assert cfg.admins == frozenset([42, 69])
+        assert cfg["admins"] is cfg.admins
+        assert cfg.get("menu_file") is None
+        assert sorted(cfg.keys()) == ["admins", "group", "token"]
+
+    def test_immutable(self):
+        cfg = load_config(TESTCFG)
+
+        with pytest.raises(TypeError):
+            cfg["group"] = "-1"
+
+        with pytest.raises(AttributeError):
+            cfg.admins = frozenset()
+
+        with pytest.raises(AttributeError):
+            cfg._values = {}
+
+        # changes to the source dict don't leak into the config
+        values = {"token": "a", "group": "b", "admins": [1]}
+        cfg = Config(values)
+        values["group"] = "c"
+        values["admins"].append(2)
+        assert cfg["group"] == "b"
+        assert cfg.admins == frozenset([1])
+
+    def test_invalid_admins(self, tmp_path):
+        tmp_cfg = tmp_path / "tmp.json"
+
+        for admins, error in [("42", "at least one admin"), ([""], "not a user id"), ([42, "69"], "not a user id")]:
+            with open(TESTCFG) as c:
+                cfg = json.load(c)
+
+            cfg["admins"] = admins
+
+            with open(tmp_cfg, "w") as out:
+                json.dump(cfg, out)
+
+            with pytest.raises(Exception) as ex:
+                load_config(tmp_cfg)
+
+            assert error in ex.value.args[0]
+
+    def test_invalid_optional(self, tmp_path):
+        tmp_cfg = tmp_path / "tmp.json"
+
+        for key, value, error in [
+            ("throttle_user", "abc", "[burst, seconds] or null"),
+            ("throttle_chat", [3], "[burst, seconds] or null"),
+            ("throttle_chat", [3, -1], "[burst, seconds] or null"),
+            ("coalesce_window", "5", "a number of at least 0"),
+            ("api_read_timeout", True, "a number of at least 0"),
+            ("dates_page_size", 0, "an integer of at least 1"),
+            ("health_port", 8080.5, "an integer of at least 1"),
+            ("coalesce_reply", "last", "one of first, latest")
+        ]:
+            with open(TESTCFG) as c:
+                cfg = json.load(c)
+
+            cfg[key] = value
+            with open(tmp_cfg, "w") as out:
+                json.dump(cfg, out)
+
+            with pytest.raises(Exception) as ex:
+                load_config(tmp_cfg)
+
+            assert key in ex.value.args[0]
+            assert error in ex.value.args[0]
+
+        # null disables a throttle
+        cfg = {**cfg, "throttle_user": None, "throttle_chat": [30, 0.5], "coalesce_reply": "latest"}
+        with open(tmp_cfg, "w") as out:
+            json.dump(cfg, out)
+
+        assert load_config(tmp_cfg)["throttle_user"] is None
+
+    def test_invalid_language(self, tmp_path):
+        tmp_cfg = tmp_path / "tmp.json"
+
+        with open(TESTCFG) as c:
+            cfg = json.load(c)
+
+        cfg["language"] = "en"
+        with open(tmp_cfg, "w") as out:
+            json.dump(cfg, out)
+
+        assert load_config(tmp_cfg)["language"] == "en"
+
+        cfg["language"] = "xx"
+        with open(tmp_cfg, "w") as out:
+            json.dump(cfg, out)
+
+        with pytest.raises(Exception) as ex:
+            load_config(tmp_cfg)
+
+        assert "no catalog for language xx" in ex.value.args[0]
@@ -1,14 +1,89 @@
+import asyncio
+import logging
+import audit
+from async_database import AsyncDatabase
 from database import Database
-from datetime import date, timedelta
-from models import AlfredoDate
-from sqlalchemy import select, func
+from datetime import date, datetime, timedelta
+from models import AlfredoDate, AlfredoDateRecord, AlfredoDateArchive, Attendance, AlfredoStatistic, AuditLog, \
+    AuditSnapshot, PizzaOrder
+from sqlalchemy import select, func, delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+import pytest
+
 
 def in_memory_db():
     return Database(":memory:")
 
 
+class AsyncAdapter:
+    # runs the coroutines of an AsyncDatabase on one event loop, so the same test cases work for both
+    def __init__(self, output_file):
+        self.loop = asyncio.new_event_loop()
+        self.db = self.loop.run_until_complete(AsyncDatabase.open(output_file))
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        return lambda *args, **kwargs: self.loop.run_until_complete(attr(*args, **kwargs))
+
+    def scalars(self, stmt):
+        async def run():
+            async with AsyncSession(self.db.engine) as session:
+                return (await session.scalars(stmt)).all()
+
+        return self.loop.run_until_complete(run())
+
+    def execute(self, stmt):
+        async def run():
+            async with self.db.engine.begin() as conn:
+                await conn.execute(stmt)
+
+        self.loop.run_until_complete(run())
+
+    def close_loop(self):
+        self.loop.run_until_complete(self.db.engine.dispose())
+        self.loop.close()
+
+
+@pytest.fixture(params=["sync", "async"])
+def open_db(request):
+    # for the cases that only use the API shared by Database and AsyncDatabase
+    opened = []
+
+    def open_(output_file=":memory:"):
+        db = Database(output_file) if request.param == "sync" else AsyncAdapter(output_file)
+        opened.append(db)
+        return db
+
+    yield open_
+
+    for db in opened:
+        if isinstance(db, AsyncAdapter):
+            db.close_loop()
+
+
+def scalars(db, stmt):
+    if isinstance(db, AsyncAdapter):
+        return db.scalars(stmt)
+
+    with Session(db.engine) as session:
+        return session.scalars(stmt).all()
+
+
+def execute(db, stmt):
+    if isinstance(db, AsyncAdapter):
+        return db.execute(stmt)
+
+    with db.engine.begin() as conn:
+        conn.execute(stmt)
+
+
 def add_default_dates(db):
     db.create_alfredo_date(date.fromisoformat("2001-02-03"), "first description", 123)
     db.create_alfredo_date(date.fromisoformat("2002-03-04"), "", 456)
@@ -18,58 +93,53 @@ def add_default_dates(db):
 
 
 def assert_row_count(db, table, count):
-    with Session(db.engine) as session:
-        actual = session.scalars(select(func.count()).select_from(table)).first()
+    actual = scalars(db, select(func.count()).select_from(table))[0]
 
     assert count == actual
 
 
 class TestDatabase:
-    def test_init(self):
-        db = in_memory_db()
+    def test_init(self, open_db):
+        db = open_db()
 
         assert_row_count(db, AlfredoDate, 0)
 
-    def test_create_alfredo_date(self):
-        db = in_memory_db()
+    def test_create_alfredo_date(self, open_db):
+        db = open_db()
 
         add_default_dates(db)
 
         assert_row_count(db, AlfredoDate, 5)
 
-        with Session(db.engine) as session:
-            d1 = session.scalars(select(AlfredoDate).where(AlfredoDate.id.is_(1))).first()
-            d2 = session.scalars(select(AlfredoDate).where(AlfredoDate.id.is_(2))).first()
-            d3 = session.scalars(select(AlfredoDate).where(AlfredoDate.id.is_(3))).first()
-            d4 = session.scalars(select(AlfredoDate).where(AlfredoDate.id.is_(4))).first()
-            d5 = session.scalars(select(AlfredoDate).where(AlfredoDate.id.is_(5))).first()
-
-            assert d1 is not None
-            assert d2 is not None
-            assert d3 is not None
-            assert d4 is not None
-            assert d5 is not None
-
-            assert d1.date == date.fromisoformat("2001-02-03")
-            assert d2.date == date.fromisoformat("2002-03-04")
-            assert d3.date == date.fromisoformat("2003-04-05")
-            assert d4.date == date.fromisoformat("2004-05-06")
-            assert d5.date == date.fromisoformat("2005-06-07")
-
-            assert d1.description == "first description"
-            assert d2.description == ""
-            assert d3.description is None
-            assert d4.description == "late description"
-            assert d5.description is None
-
-            assert d1.message_id == 123
-            assert d2.message_id == 456
-            assert d3.message_id == 789
-            assert d4.message_id == 0
-            assert d5.message_id is None
-
-    def test_get_future_dates(self):
-        db = in_memory_db()
+        rows = {d.id: d for d in scalars(db, select(AlfredoDate))}
+        d1, d2, d3, d4, d5 = [rows.get(i) for i in range(1, 6)]
+
+        assert d1 is not None
+        assert d2 is not None
+        assert d3 is not None
+        assert d4 is not None
+        assert d5 is not None
+
+        assert d1.date == date.fromisoformat("2001-02-03")
+        assert d2.date == date.fromisoformat("2002-03-04")
+        assert d3.date == date.fromisoformat("2003-04-05")
+        assert d4.date == date.fromisoformat("2004-05-06")
+        assert d5.date == date.fromisoformat("2005-06-07")
+
+        assert d1.description == "first description"
+        assert d2.description == ""
+        assert d3.description is None
+        assert d4.description == "late description"
+        assert d5.description is None
+
+        assert d1.message_id == 123
+        assert d2.message_id == 456
+        assert d3.message_id == 789
+        assert d4.message_id == 0
+        assert d5.message_id is None
+
+    def test_get_future_dates(self, open_db):
+        db = open_db()
 
         assert len(db.get_future_dates()) == 0
 
@@ -94,8 +164,8 @@ class TestDatabase:
         assert future_dates[1].message_id == 3
         assert future_dates[2].message_id == 4
 
-    def test_get_by_date(self):
-        db = in_memory_db()
+    def test_get_by_date(self, open_db):
+        db = open_db()
 
         add_default_dates(db)
 
@@ -105,8 +175,8 @@ class TestDatabase:
 
         assert db.get_by_date(date.fromisoformat("2002-02-03")) is None
 
-    def test_delete_date(self):
-        db = in_memory_db()
+    def test_delete_date(self, open_db):
+        db = open_db()
 
         add_default_dates(db)
         d = db.get_by_date(date.fromisoformat("2001-02-03"))
@@ -116,17 +186,415 @@ class TestDatabase:
         d = db.get_by_date(date.fromisoformat("2001-02-03"))
         assert d is None
 
-    def test_reopen_db(self, tmp_path):
+    def test_get_dates_between(self, open_db):
+        db = open_db()
+
+        add_default_dates(db)
+
+        dates = db.get_dates_between(date.fromisoformat("2002-03-04"), date.fromisoformat("2004-05-06"))
+        assert [d.id for d in dates] == [2, 3, 4]
+
+        dates = db.get_dates_between(date.fromisoformat("2002-03-04"), date.fromisoformat("2002-03-04"))
+        assert [d.id for d in dates] == [2]
+
+        assert db.get_dates_between(date.fromisoformat("2002-03-05"), date.fromisoformat("2003-04-04")) == []
+
+    def test_delete_dates(self, open_db):
+        db = open_db()
+
+        add_default_dates(db)
+        db.delete_dates(db.get_dates_between(date.fromisoformat("2002-03-04"), date.fromisoformat("2004-05-06")))
+
+        assert_row_count(db, AlfredoDate, 2)
+        assert db.get_by_date(date.fromisoformat("2001-02-03")) is not None
+        assert db.get_by_date(date.fromisoformat("2003-04-05")) is None
+        assert sum(s.cancelled for s in db.get_statistics()) == 3
+
+        # nothing to delete
+        db.delete_dates([])
+        assert_row_count(db, AlfredoDate, 2)
+
+    def test_records(self, open_db):
+        db = open_db()
+
+        add_default_dates(db)
+        d = db.get_by_date(date.fromisoformat("2001-02-03"))
+
+        assert isinstance(d, AlfredoDateRecord)
+        assert d == AlfredoDateRecord(1, date.fromisoformat("2001-02-03"), "first description", 123)
+        assert d in db.get_dates_between(date.min, date.max)
+
+        with pytest.raises(AttributeError):
+            d.message_id = 1
+
+        with pytest.raises(AttributeError):
+            d.attribute = 1
+
+    def test_delete_dates_by_id(self, open_db):
+        db = open_db()
+
+        add_default_dates(db)
+        db.create_alfredo_date(date.fromisoformat("2199-01-01"), None, 1, "poll1")
+        db.set_attendance("poll1", 1, 0)
+        # AsyncDatabase can't write orders, but has to delete them with their date
+        execute(db, insert(PizzaOrder).values([
+            {"date": date.fromisoformat(day), "user_id": 1, "item": "Margherita", "count": 1}
+            for day in ["2199-01-01", "2001-02-03"]
+        ]))
+
+        # unknown ids are ignored
+        assert db.delete_dates_by_id([2, 6, 42]) == 2
+        assert [d.id for d in db.get_dates_between(date.min, date.max)] == [1, 3, 4, 5]
+        assert db.get_attendees("poll1") == 0
+        assert sum(s.cancelled for s in db.get_statistics()) == 2
+        assert scalars(db, select(PizzaOrder.date)) == [date.fromisoformat("2001-02-03")]
+
+        assert db.delete_dates_by_id([]) == 0
+
+    def test_reopen_db(self, tmp_path, open_db):
         f = tmp_path / "database.sqlite"
-        db = Database(f)
+        db = open_db(f)
 
         db.create_alfredo_date(date.fromisoformat("2001-02-03"), "first description", 123)
 
-        del db
+        db.close()
 
-        db = Database(f)
+        db = open_db(f)
         assert_row_count(db, AlfredoDate, 1)
 
+        d1 = scalars(db, select(AlfredoDate).where(AlfredoDate.id.is_(1)))[0]
+        assert d1.date == date.fromisoformat("2001-02-03")
+
+    def test_archive_past_dates(self):
+        db = in_memory_db()
+
+        today = date.today()
+        tomorrow = today + timedelta(days=1)
+
+        assert db.archive_past_dates() == 0
+
+        add_default_dates(db)
+        db.create_alfredo_date(today, None, 1)
+        db.create_alfredo_date(tomorrow, None, 2)
+
+        assert db.archive_past_dates() == 5
+        assert_row_count(db, AlfredoDate, 2)
+        assert_row_count(db, AlfredoDateArchive, 5)
+
         with Session(db.engine) as session:
-            d1 = session.scalars(select(AlfredoDate).where(AlfredoDate.id.is_(1))).first()
-            assert d1.date == date.fromisoformat("2001-02-03")
+            a1 = session.scalars(select(AlfredoDateArchive).where(AlfredoDateArchive.date_id.is_(1))).first()
+            assert a1.date == date.fromisoformat("2001-02-03")
+            assert a1.description == "first description"
+            assert a1.message_id == 123
+            assert a1.archived_at is not None
+
+        # nothing left to archive
+        assert db.archive_past_dates() == 0
+        assert_row_count(db, AlfredoDateArchive, 5)
+
+        # everything is archived as soon as it is in the past
+        assert db.archive_past_dates(today=tomorrow + timedelta(days=1)) == 2
+        assert_row_count(db, AlfredoDate, 0)
+        assert_row_count(db, AlfredoDateArchive, 7)
+
+        # reused ids don't collide with archived ones
+        db.create_alfredo_date(date.fromisoformat("2001-02-03"))
+        assert db.archive_past_dates() == 1
+        assert_row_count(db, AlfredoDateArchive, 8)
+
+    def test_votes(self, open_db):
+        db = open_db()
+
+        db.create_alfredo_date(date.fromisoformat("2199-01-01"), None, 1, "poll1")
+        assert db.set_attendance("poll1", 1, 1)
+        assert db.set_attendance("poll1", 2, 0)
+        assert db.set_attendance("poll1", 2, None)
+        assert db.set_attendance("poll2", 1, 0) is False
+        assert db.get_attendees("poll1") == 2
+
+        db.delete_date(db.get_by_date(date.fromisoformat("2199-01-01")))
+        assert_row_count(db, Attendance, 0)
+
+    def test_attendance(self):
+        db = in_memory_db()
+
+        db.create_alfredo_date(date.fromisoformat("2001-02-03"), None, 1, "poll1")
+        db.create_alfredo_date(date.fromisoformat("2001-02-04"), None, 2, "poll2")
+
+        assert db.get_attendees("poll1") == 0
+
+        assert db.set_attendance("poll1", 1, 0)
+        assert db.set_attendance("poll1", 2, 1)
+        assert db.set_attendance("poll2", 1, 0)
+        assert db.get_attendees("poll1") == 3
+        assert db.get_attendees("poll2") == 1
+
+        # votes can be changed and retracted
+        assert db.set_attendance("poll1", 2, 0)
+        assert db.get_attendees("poll1") == 2
+        assert db.set_attendance("poll1", 2, None)
+        assert db.get_attendees("poll1") == 1
+
+        # unknown polls
+        assert db.set_attendance("poll3", 1, 0) is False
+        assert_row_count(db, Attendance, 2)
+
+        # attendance is moved to the archive
+        db.archive_past_dates()
+        assert_row_count(db, Attendance, 0)
+        assert [a.attendees for a in scalars(db, select(AlfredoDateArchive).order_by(AlfredoDateArchive.date))] \
+            == [1, 1]
+
+        # and deleted together with its date
+        db.create_alfredo_date(date.fromisoformat("2199-01-01"), None, 3, "poll3")
+        db.set_attendance("poll3", 1, 1)
+        db.delete_date(db.get_by_date(date.fromisoformat("2199-01-01")))
+        assert_row_count(db, Attendance, 0)
+
+    def test_get_future_attendance(self):
+        db = in_memory_db()
+
+        db.create_alfredo_date(date.fromisoformat("2001-02-03"), None, 1, "poll1")
+        db.create_alfredo_date(date.fromisoformat("2199-01-02"), None, 3, "poll3")
+        db.create_alfredo_date(date.fromisoformat("2199-01-01"), "Geburtstag", 2, "poll2")
+        db.set_attendance("poll1", 1, 0)
+        db.set_attendance("poll2", 1, 1)
+
+        rows = db.get_future_attendance()
+        assert [(r.date.isoformat(), r.description, r.attendees) for r in rows] == [
+            ("2199-01-01", "Geburtstag", 2),
+            ("2199-01-02", None, 0)
+        ]
+
+    def test_state(self):
+        db = in_memory_db()
+
+        assert db.get_state("board_message_id") is None
+        db.set_state("board_message_id", "12")
+        db.set_state("board_message_id", "13")
+        assert db.get_state("board_message_id") == "13"
+
+    def test_date_page(self):
+        db = in_memory_db()
+        db.create_alfredo_date(date(2000, 1, 1))
+        for day in [5, 1, 3, 2, 4]:
+            db.create_alfredo_date(date(2199, 1, day))
+
+        def days(records):
+            return [r.date.day for r in records]
+
+        # past dates are never part of a page
+        assert days(db.get_date_page(limit=2)) == [1, 2]
+        assert days(db.get_date_page(after=date(2199, 1, 2), limit=2)) == [3, 4]
+        assert days(db.get_date_page(after=date(2199, 1, 4), limit=2)) == [5]
+        assert days(db.get_date_page(before=date(2199, 1, 4), limit=2)) == [2, 3]
+        assert days(db.get_date_page(before=date(2199, 1, 2), limit=2)) == [1]
+        assert db.get_date_page(before=date(2199, 1, 1)) == []
+
+        assert db.count_future_dates() == 5
+        assert db.count_future_dates(before=date(2199, 1, 3)) == 2
+
+    def test_orders(self):
+        db = in_memory_db()
+        db.create_alfredo_date(date(2199, 1, 1))
+        db.create_alfredo_date(date(2199, 1, 2))
+
+        written = db.set_orders([
+            (date(2199, 1, 1), 1, {"Margherita": 2, "Schiggn": 1}),
+            (date(2199, 1, 1), 2, {"Schiggn": 1}),
+            (date(2199, 1, 2), 1, {"Margherita": 1}),
+            # unknown dates and empty items are dropped
+            (date(2199, 1, 3), 1, {"Margherita": 1}),
+            (date(2199, 1, 2), 2, {"Margherita": 0})
+        ])
+        assert written == 4
+        assert [tuple(r) for r in db.get_orders(date(2199, 1, 1))] == [
+            (1, "Margherita", 2), (1, "Schiggn", 1), (2, "Schiggn", 1)
+        ]
+
+        # a change replaces the whole order of that user
+        db.set_orders([(date(2199, 1, 1), 1, {"Schiggn": 3}), (date(2199, 1, 1), 2, {})])
+        assert [tuple(r) for r in db.get_orders(date(2199, 1, 1))] == [(1, "Schiggn", 3)]
+
+        # orders are deleted with their date
+        db.delete_date(db.get_by_date(date(2199, 1, 1)))
+        assert db.get_orders(date(2199, 1, 1)) == []
+        assert len(db.get_orders(date(2199, 1, 2))) == 1
+
+        db.archive_past_dates(today=date(2199, 1, 3))
+        assert db.get_orders(date(2199, 1, 2)) == []
+
+    def test_statistics(self):
+        db = in_memory_db()
+
+        assert len(db.get_statistics()) == 0
+
+        db.create_alfredo_date(date.fromisoformat("2001-02-03"), None, 1, "poll1")
+        db.create_alfredo_date(date.fromisoformat("2001-02-04"), None, 2, "poll2")
+        db.create_alfredo_date(date.fromisoformat("2001-03-01"), None, 3, "poll3")
+        db.set_attendance("poll1", 1, 1)
+        db.set_attendance("poll1", 2, 0)
+
+        stats = db.get_statistics()
+        assert len(stats) == 2
+        assert (stats[0].year, stats[0].month, stats[0].created, stats[0].held) == (2001, 2, 2, 0)
+        assert (stats[1].year, stats[1].month, stats[1].created, stats[1].held) == (2001, 3, 1, 0)
+
+        db.delete_date(db.get_by_date(date.fromisoformat("2001-03-01")))
+        db.archive_past_dates()
+
+        stats = db.get_statistics()
+        assert (stats[0].created, stats[0].cancelled, stats[0].held, stats[0].attendees) == (2, 0, 2, 3)
+        assert (stats[1].created, stats[1].cancelled, stats[1].held, stats[1].attendees) == (1, 1, 0, 0)
+
+        # rebuilding from the rows results in the same statistics
+        db.create_alfredo_date(date.fromisoformat("2199-01-01"))
+        stats = db.get_statistics()
+
+        with Session(db.engine) as session:
+            session.execute(delete(AlfredoStatistic).where(AlfredoStatistic.year == 2001))
+            session.commit()
+
+        assert db.get_statistics() != stats
+        db.rebuild_statistics()
+        # cancellations can't be restored once the counters are gone
+        assert [tuple(s) for s in db.get_statistics()] == [
+            (2001, 2, 2, 0, 2, 3),
+            (2199, 1, 1, 0, 0, 0)
+        ]
+
+    def test_audit(self):
+        db = in_memory_db()
+        admin = audit.Actor(1, "Admin")
+
+        db.create_alfredo_date(date(2199, 1, 1), "1", 11, "poll1", actor=admin)
+        db.create_alfredo_date(date(2199, 1, 2), "2", 12, "poll2")
+        db.audit(admin, audit.ANNOUNCE, details={"text": "Alfredo!"})
+        db.delete_dates_by_id([1, 2], actor=admin)
+
+        entries = db.get_audit()
+        assert [(e.id, e.action, e.date) for e in entries] == [
+            (4, audit.CANCEL, date(2199, 1, 2)), (3, audit.CANCEL, date(2199, 1, 1)), (2, audit.ANNOUNCE, None),
+            (1, audit.CREATE, date(2199, 1, 1))
+        ]
+        assert entries[-1].details == {"description": "1", "message_id": 11, "poll_id": "poll1"}
+        assert (entries[-1].user_id, entries[-1].user_name) == (1, "Admin")
+
+        # entries can neither be changed nor removed
+        with pytest.raises(IntegrityError, match="append-only"):
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql("UPDATE audit_log SET user_name = 'Someone'")
+
+        with pytest.raises(IntegrityError, match="append-only"):
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql("DELETE FROM audit_log")
+
+        assert len(db.get_audit()) == 4
+
+    def test_audit_transaction(self):
+        db = in_memory_db()
+
+        def failing(*args, **kwargs):
+            raise Exception("disk full")
+
+        # without its audit entry, the change isn't written either
+        db.write_audit = failing
+        with pytest.raises(Exception):
+            db.create_alfredo_date(date(2199, 1, 1), actor=audit.SYSTEM)
+
+        assert db.get_by_date(date(2199, 1, 1)) is None
+
+    def test_audit_state(self):
+        db = in_memory_db()
+        db.audit_snapshot_interval = 4
+        admin = audit.Actor(1, "Admin")
+
+        assert db.get_audit_state(datetime.now()) == (None, {})
+
+        for day in range(1, 11):
+            db.create_alfredo_date(date(2199, 1, day), actor=admin)
+            if day % 3 == 0:
+                db.delete_dates([db.get_by_date(date(2199, 1, day - 1))], actor=admin)
+
+        with Session(db.engine) as session:
+            rows = session.execute(select(AuditSnapshot.entry_id, AuditSnapshot.state)).all()
+            entries = session.execute(select(AuditLog.action, AuditLog.date, AuditLog.details)
+                                      .order_by(AuditLog.id)).all()
+
+        assert [row.entry_id for row in rows] == [4, 8, 12]
+
+        # replaying everything results in the same state as starting from the latest snapshot
+        replayed = audit.replay({}, ((e.action, e.date, audit.load(e.details)) for e in entries))
+        entry_id, state = db.get_audit_state(datetime.now())
+        assert entry_id == 13
+        assert state == replayed
+        assert sorted(state) == [f"2199-01-{day:02}" for day in [1, 3, 4, 6, 7, 9, 10]]
+
+        assert db.get_audit_state(datetime(2000, 1, 1)) == (None, {})
+
+    def test_upgrade_schema(self, tmp_path):
+        f = tmp_path / "database.sqlite"
+        db = Database(f)
+
+        # simulate a database from before poll ids were stored
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_alfredo_date_poll_id")
+            conn.exec_driver_sql("ALTER TABLE alfredo_date DROP COLUMN poll_id")
+
+        del db
+
+        db = Database(f)
+        db.create_alfredo_date(date.fromisoformat("2001-02-03"), None, 1, "poll1")
+        assert db.get_by_date(date.fromisoformat("2001-02-03")).poll_id == "poll1"
+
+    def test_upgrade_statistics(self, tmp_path, caplog):
+        f = tmp_path / "database.sqlite"
+        db = Database(f)
+        db.create_alfredo_date(date.fromisoformat("2020-05-01"), None, 1, "poll1")
+        db.create_alfredo_date(date.fromisoformat("2199-01-01"), None, 2, "poll2")
+        db.set_attendance("poll1", 1, 1)
+
+        # simulate a database from before the summary table
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE alfredo_statistic")
+
+        del db
+
+        with caplog.at_level(logging.INFO):
+            db = Database(f)
+        assert "filled the statistics" in caplog.text
+
+        # archiving right after the upgrade doesn't count a date as held without it being created
+        db.archive_past_dates()
+        assert [tuple(s) for s in db.get_statistics()] == [(2020, 5, 1, 0, 1, 2), (2199, 1, 1, 0, 0, 0)]
+
+        # existing statistics are never recounted on startup
+        caplog.clear()
+        with caplog.at_level(logging.INFO):
+            Database(f)
+        assert "filled the statistics" not in caplog.text
+
+    def test_compact(self, tmp_path, caplog):
+        f = tmp_path / "database.sqlite"
+        db = Database(f)
+
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+
+        add_default_dates(db)
+        db.archive_past_dates()
+        db.compact()
+
+        # databases from before the archive get converted once
+        old = tmp_path / "old.sqlite"
+        db = Database(old)
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA auto_vacuum = 0")
+            conn.exec_driver_sql("VACUUM")
+
+        with caplog.at_level(logging.INFO):
+            db.compact()
+            assert "switching database" in caplog.text
+
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
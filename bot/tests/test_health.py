@@ -0,0 +1,96 @@
+import json
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from health import HealthMonitor, HealthServer
+
+
+def monitor(max_lag=60, stopping=False, db_ping=lambda: 0.001):
+    return HealthMonitor(max_lag, queue_depth=lambda: 3, running=lambda: 1, db_ping=db_ping,
+                         stopping=lambda: stopping)
+
+
+def fetch(server, path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}{path}", timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as ex:
+        return ex.code, json.loads(ex.read()) if ex.code == 503 else None
+
+
+class TestHealthMonitor:
+    def test_state(self):
+        health = monitor()
+        health.polled()
+        state = health.state()
+
+        assert state["ready"]
+        assert state["polling_lag"] < 1
+        assert state["handler_queue_depth"] == 3
+        assert state["handlers_running"] == 1
+        assert state["db_round_trip_ms"] == 1
+        assert state["last_api_error"] is None
+
+    def test_lag(self):
+        health = monitor(max_lag=0.05)
+        # lag counts from startup until the first poll
+        assert health.polling_lag() < 1
+
+        time.sleep(0.1)
+        assert health.state()["ready"] is False
+
+        health.polled()
+        assert health.state()["ready"]
+
+    def test_api_error(self):
+        health = monitor()
+        health.api_error("send_message", Exception("Bad Gateway"))
+
+        error = health.state()["last_api_error"]
+        assert error["method"] == "send_message"
+        assert error["error"] == "Bad Gateway"
+        assert error["seconds_ago"] >= 0
+
+    def test_not_ready(self):
+        assert monitor(stopping=True).state()["ready"] is False
+
+        def broken_ping():
+            raise Exception("database is locked")
+
+        health = monitor(db_ping=broken_ping)
+        state = health.state()
+        assert state["ready"] is False
+        assert state["db_round_trip_ms"] is None
+        assert state["last_api_error"]["method"] == "database"
+
+
+class TestHealthServer:
+    @pytest.fixture
+    def server(self):
+        server = HealthServer(monitor(max_lag=0.05), "127.0.0.1", 0)
+        server.start()
+        yield server
+        server.stop()
+
+    def test_endpoints(self, server):
+        server.server.monitor.polled()
+
+        status, state = fetch(server, "/ready")
+        assert status == 200
+        assert state["ready"]
+
+        time.sleep(0.1)
+        status, state = fetch(server, "/ready")
+        assert status == 503
+        assert state["ready"] is False
+
+        # liveness does not depend on polling
+        status, state = fetch(server, "/health")
+        assert status == 200
+        assert state["ready"] is False
+
+        status, _ = fetch(server, "/other")
+        assert status == 404
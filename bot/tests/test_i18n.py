@@ -0,0 +1,112 @@
+import json
+import logging
+from datetime import date
+
+import pytest
+
+import util
+from i18n import Catalog, CatalogError, Catalogs, available_languages, compile_template
+
+REFERENCE = {
+    "locale": "de_DE",
+    "messages": {
+        "hello": "Hallo {name}!",
+        "empty": "Nichts da {frowning}",
+        "options": ["Ja", "Nein"]
+    }
+}
+
+
+def write_catalogs(tmp_path, **catalogs):
+    for language, entries in catalogs.items():
+        with open(tmp_path / f"{language}.json", "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+
+    return tmp_path
+
+
+class TestI18n:
+    def test_compile_template(self):
+        assert compile_template("Hallo {name}!") == ("Hallo {name}!", {"name"})
+        assert compile_template("{held} ({average:.1f})") == ("{held} ({average:.1f})", {"held", "average"})
+
+        # emojis are no fields, literal braces survive
+        template, fields = compile_template("{chart} {{x}}")
+        assert fields == set()
+        assert template.format() == f"{util.emoji('chart')} {{x}}"
+
+    def test_catalog(self):
+        catalog = Catalog("de", REFERENCE)
+
+        # static texts are stored rendered, templates as bound methods
+        assert catalog.texts["empty"] == f"Nichts da {util.emoji('frowning')}"
+        assert "hello" in catalog.templates
+
+        assert catalog.text("empty") == f"Nichts da {util.emoji('frowning')}"
+        assert catalog.format("hello", name="Alfredo") == "Hallo Alfredo!"
+        assert catalog.choices("options") == ("Ja", "Nein")
+        assert catalog.random("options") in ["Ja", "Nein"]
+
+        assert catalog.date(date(2023, 1, 1)) == util.format_date(date(2023, 1, 1))
+        assert catalog.command("termine", "Termine") == "Termine"
+
+    def test_message(self):
+        catalog = Catalog("de", REFERENCE)
+
+        assert catalog.message("hello", {"name": "Alfredo"}) == "Hallo Alfredo!"
+        assert catalog.message("empty", {}) == catalog.text("empty")
+
+    def test_fallback(self, caplog):
+        reference = Catalog("de", REFERENCE)
+
+        with caplog.at_level(logging.WARNING):
+            catalog = Catalog("en", {"locale": "en_GB", "messages": {"hello": "Hello {name}!"}}, reference)
+
+        assert "2 messages missing" in caplog.text
+        assert catalog.format("hello", name="Alfredo") == "Hello Alfredo!"
+        assert catalog.text("empty") == reference.text("empty")
+        assert catalog.choices("options") == ("Ja", "Nein")
+        assert catalog.date(date(2023, 1, 1)) == "Sunday, 1 January 2023"
+
+    def test_check(self):
+        reference = Catalog("de", REFERENCE)
+
+        with pytest.raises(CatalogError) as err:
+            Catalog("en", {"messages": {"hello": "Hello {user}!"}}, reference)
+        assert "'hello' expects ['name']" in str(err.value)
+
+        with pytest.raises(CatalogError) as err:
+            Catalog("en", {"messages": {"bye": "Bye"}}, reference)
+        assert "unknown message 'bye'" in str(err.value)
+
+        with pytest.raises(CatalogError) as err:
+            Catalog("en", {"messages": {"answers": ["Yes"]}}, reference)
+        assert "unknown list 'answers'" in str(err.value)
+
+    def test_catalogs(self, tmp_path):
+        english = {"locale": "en_GB", "messages": {"hello": "Hello {name}!"}}
+        directory = write_catalogs(tmp_path, de=REFERENCE, en=english)
+
+        catalogs = Catalogs("en", directory)
+        assert catalogs.languages == ["de", "en"]
+        assert catalogs.default.language == "en"
+        assert catalogs.get("de").format("hello", name="A") == "Hallo A!"
+
+        # chats without a choice get the default
+        assert catalogs.get(None) is catalogs.default
+        assert catalogs.get("fr") is catalogs.default
+
+        with pytest.raises(CatalogError):
+            Catalogs("fr", directory)
+
+    def test_bundled_catalogs(self):
+        # every shipped translation has to compile against the reference
+        catalogs = Catalogs()
+
+        assert "de" in available_languages()
+        assert "en" in available_languages()
+
+        for language in catalogs.languages:
+            catalog = catalogs.get(language)
+            assert len(catalog.choices("reminders")) > 0
+            assert len(catalog.choices("poll_options")) == 2
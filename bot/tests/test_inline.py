@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+import logging
+
+from database import Database
+from i18n import Catalogs
+from inline import InlineResults
+from menu import MenuCache
+from test_menu import MENU_FILE
+import util
+
+TOMORROW = date.today() + timedelta(days=1)
+
+
+def render_dates(dates):
+    return f"{len(dates)} dates"
+
+
+def default_results(language="de"):
+    return InlineResults(Database(":memory:"), MenuCache(MENU_FILE), render_dates, Catalogs().get(language))
+
+
+class TestInline:
+    def test_dates(self):
+        inline = default_results()
+
+        results = inline.get("termine")
+        assert len(results) == 1
+        assert results[0].id == "termine"
+        assert results[0].input_message_content.message_text == "0 dates"
+
+        inline.db.create_alfredo_date(TOMORROW, "Alfredo", 1)
+        inline.db.create_alfredo_date(TOMORROW + timedelta(days=1), None, 2)
+
+        results = inline.get("termine")
+        assert len(results) == 3
+        assert results[0].input_message_content.message_text == "2 dates"
+        assert results[1].id == "termine-1"
+        assert results[1].description == "Alfredo"
+        assert results[0].title == "Alle Termine"
+        assert results[1].title == util.format_date(TOMORROW)
+
+        # every date is posted as itself, not as the next one
+        for result, date_ in zip(results[1:], [TOMORROW, TOMORROW + timedelta(days=1)]):
+            assert result.input_message_content.message_text == f"Alfredo am {util.format_date(date_)}"
+
+    def test_language(self):
+        inline = default_results("en")
+        inline.db.create_alfredo_date(TOMORROW, "Alfredo", 1)
+
+        results = inline.get("")
+        assert [r.title for r in results] == ["All dates", util.format_date(TOMORROW, "en_GB"), "Alfredo menu"]
+        assert results[0].description == "1 announced dates"
+
+    def test_menu(self):
+        inline = default_results()
+
+        results = inline.get("karte")
+        assert len(results) == 1
+        assert results[0].id == "karte"
+        assert "Pizza" in results[0].description
+        assert results[0].input_message_content.parse_mode == "HTML"
+
+        # no menu file
+        inline.menu_cache = MenuCache("does-not-exist.tex")
+        assert inline.get("karte") == []
+
+    def test_queries(self):
+        inline = default_results()
+
+        ids = [r.id for r in inline.get("")]
+        assert ids == ["termine", "karte"]
+
+        assert [r.id for r in inline.get("  TERM ")] == ["termine"]
+        assert [r.id for r in inline.get("k")] == ["karte"]
+        assert inline.get("pizza") == []
+
+    def test_precomputed(self, caplog):
+        inline = default_results()
+
+        with caplog.at_level(logging.DEBUG):
+            results = inline.dates()
+            menu = inline.menu()
+            assert "regenerating inline results for dates" in caplog.text
+            assert "regenerating inline results for menu" in caplog.text
+            caplog.clear()
+
+            # unchanged sources, same result sets
+            assert inline.dates() is results
+            assert inline.menu() is menu
+            assert "regenerating" not in caplog.text
+
+            # writes invalidate the dates only
+            inline.db.create_alfredo_date(TOMORROW, None, 1)
+            assert inline.dates() is not results
+            assert inline.menu() is menu
+
+            # as does a new day
+            results = inline.dates()
+            inline.dates_key = (inline.db.version, date.today() - timedelta(days=1))
+            assert inline.dates() is not results
@@ -0,0 +1,104 @@
+import io
+import json
+import logging
+
+import pytest
+
+from logs import Lazy, JsonFormatter, SamplingFilter, parse_sampling, setup_logging
+
+
+def record(name="test", level=logging.DEBUG, msg="hallo %s", args=("welt",), **extra):
+    rec = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    rec.__dict__.update(extra)
+    return rec
+
+
+@pytest.fixture
+def restore_root():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+class TestLogs:
+    def test_lazy(self):
+        calls = []
+
+        def expensive(x):
+            calls.append(x)
+            return x * 2
+
+        log = logging.getLogger("lazy")
+        log.setLevel(logging.INFO)
+        log.debug("%s", Lazy(expensive, 21))
+        assert calls == []
+
+        assert str(Lazy(expensive, 21)) == "42"
+        assert calls == [21]
+
+    def test_json_formatter(self):
+        entry = json.loads(JsonFormatter().format(record(fields={"user_id": 42, "role": lambda: "admin"})))
+
+        assert entry["level"] == "DEBUG"
+        assert entry["logger"] == "test"
+        assert entry["message"] == "hallo welt"
+        assert entry["user_id"] == 42
+        assert entry["role"] == "admin"
+
+        entry = json.loads(JsonFormatter().format(record(exc_text="Traceback")))
+        assert entry["exception"] == "Traceback"
+
+    def test_sampling(self):
+        sampling = SamplingFilter({"BotRunner.api": 3})
+
+        kept = [sampling.filter(record("BotRunner.api")) for _ in range(6)]
+        assert kept == [True, False, False, True, False, False]
+
+        # children are sampled, other loggers and higher levels are not
+        assert sampling.filter(record("BotRunner.api.child")) is True
+        assert sampling.filter(record("BotRunner.api.child")) is False
+        assert all(sampling.filter(record("BotRunner")) for _ in range(3))
+        assert all(sampling.filter(record("BotRunner.api", logging.ERROR)) for _ in range(3))
+
+    def test_parse_sampling(self):
+        assert parse_sampling("BotRunner.api=10") == ("BotRunner.api", 10)
+
+        for value in ["BotRunner.api", "=10", "BotRunner.api=0", "BotRunner.api=x"]:
+            with pytest.raises(ValueError):
+                parse_sampling(value)
+
+    def test_setup_logging(self, restore_root):
+        stream = io.StringIO()
+        listener = setup_logging(logging.DEBUG, sampling={"noisy": 2}, stream=stream)
+
+        log = logging.getLogger("pipeline")
+        log.info("value %s", Lazy(lambda: 42), extra={"fields": {"user_id": 1}})
+        try:
+            raise ValueError("kaputt")
+        except ValueError:
+            log.exception("failed")
+        for i in range(4):
+            logging.getLogger("noisy").debug("noise %d", i)
+
+        listener.stop()
+        entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+        assert entries[0]["message"] == "value 42"
+        assert entries[0]["user_id"] == 1
+        assert "ValueError: kaputt" in entries[1]["exception"]
+        assert [e["message"] for e in entries[2:]] == ["noise 0", "noise 2"]
+
+    def test_setup_logging_text(self, restore_root):
+        stream = io.StringIO()
+        listener = setup_logging(logging.INFO, json_lines=False, stream=stream)
+
+        logging.getLogger("pipeline").debug("hidden")
+        logging.getLogger("pipeline").info("visible")
+        listener.stop()
+
+        assert stream.getvalue().strip().endswith("pipeline - INFO - visible")
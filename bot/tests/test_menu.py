@@ -0,0 +1,126 @@
+import logging
+import os
+from os import path
+
+import menu
+import util
+
+MENU_FILE = path.join(path.dirname(__file__), "..", "..", "menu.tex")
+
+SOURCE = r"""
+\newcommand*\Entry[2]{%
+  \sffamily#1 & #2}
+
+\begin{Group}{Pizza}
+\Entry{El Classico}{} \\
+\Expl{Scharfe Salami} \\
+\Entry{Currywurst} \\
+\Entry{Kompost $\ast$}{} \\
+\Expl{Frisches aus der ``Biotonne''} \\
+\end{Group}
+
+\Expl{not part of a group}
+
+\begin{Group}{Getr\"anke}
+    \Entry{Bier $\ast$$\ast$}{} \\
+    \Expl{liebe\-voll   gebraut} \\
+\end{Group}
+"""
+
+
+def write_menu(filename, source):
+    with open(filename, "w") as f:
+        f.write(source)
+
+
+class TestMenu:
+    def test_parse_menu(self):
+        m = menu.parse_menu(SOURCE)
+
+        assert len(m.groups) == 2
+        assert m.groups[0].name == "Pizza"
+        assert len(m.groups[0].items) == 3
+        assert len(m.groups[1].items) == 1
+
+        classico, currywurst, kompost = m.groups[0].items
+        assert classico.name == "El Classico"
+        assert classico.description == "Scharfe Salami"
+        assert classico.markers == 0
+
+        # entry without second argument and description
+        assert currywurst.name == "Currywurst"
+        assert currywurst.description is None
+
+        assert kompost.name == "Kompost"
+        assert kompost.markers == 1
+        assert kompost.description == "Frisches aus der „Biotonne“"
+
+        bier = m.groups[1].items[0]
+        assert bier.markers == 2
+        assert bier.description == "liebevoll gebraut"
+
+    def test_render(self):
+        labels = ("nach Anmeldung", "Erfordert Vorbereitung")
+        text = menu.parse_menu(SOURCE).text(labels)
+
+        assert "<b>Pizza</b>" in text
+        assert f"{util.emoji('bullet')} Kompost*\n" in text
+        assert "<i>Scharfe Salami</i>" in text
+        assert "* nach Anmeldung" in text
+        assert "** Erfordert Vorbereitung" in text
+        assert "not part of a group" not in text
+
+        # the legend is in the language of the labels
+        assert "* on request" in menu.parse_menu(SOURCE).text(("on request", "needs preparation"))
+
+        # html is escaped
+        text = menu.parse_menu(r"\begin{Group}{<b>}\Entry{a & b}{}\end{Group}").text(labels)
+        assert "&lt;b&gt;" in text
+        assert "a &amp; b" in text
+
+    def test_parse_menu_file(self):
+        m = menu.MenuCache(MENU_FILE).get()
+
+        names = [g.name for g in m.groups]
+        assert "Pizza" in names
+        assert "Soßen" in names
+
+        for group in m.groups:
+            assert len(group.items) > 0
+
+    def test_menu_cache(self, tmp_path, caplog):
+        f = tmp_path / "menu.tex"
+        cache = menu.MenuCache(f)
+
+        with caplog.at_level(logging.DEBUG):
+            # missing file
+            assert cache.get() is None
+            assert "could not stat" in caplog.text
+
+            write_menu(f, SOURCE)
+            m = cache.get()
+            assert len(m.groups) == 2
+            assert "parsing" in caplog.text
+            caplog.clear()
+
+            # unchanged mtime
+            assert cache.get() is m
+            assert caplog.text == ""
+
+            # changed mtime, same content
+            os.utime(f, ns=(0, 0))
+            assert cache.get() is m
+            assert "did not change" in caplog.text
+            caplog.clear()
+
+            # changed content
+            write_menu(f, r"\begin{Group}{Pizza}\end{Group}")
+            os.utime(f, ns=(1, 1))
+            m = cache.get()
+            assert len(m.groups) == 1
+            assert "parsing" in caplog.text
+            caplog.clear()
+
+            # removed file keeps the last menu
+            os.remove(f)
+            assert cache.get() is m
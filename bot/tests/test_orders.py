@@ -0,0 +1,126 @@
+import time
+from datetime import date, timedelta
+
+from database import Database
+from orders import OrderBook
+
+TOMORROW = date.today() + timedelta(days=1)
+
+
+def order_db(tmp_path):
+    # a file, so the timer threads see the same database
+    db = Database(str(tmp_path / "alfredo.sqlite"))
+    db.create_alfredo_date(TOMORROW)
+    return db
+
+
+def wait_for(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end
+        time.sleep(0.01)
+
+
+class TestOrderBook:
+    def test_orders(self, tmp_path):
+        book = OrderBook(order_db(tmp_path), 60, 50)
+
+        assert book.add(TOMORROW, 1, "Margherita") == {"Margherita": 1}
+        assert book.add(TOMORROW, 1, "Margherita") == {"Margherita": 2}
+        assert book.add(TOMORROW, 1, "Schiggn") == {"Margherita": 2, "Schiggn": 1}
+        assert book.add(TOMORROW, 2, "Schiggn") == {"Schiggn": 1}
+
+        totals, users = book.summary(TOMORROW)
+        assert totals == {"Margherita": 2, "Schiggn": 2}
+        assert users == 2
+
+        assert book.clear(TOMORROW, 2) == {}
+        assert book.get(TOMORROW, 2) == {}
+        assert book.summary(TOMORROW)[1] == 1
+
+    def test_flush(self, tmp_path):
+        db = order_db(tmp_path)
+        book = OrderBook(db, 60, 50)
+
+        book.add(TOMORROW, 1, "Margherita")
+        book.add(TOMORROW, 2, "Schiggn")
+        book.clear(TOMORROW, 2)
+
+        # nothing is written before the flush
+        assert db.get_orders(TOMORROW) == []
+        assert book.flush() == 2
+        assert [tuple(r) for r in db.get_orders(TOMORROW)] == [(1, "Margherita", 1)]
+        assert book.flush() == 0
+
+        # a new instance starts from the database
+        book = OrderBook(db, 60, 50)
+        assert book.add(TOMORROW, 1, "Margherita") == {"Margherita": 2}
+
+    def test_interval(self, tmp_path):
+        db = order_db(tmp_path)
+        book = OrderBook(db, 0.05, 50)
+
+        book.add(TOMORROW, 1, "Margherita")
+        assert book.timer is not None
+
+        wait_for(lambda: len(db.get_orders(TOMORROW)) == 1)
+        assert book.dirty == set()
+
+    def test_batch_size(self, tmp_path):
+        db = order_db(tmp_path)
+        book = OrderBook(db, 60, 3)
+
+        for user_id in [1, 2]:
+            book.add(TOMORROW, user_id, "Margherita")
+
+        assert db.get_orders(TOMORROW) == []
+
+        # the third user fills the batch, which is written without waiting for the interval
+        book.add(TOMORROW, 3, "Margherita")
+        wait_for(lambda: len(db.get_orders(TOMORROW)) == 3)
+
+    def test_flush_error(self, tmp_path, caplog):
+        db = order_db(tmp_path)
+        book = OrderBook(db, 60, 50)
+        book.add(TOMORROW, 1, "Margherita")
+
+        set_orders = db.set_orders
+
+        def failing(changes):
+            raise Exception("database is locked")
+
+        db.set_orders = failing
+        assert book.flush() == 0
+        assert "retrying later" in caplog.text
+
+        # the order stays dirty until it could be written
+        db.set_orders = set_orders
+        assert book.flush() == 1
+        assert len(db.get_orders(TOMORROW)) == 1
+
+    def test_open_dates(self, tmp_path):
+        db = order_db(tmp_path)
+        book = OrderBook(db, 60, 50)
+
+        assert book.is_open(TOMORROW)
+        assert not book.is_open(TOMORROW + timedelta(days=1))
+        assert not book.is_open(date.today() - timedelta(days=1))
+
+        # the dates are only read again after a change
+        db.create_alfredo_date(TOMORROW + timedelta(days=1))
+        assert book.is_open(TOMORROW + timedelta(days=1))
+
+    def test_discard(self, tmp_path):
+        db = order_db(tmp_path)
+        book = OrderBook(db, 60, 50)
+        book.add(TOMORROW, 1, "Margherita")
+
+        book.discard({TOMORROW})
+        assert book.dirty == set()
+        assert book.flush() == 0
+
+        # orders of a date that is gone when they are written are dropped by the database
+        book.add(TOMORROW, 1, "Margherita")
+        db.delete_date(db.get_by_date(TOMORROW))
+        assert book.flush() == 1
+        assert db.get_orders(TOMORROW) == []
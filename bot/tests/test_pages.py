@@ -0,0 +1,58 @@
+from datetime import date
+
+from database import Database
+from pages import DatePages
+
+
+def pages_db(days):
+    db = Database(":memory:")
+    for day in days:
+        db.create_alfredo_date(date(2199, 1, day))
+    return db
+
+
+def summary(page):
+    return [d.date.day for d in page.dates], page.offset, page.total, page.has_prev, page.has_next
+
+
+class TestDatePages:
+    def test_page(self):
+        pages = DatePages(pages_db(range(1, 8)), 3)
+
+        assert summary(pages.page()) == ([1, 2, 3], 0, 7, False, True)
+        assert summary(pages.page(after=date(2199, 1, 3))) == ([4, 5, 6], 3, 7, True, True)
+        assert summary(pages.page(after=date(2199, 1, 6))) == ([7], 6, 7, True, False)
+        assert summary(pages.page(before=date(2199, 1, 7))) == ([4, 5, 6], 3, 7, True, True)
+        assert summary(pages.page(before=date(2199, 1, 3))) == ([1, 2], 0, 7, False, True)
+
+        # a neighbour that is gone doesn't matter, only the dates after it are looked up
+        assert summary(pages.page(after=date(2199, 1, 2))) == ([3, 4, 5], 2, 7, True, True)
+
+        # without any dates left on that side, the first page is shown
+        assert summary(pages.page(after=date(2199, 1, 7))) == ([1, 2, 3], 0, 7, False, True)
+
+        assert summary(DatePages(pages_db([]), 3).page()) == ([], 0, 0, False, False)
+
+    def test_cache(self):
+        db = pages_db(range(1, 8))
+        pages = DatePages(db, 3, max_entries=2)
+        rendered = []
+
+        def render(page):
+            rendered.append(page)
+            return len(rendered)
+
+        assert pages.get("de", render) == 1
+        assert pages.get("de", render) == 1
+        assert pages.get("en", render) == 2
+        assert pages.get("de", render, after=date(2199, 1, 3)) == 3
+        assert len(rendered) == 3
+
+        # the least recently used page was dropped
+        assert pages.get("de", render, after=date(2199, 1, 3)) == 3
+        assert pages.get("de", render) == 4
+
+        # a change of the dates invalidates every page
+        db.create_alfredo_date(date(2199, 1, 8))
+        assert pages.get("de", render, after=date(2199, 1, 3)) == 5
+        assert rendered[-1].total == 8
@@ -0,0 +1,79 @@
+import threading
+import time
+
+from shutdown import ShutdownCoordinator
+
+
+class TestShutdownCoordinator:
+    def test_request(self):
+        coordinator = ShutdownCoordinator()
+
+        assert coordinator.stopping is False
+        assert coordinator.request()
+        assert coordinator.stopping
+        assert coordinator.requested_at is not None
+
+        # only the first request counts
+        requested_at = coordinator.requested_at
+        assert coordinator.request() is False
+        assert coordinator.requested_at == requested_at
+
+    def test_track(self):
+        coordinator = ShutdownCoordinator()
+
+        with coordinator.track():
+            assert coordinator.in_flight == 1
+
+            with coordinator.track():
+                assert coordinator.in_flight == 2
+
+        assert coordinator.in_flight == 0
+
+        # exceptions don't leave handlers behind
+        try:
+            with coordinator.track():
+                raise Exception("handler failed")
+        except Exception:
+            pass
+
+        assert coordinator.in_flight == 0
+
+    def test_drain(self):
+        coordinator = ShutdownCoordinator()
+
+        assert coordinator.drain(0)
+
+        coordinator.begin()
+
+        def finish():
+            time.sleep(0.2)
+            coordinator.end()
+
+        threading.Thread(target=finish).start()
+
+        start = time.monotonic()
+        assert coordinator.drain(5)
+        assert time.monotonic() - start < 5
+
+    def test_drain_pending(self):
+        coordinator = ShutdownCoordinator()
+        queue = [1, 2]
+
+        def pending():
+            # one queued handler gets started per check
+            if len(queue) > 0:
+                queue.pop()
+                return len(queue) + 1
+            return 0
+
+        assert coordinator.drain(5, pending)
+        assert queue == []
+
+    def test_drain_timeout(self, caplog):
+        coordinator = ShutdownCoordinator()
+        coordinator.begin()
+
+        start = time.monotonic()
+        assert coordinator.drain(0.2) is False
+        assert time.monotonic() - start >= 0.2
+        assert "1 running and 0 queued" in caplog.text
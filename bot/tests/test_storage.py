@@ -0,0 +1,140 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import audit
+from database import Database
+from models import AlfredoDateArchive
+from storage import MemoryStorage, open_storage
+
+TODAY = date.today()
+ADMIN = audit.Actor(1, "Admin")
+
+
+def archive(db):
+    # the archive is only written by the backends, so the tests read it directly
+    if isinstance(db, Database):
+        with Session(db.engine) as session:
+            rows = session.scalars(select(AlfredoDateArchive).order_by(AlfredoDateArchive.date)).all()
+    else:
+        rows = db.archive
+
+    return [(row.date, row.description, row.message_id, row.attendees) for row in rows]
+
+
+def scenario(db):
+    # the same operations on every backend, returns everything that can be read back
+    db.audit_snapshot_interval = 3
+
+    for offset, poll_id in [(-2, "poll1"), (0, "poll2"), (3, "poll3"), (1, None), (5, "poll5")]:
+        db.create_alfredo_date(TODAY + timedelta(days=offset), f"date {offset}", offset + 10, poll_id, actor=ADMIN)
+
+    db.set_attendance("poll1", 1, 1)
+    db.set_attendance("poll2", 1, 0)
+    db.set_attendance("poll2", 2, 1)
+    db.set_attendance("poll3", 2, 0)
+    db.set_attendance("poll3", 2, None)
+    unknown = db.set_attendance("unknown", 1, 0)
+
+    orders = db.set_orders([(TODAY + timedelta(days=offset), user_id, {"Margherita": user_id, "Schiggn": 1})
+                            for offset in [-2, 3, 5, 7] for user_id in [1, 2]])
+    db.set_orders([(TODAY + timedelta(days=3), 2, {"Schiggn": 2})])
+
+    db.delete_dates([db.get_by_date(TODAY + timedelta(days=5))], actor=ADMIN)
+    deleted = db.delete_dates_by_id([42], actor=ADMIN)
+    archived = db.archive_past_dates()
+    db.set_state("board_message_id", "1000")
+    db.audit(ADMIN, audit.ANNOUNCE, details={"text": "Alfredo!"})
+    db.audit(audit.SYSTEM, audit.REMINDER, TODAY + timedelta(days=1))
+
+    return {
+        "unknown": unknown,
+        "deleted": deleted,
+        "future": [(d.date, d.description, d.message_id, d.poll_id) for d in db.get_future_dates()],
+        "attendance": [tuple(row) for row in db.get_future_attendance()],
+        "past": archive(db),
+        "between": [d.date for d in db.get_dates_between(TODAY, TODAY + timedelta(days=1))],
+        "missing": db.get_by_date(TODAY + timedelta(days=2)),
+        "attendees": db.get_attendees("poll2"),
+        "archived": archived,
+        "statistics": [tuple(row) for row in db.get_statistics()],
+        "state": db.get_state("board_message_id"),
+        "pages": [[d.date for d in db.get_date_page(**anchor, limit=1)] for anchor in [
+            {}, {"after": TODAY}, {"before": TODAY + timedelta(days=3)}, {"after": TODAY - timedelta(days=9)}
+        ]],
+        "counts": [db.count_future_dates(), db.count_future_dates(before=TODAY + timedelta(days=1))],
+        "orders": orders,
+        "order_rows": [[tuple(row) for row in db.get_orders(TODAY + timedelta(days=offset))] for offset in [-2, 3, 5]],
+        "audit": [(e.id, e.user_id, e.user_name, e.action, e.date, e.details) for e in db.get_audit(limit=5)],
+        "audit_state": db.get_audit_state(datetime.now()),
+        "version": db.version
+    }
+
+
+class TestMemoryStorage:
+    def test_parity(self):
+        expected = scenario(Database(":memory:"))
+        assert scenario(MemoryStorage()) == expected
+
+        # rebuilding keeps the cancelled counts
+        db, memory = Database(":memory:"), MemoryStorage()
+        scenario(db)
+        scenario(memory)
+        db.rebuild_statistics()
+        memory.rebuild_statistics()
+        assert [tuple(r) for r in memory.get_statistics()] == [tuple(r) for r in db.get_statistics()]
+
+    def test_index(self):
+        memory = MemoryStorage()
+
+        for offset in [3, 1, 2, 1]:
+            memory.create_alfredo_date(TODAY + timedelta(days=offset))
+
+        assert memory.index == sorted(memory.index)
+        assert [d.id for d in memory.get_dates_between(TODAY + timedelta(days=1), TODAY + timedelta(days=2))] \
+            == [2, 4, 3]
+
+        memory.delete_dates(memory.get_dates_between(TODAY + timedelta(days=1), TODAY + timedelta(days=1)))
+        assert [d.id for d in memory.get_future_dates()] == [3, 1]
+        assert len(memory.index) == len(memory.dates) == 2
+
+    def test_snapshot(self, tmp_path):
+        snapshot = tmp_path / "alfredo.json"
+        memory = MemoryStorage(snapshot)
+        expected = scenario(memory)
+        memory.close()
+
+        # a new instance sees the same data and continues the ids
+        memory = MemoryStorage(snapshot)
+        assert [d.message_id for d in memory.get_future_dates()] == [x[2] for x in expected["future"]]
+        assert memory.get_attendees("poll2") == 3
+        assert [tuple(r) for r in memory.get_statistics()] == expected["statistics"]
+        assert memory.get_state("board_message_id") == "1000"
+        assert [tuple(row) for row in memory.get_orders(TODAY + timedelta(days=3))] == expected["order_rows"][1]
+        assert [(e.id, e.action, e.details) for e in memory.get_audit(limit=5)] == \
+            [(e[0], e[3], e[5]) for e in expected["audit"]]
+        assert memory.get_audit_state(datetime.now()) == expected["audit_state"]
+        assert len(memory.audit_snapshots) == 2
+
+        memory.create_alfredo_date(TODAY + timedelta(days=7))
+        assert memory.get_by_date(TODAY + timedelta(days=7)).id == 6
+
+        # nothing is written for in-memory storage
+        MemoryStorage(":memory:").create_alfredo_date(TODAY)
+        assert [p.name for p in tmp_path.iterdir()] == ["alfredo.json"]
+
+    def test_sqlite_file(self, tmp_path):
+        # the sqlite database is never mistaken for (or overwritten with) a snapshot
+        f = tmp_path / "alfredo.sqlite"
+        Database(str(f)).close()
+
+        with pytest.raises(Exception) as ex:
+            MemoryStorage(str(f))
+
+        assert "is a sqlite database" in ex.value.args[0]
+
+    def test_open_storage(self):
+        assert isinstance(open_storage("memory", ":memory:"), MemoryStorage)
+        assert isinstance(open_storage("sqlite", ":memory:"), Database)
@@ -0,0 +1,44 @@
+from fake import FakeClock
+from throttle import Throttle, ALLOW, WARN, DROP
+
+
+class TestThrottle:
+    def test_burst(self):
+        clock = FakeClock()
+        throttle = Throttle(3, 10, clock=clock)
+
+        assert [throttle.check(1) for _ in range(5)] == [ALLOW, ALLOW, ALLOW, WARN, DROP]
+        # other keys have their own bucket
+        assert throttle.check(2) == ALLOW
+
+    def test_refill(self):
+        clock = FakeClock()
+        throttle = Throttle(2, 10, clock=clock)
+
+        assert [throttle.check(1) for _ in range(3)] == [ALLOW, ALLOW, WARN]
+
+        clock.now += 5
+        assert throttle.check(1) == DROP
+
+        # one token after a full interval, the warning is reset after a successful command
+        clock.now += 5
+        assert throttle.check(1) == ALLOW
+        assert throttle.check(1) == WARN
+
+        # never more than burst tokens
+        clock.now += 1000
+        assert [throttle.check(1) for _ in range(3)] == [ALLOW, ALLOW, WARN]
+
+    def test_eviction(self):
+        clock = FakeClock()
+        throttle = Throttle(1, 10, max_entries=2, clock=clock)
+
+        throttle.check(1)
+        throttle.check(2)
+        # 1 was seen more recently than 2
+        throttle.check(1)
+        throttle.check(3)
+
+        assert len(throttle) == 2
+        assert list(throttle.buckets) == [1, 3]
+        assert throttle.check(2) == ALLOW
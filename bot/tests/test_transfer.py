@@ -0,0 +1,110 @@
+import io
+import json
+from datetime import date
+
+import pytest
+
+from database import Database
+from models import AlfredoDate, AlfredoDateArchive, Attendance
+import transfer
+from test_database import assert_row_count
+
+RECORDS = [
+    {"date": "2020-01-03", "description": "Geburtstag", "archived": True, "attendees": 7},
+    {"date": "2199-01-01", "poll_id": "poll1", "message_id": 4, "attendance": [{"user_id": 1, "guests": 1}]},
+    {"date": "2199-01-02"}
+]
+
+
+def jsonl(records):
+    return io.StringIO("".join(json.dumps(r) + "\n" for r in records))
+
+
+def exported(db, fmt):
+    out = io.StringIO()
+    transfer.export_dates(db, fmt, out)
+    return out.getvalue()
+
+
+class TestTransfer:
+    def test_import(self):
+        db = Database(":memory:")
+
+        assert transfer.import_dates(db, "jsonl", jsonl(RECORDS), batch_size=2) == (3, 0)
+        # one version per batch
+        assert db.version == 2
+
+        assert_row_count(db, AlfredoDate, 2)
+        assert_row_count(db, AlfredoDateArchive, 1)
+        assert_row_count(db, Attendance, 1)
+        assert db.get_attendees("poll1") == 2
+
+        stats = {(s.year, s.month): (s.created, s.held, s.attendees) for s in db.get_statistics()}
+        assert stats == {(2020, 1): (1, 1, 7), (2199, 1): (2, 0, 0)}
+
+        # existing dates are skipped
+        assert transfer.import_dates(db, "jsonl", jsonl(RECORDS)) == (0, 3)
+        assert_row_count(db, AlfredoDate, 2)
+
+    def test_roundtrip(self):
+        db = Database(":memory:")
+        transfer.import_dates(db, "jsonl", jsonl(RECORDS))
+
+        for fmt in transfer.IMPORT_FORMATS:
+            copy = Database(":memory:")
+            assert transfer.import_dates(copy, fmt, io.StringIO(exported(db, fmt))) == (3, 0)
+            assert list(copy.iter_dates()) == list(db.iter_dates())
+
+    def test_export(self):
+        db = Database(":memory:")
+        transfer.import_dates(db, "jsonl", jsonl(RECORDS))
+
+        lines = exported(db, "jsonl").splitlines()
+        assert len(lines) == 3
+        assert json.loads(lines[1])["attendance"] == [{"user_id": 1, "guests": 1}]
+
+        rows = exported(db, "csv").splitlines()
+        assert rows[0] == ",".join(transfer.CSV_FIELDS)
+        assert rows[2].endswith("poll1,false,2,1:1")
+
+        ics = exported(db, "ics")
+        assert ics.startswith("BEGIN:VCALENDAR")
+        assert ics.count("BEGIN:VEVENT") == 3
+        assert "UID:alfredo-2199-01-02@alfredo" in ics
+        assert "DESCRIPTION:Geburtstag" in ics
+
+    def test_validation(self):
+        db = Database(":memory:")
+        invalid = [
+            {"description": "no date"},
+            {"date": "2199-13-01"},
+            {"date": "2199-01-01", "message_id": "4"},
+            {"date": "2199-01-01", "archived": "yes"},
+            {"date": "2199-01-01", "attendance": [{"user_id": 1, "guests": 0}]},
+            {"date": "2199-01-01", "poll_id": "poll1", "attendance": [{"user_id": 1}]},
+            {"date": "2199-01-01", "poll_id": "poll1", "attendance": [{"user_id": 1, "guests": 0}] * 2},
+            {"date": "2199-01-01", "poll_id": "poll2"},
+            "2199-01-01"
+        ]
+
+        for record in invalid:
+            with pytest.raises(ValueError, match="record 2"):
+                transfer.import_dates(db, "jsonl", jsonl([{**RECORDS[2], "poll_id": "poll2"}, record]))
+
+        # the batch with the invalid record is not written
+        assert_row_count(db, AlfredoDate, 0)
+
+        # earlier batches are
+        with pytest.raises(ValueError):
+            transfer.import_dates(db, "jsonl", jsonl([RECORDS[2], invalid[0]]), batch_size=1)
+        assert db.get_by_date(date(2199, 1, 2)) is not None
+
+        # a poll_id of a stored date can't be reused
+        transfer.import_dates(db, "jsonl", jsonl([RECORDS[1]]))
+        with pytest.raises(ValueError, match="poll_id poll1 is already used"):
+            transfer.import_dates(db, "jsonl", jsonl([{"date": "2199-01-03", "poll_id": "poll1"}]))
+
+    def test_guess_format(self):
+        assert transfer.guess_format("dates.CSV") == "csv"
+        assert transfer.guess_format("dates.ics") == "ics"
+        assert transfer.guess_format("-") == "jsonl"
@@ -0,0 +1,62 @@
+import pytest
+from telebot import apihelper
+
+from health import HealthRequestHandler, HealthServer
+from test_health import monitor
+from transport import Transport
+
+
+@pytest.fixture
+def restore_apihelper():
+    names = ["session", "SESSION_TIME_TO_LIVE", "CONNECT_TIMEOUT", "READ_TIMEOUT", "proxy"]
+    values = {name: getattr(apihelper, name) for name in names}
+    yield
+    for name, value in values.items():
+        setattr(apihelper, name, value)
+
+
+class KeepAliveHandler(HealthRequestHandler):
+    # the health endpoint speaks HTTP/1.0, Telegram keeps connections open
+    protocol_version = "HTTP/1.1"
+
+
+@pytest.fixture
+def server():
+    server = HealthServer(monitor(), "127.0.0.1", 0)
+    server.server.RequestHandlerClass = KeepAliveHandler
+    server.start()
+    yield server
+    server.stop()
+
+
+class TestTransport:
+    def test_apply(self, restore_apihelper):
+        transport = Transport(8, 5, 15, 20, proxy="http://127.0.0.1:3128")
+        transport.apply()
+
+        assert apihelper.session is transport.session
+        assert apihelper.SESSION_TIME_TO_LIVE is None
+        assert (apihelper.CONNECT_TIMEOUT, apihelper.READ_TIMEOUT) == (5, 15)
+        assert apihelper.proxy == {"https": "http://127.0.0.1:3128"}
+        assert transport.adapter._pool_maxsize == 8
+
+        # getUpdates may take the long poll plus a regular read
+        assert transport.polling_kwargs() == {"timeout": 35, "long_polling_timeout": 20}
+
+    def test_reuse(self, server):
+        transport = Transport(2, 5, 15, 20)
+        assert transport.metrics()["reuse_rate"] is None
+
+        for _ in range(4):
+            transport.session.get(f"http://127.0.0.1:{server.port}/health", timeout=5).raise_for_status()
+
+        assert transport.metrics() == {"requests": 4, "connections": 1, "reuse_rate": 0.75}
+
+    def test_no_keep_alive(self, server):
+        transport = Transport(2, 5, 15, 20, keep_alive=False)
+
+        for _ in range(2):
+            transport.session.get(f"http://127.0.0.1:{server.port}/health", timeout=5).raise_for_status()
+
+        assert transport.session.headers["Connection"] == "close"
+        assert transport.metrics() == {"requests": 2, "connections": 2, "reuse_rate": 0}
@@ -15,6 +15,8 @@ class TestUtil:
         assert "1. Januar" in fmt
         assert "2023" in fmt
 
+        assert util.format_date(obj, "en_GB") == "Sunday, 1 January 2023"
+
     def test_format_user(self):
         fmt = util.format_user(FakeUser(1, "Firstname", "Username"))
 
@@ -78,11 +80,3 @@ class TestUtil:
 
             assert "creating new ics file" not in caplog.text
             assert "from cache" in caplog.text
-
-    def test_get_reminder(self):
-        reminders = set()
-
-        for i in range(1000):
-            reminders.add(util.get_reminder())
-
-        assert len(reminders) == len(util.reminders)
@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+
+# results of Throttle.check()
+ALLOW = "allow"
+WARN = "warn"
+DROP = "drop"
+
+
+class Throttle:
+    def __init__(self, burst, interval, max_entries=4096, clock=time.monotonic):
+        # every key may send burst commands at once and regains one every interval seconds
+        self.burst = burst
+        self.interval = interval
+        self.max_entries = max_entries
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        # key -> [tokens, last update, warned], least recently seen first
+        self.buckets = OrderedDict()
+
+    def check(self, key):
+        now = self.clock()
+
+        with self.lock:
+            bucket = self.buckets.get(key)
+
+            if bucket is None:
+                bucket = [self.burst, now, False]
+                self.buckets[key] = bucket
+
+                # whoever was idle the longest is forgotten, at worst they get a fresh bucket
+                if len(self.buckets) > self.max_entries:
+                    self.buckets.popitem(last=False)
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) / self.interval)
+                bucket[1] = now
+                self.buckets.move_to_end(key)
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                bucket[2] = False
+                return ALLOW
+
+            # only the first rejected command after a successful one is answered
+            if bucket[2]:
+                return DROP
+
+            bucket[2] = True
+            return WARN
+
+    def __len__(self):
+        return len(self.buckets)
@@ -0,0 +1,154 @@
+import csv
+import json
+from datetime import date
+
+import util
+
+EXPORT_FORMATS = ["jsonl", "csv", "ics"]
+IMPORT_FORMATS = ["jsonl", "csv"]
+
+CSV_FIELDS = ["id", "date", "description", "message_id", "poll_id", "archived", "attendees", "attendance"]
+
+
+def guess_format(filename, default="jsonl"):
+    extension = filename.rpartition(".")[2].lower()
+    return extension if extension in EXPORT_FORMATS else default
+
+
+def export_dates(db, fmt, out):
+    # streams Database.iter_dates() to the file object out, returns the number of dates
+    writer = {"jsonl": write_jsonl, "csv": write_csv, "ics": write_ics}[fmt]
+    return writer(db.iter_dates(), out)
+
+
+def write_jsonl(records, out):
+    count = 0
+
+    for count, record in enumerate(records, 1):
+        out.write(json.dumps({**record, "date": record["date"].isoformat()}, ensure_ascii=False) + "\n")
+
+    return count
+
+
+def write_csv(records, out):
+    writer = csv.DictWriter(out, CSV_FIELDS)
+    writer.writeheader()
+    count = 0
+
+    for count, record in enumerate(records, 1):
+        # user_id:guests pairs, e.g. "42:0 69:1"
+        attendance = " ".join(f"{a['user_id']}:{a['guests']}" for a in record["attendance"])
+        writer.writerow({**record, "archived": str(record["archived"]).lower(), "attendance": attendance})
+
+    return count
+
+
+def write_ics(records, out):
+    out.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//alfredo//export//DE\r\n")
+    count = 0
+
+    for count, record in enumerate(records, 1):
+        event = util.alfredo_event(record["date"], description=record["description"],
+                                   uid=f"alfredo-{record['date'].isoformat()}@alfredo")
+        out.writelines(event.serialize_iter())
+        out.write("\r\n")
+
+    out.write("END:VCALENDAR\r\n")
+    return count
+
+
+def read_jsonl(infile):
+    for line in infile:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(infile):
+    def optional_int(value):
+        return int(value) if value else None
+
+    for row in csv.DictReader(infile):
+        attendance = []
+        for pair in (row.get("attendance") or "").split():
+            user_id, _, guests = pair.partition(":")
+            attendance.append({"user_id": int(user_id), "guests": int(guests or 0)})
+
+        yield {
+            "id": optional_int(row.get("id")),
+            "date": row.get("date"),
+            "description": row.get("description") or None,
+            "message_id": optional_int(row.get("message_id")),
+            "poll_id": row.get("poll_id") or None,
+            "archived": row.get("archived", "").lower() == "true",
+            "attendees": optional_int(row.get("attendees")),
+            "attendance": attendance
+        }
+
+
+def validate(record):
+    # returns the record in the format of Database.iter_dates(), raises ValueError for invalid ones
+    if not isinstance(record, dict) or not isinstance(record.get("date"), str):
+        raise ValueError("date missing")
+
+    valid = {
+        "id": record.get("id"),
+        "date": date.fromisoformat(record["date"]),
+        "description": record.get("description"),
+        "message_id": record.get("message_id"),
+        "poll_id": record.get("poll_id"),
+        "archived": record.get("archived", False),
+        "attendees": record.get("attendees"),
+        "attendance": record.get("attendance") or []
+    }
+
+    for key in ["id", "message_id", "attendees"]:
+        if valid[key] is not None and (not isinstance(valid[key], int) or valid[key] < 0):
+            raise ValueError(f"{key} is not a positive number")
+
+    for key in ["description", "poll_id"]:
+        if valid[key] is not None and not isinstance(valid[key], str):
+            raise ValueError(f"{key} is not a string")
+
+    if not isinstance(valid["archived"], bool):
+        raise ValueError("archived is not a boolean")
+
+    return {**valid, "attendance": validate_votes(valid)}
+
+
+def validate_votes(valid):
+    for vote in valid["attendance"]:
+        if not isinstance(vote.get("user_id"), int) or not isinstance(vote.get("guests"), int) or vote["guests"] < 0:
+            raise ValueError(f"invalid vote {vote}")
+
+    if valid["attendance"] and (valid["archived"] or valid["poll_id"] is None):
+        raise ValueError("votes need a poll_id and can't be imported into the archive")
+
+    if len({v["user_id"] for v in valid["attendance"]}) < len(valid["attendance"]):
+        raise ValueError("a user voted twice")
+
+    return [{"user_id": v["user_id"], "guests": v["guests"]} for v in valid["attendance"]]
+
+
+def validated(records):
+    # a poll_id maps votes to their date, so it may only be used once
+    poll_ids = set()
+
+    for number, record in enumerate(records, 1):
+        try:
+            valid = validate(record)
+            if valid["poll_id"] in poll_ids:
+                raise ValueError(f"poll_id {valid['poll_id']} is used twice")
+        except (ValueError, TypeError, AttributeError) as ex:
+            raise ValueError(f"record {number}: {ex}") from ex
+
+        if valid["poll_id"] is not None:
+            poll_ids.add(valid["poll_id"])
+        yield valid
+
+
+def import_dates(db, fmt, infile, batch_size=None):
+    # returns (imported, skipped), records before an invalid one stay imported if they were in an earlier batch
+    reader = {"jsonl": read_jsonl, "csv": read_csv}[fmt]
+    kwargs = {"batch_size": batch_size} if batch_size else {}
+
+    return db.import_dates(validated(reader(infile)), **kwargs)
@@ -0,0 +1,96 @@
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class CountingAdapter(HTTPAdapter):
+    # counts requests and the TCP connections opened for them, reuse_rate is the share served by open connections
+    def __init__(self, *args, **kwargs):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.count_connections(self.poolmanager)
+
+    def proxy_manager_for(self, proxy, **kwargs):
+        manager = super().proxy_manager_for(proxy, **kwargs)
+        self.count_connections(manager)
+        return manager
+
+    def count_connections(self, manager):
+        # reconnects of dropped connections happen inside the pool, so count the connect() calls themselves
+        adapter = self
+
+        def counting(pool_cls):
+            class Connection(pool_cls.ConnectionCls):
+                def connect(self):
+                    with adapter.lock:
+                        adapter.connections += 1
+                    return super().connect()
+
+            return type(pool_cls.__name__, (pool_cls,), {"ConnectionCls": Connection})
+
+        manager.pool_classes_by_scheme = {"http": counting(HTTPConnectionPool),
+                                          "https": counting(HTTPSConnectionPool)}
+
+    def send(self, request, **kwargs):
+        with self.lock:
+            self.requests += 1
+
+        return super().send(request, **kwargs)
+
+    def metrics(self):
+        with self.lock:
+            requests, connections = self.requests, self.connections
+
+        reuse_rate = 1 - connections / requests if requests > 0 else None
+        return {"requests": requests, "connections": connections, "reuse_rate": reuse_rate}
+
+
+class Transport:
+    def __init__(self, pool_size, connect_timeout, read_timeout, long_poll_timeout, keep_alive=True, proxy=None):
+        self.log = logging.getLogger("Transport")
+
+        # regular calls use connect_timeout and read_timeout, getUpdates waits up to long_poll_timeout
+        # on the server and gets read_timeout on top of it
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.long_poll_timeout = long_poll_timeout
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.proxy = proxy
+
+        # one session for all threads, so connections are reused by whichever handler runs next
+        self.adapter = CountingAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        # plain http for a local bot API server
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+    def apply(self):
+        # telebot keeps its transport settings in module globals
+        apihelper.session = self.session
+        # telebot replaces sessions after their time to live, which would drop the pool
+        apihelper.SESSION_TIME_TO_LIVE = None
+        apihelper.CONNECT_TIMEOUT = self.connect_timeout
+        apihelper.READ_TIMEOUT = self.read_timeout
+        apihelper.proxy = {"https": self.proxy} if self.proxy else None
+
+        self.log.info(f"{self.pool_size} connections, timeouts {self.connect_timeout}s/{self.read_timeout}s"
+                      f"{', proxy ' + self.proxy if self.proxy else ''}{'' if self.keep_alive else ', no keep-alive'}")
+
+    def polling_kwargs(self):
+        return {"timeout": self.long_poll_timeout + self.read_timeout, "long_polling_timeout": self.long_poll_timeout}
+
+    def metrics(self):
+        return self.adapter.metrics()
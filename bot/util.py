@@ -1,7 +1,6 @@
 from functools import wraps
 from ics import Calendar, Event
 from os import path
-from random import choice
 import arrow
 import babel.dates
 import logging
@@ -15,23 +14,17 @@ emojis = {
     "frowning": u'\U0001F641',
     "bullet": u'\U00002022',
     "megaphone": u'\U0001F4E3',
-    "download": u'\U00002B07'
+    "download": u'\U00002B07',
+    "chart": u'\U0001F4CA'
 }
 
-reminders = [
-    "Wer heute sein Kreuz setzt, muss morgen nicht hungern!",
-    "Heute votieren -> morgen dinieren!",
-    "Heute schön einschreiben -> morgen dick einverleiben!",
-    "Heiße Teigscheiben in deiner Umgebung suchen DICH! MELD. DICH. AN.",
-    "Hunger? Muss nicht sein, meld' dich jetzt an!",
-    "Letzte Chance für nette Fettigkeiten oder fette Nettigkeiten!",
-    "Morgen gibt's mal wieder Pizza...",
-    "Hast du auch von Pizza geträumt? Bei Alfredo werden morgen Träume Wirklichkeit!"
-]
 
+def format_date(date, locale='de_DE'):
+    return babel.dates.format_date(date, format='full', locale=locale)
 
-def format_date(date):
-    return babel.dates.format_date(date, format='full', locale='de_DE')
+
+def format_month(year, month, locale='de_DE'):
+    return babel.dates.format_date(datetime.date(year, month, 1), format='MMMM yyyy', locale=locale)
 
 
 def format_user(user):
@@ -62,25 +55,28 @@ def li(string):
     return f"{emoji('bullet')} {string}\n"
 
 
+def alfredo_event(date, **kwargs):
+    begin = arrow.get(date, "Europe/Berlin")
+    begin = begin.replace(hour=18)
+
+    return Event(
+        name="Alfredo",
+        begin=begin.to("UTC"),
+        duration={"hours": 4},
+        location="Z3034",
+        created=datetime.datetime.now(),
+        **kwargs
+    )
+
+
 def generate_ics_file(workdir, date):
     filename = f"{babel.dates.format_date(date, format='yyyy-MM-dd')}_alfredo.ics"
     filepath = path.join(workdir, filename)
 
     if not path.exists(filepath):
         log.debug(f"creating new ics file {filepath}")
-        begin = arrow.get(date, "Europe/Berlin")
-        begin = begin.replace(hour=18)
-
         cal = Calendar()
-        ev = Event(
-            name="Alfredo",
-            begin=begin.to("UTC"),
-            duration={"hours": 4},
-            location="Z3034",
-            created=datetime.datetime.now()
-        )
-
-        cal.events.add(ev)
+        cal.events.add(alfredo_event(date))
 
         with open(filepath, 'w') as f:
             f.writelines(cal.serialize_iter())
@@ -90,10 +86,6 @@ def generate_ics_file(workdir, date):
     return filepath
 
 
-def get_reminder():
-    return choice(reminders)
-
-
 def admin_command_check():
     def decorator(f):
         @wraps(f)
@@ -102,10 +94,10 @@ def admin_command_check():
 
             if not self.user_is_admin(message.from_user):
                 self.log_command(message)
-                self.send_error(message, "Du bist kein Admin.")
+                self.send_error(message, self.catalog(message.chat.id).text("not_admin"))
                 return
 
             self.log_command(message, admincmd=True)
-            return f(self, message)
+            return f(self, message, *args[1:], **kwargs)
         return decorated_function
     return decorator